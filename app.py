@@ -1,14 +1,26 @@
-import base64
 import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
-from rnapolis import annotator, parser
-from io import BytesIO, StringIO
-import tempfile
+import os
+from rnagraph.profiling import install_profiler
+from rnagraph.recording import install_recorder
+from rnagraph.structure_io import StructureTooLarge, decode_upload, structure_format
+from rnagraph.structure_store import install_structure_route, put_structure, structure_urls
+from rnagraph.chunked_upload import CHUNKED_PREFIX, install_upload_routes, load_upload, upload_config
+from rnagraph.pdb_mirror import MIRROR_PREFIX, load_entry, lookup, mirror_dir, normalize_id
+from rnagraph.figure_cache import install_cache_stats_route
+from rnagraph.json_engine import configure_json_engine
+from rnagraph.pipeline import Pipeline, calculate_interactions, check_nucleotide_type_and_completeness, extract_structure_name
 
 app = dash.Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True,  meta_tags=[
         {"name": "viewport", "content": "width=device-width, initial-scale=1"}
     ])
+install_recorder(app)
+install_profiler(app)
+install_structure_route(app)
+install_upload_routes(app)
+install_cache_stats_route(app)
+configure_json_engine(app)
 
 app.layout = html.Div(
     [
@@ -21,10 +33,15 @@ app.layout = html.Div(
                     dcc.Upload(
                     id='upload-data',
                     className = 'upload-data',
-                    children=html.Div(['Drag and Drop or ', html.A('Select a PDB or CIF File')]),
+                    children=html.Div(['Drag and Drop or ', html.A('Select a PDB, CIF or BinaryCIF File')]),
                     multiple=False,
                     style = {'fontSize': '16px'}
                     ),
+                    html.Div(id='chunked-upload', **upload_config(app)),
+                    html.Div([
+                        dcc.Input(id='pdb-id', type='text', placeholder='PDB ID', debounce=True, className='pdb-id-input'),
+                        html.Button('Load', id='pdb-id-load', className='pdb-id-button'),
+                    ], className='pdb-id', style={} if mirror_dir() else {'display': 'none'}),
                     html.Div(id='upload-message', className='upload-message'),
                 ]),
                 dcc.Store(id="store"),
@@ -118,89 +135,6 @@ app.layout = html.Div(
     className="app-container",
 )
 
-rna_nucleotides = ['A', 'C', 'G', 'U', 'I']
-dna_nucleotides = ['DA', 'DC', 'DG', 'DU', 'DI', 'DT']
-def check_nucleotide_type_and_completeness(decoded_data, ext):
-    content = decoded_data.decode('utf-8')
-    nucleotides_found = False
-    is_complete = True
-    issues = ""
-
-    if ext == 'pdb':
-        coordinates_present = False
-
-        for line in content.splitlines():
-            if line.startswith('ATOM') or line.startswith('HETATM'):
-                if line.startswith('ATOM'):
-                    residue_name = line[17:20].strip() 
-
-                    if residue_name in rna_nucleotides + dna_nucleotides:
-                        nucleotides_found = True
-                       
-                try:
-                    x = float(line[30:38].strip())
-                    y = float(line[38:46].strip())
-                    z = float(line[46:54].strip())
-                    coordinates_present = True
-                except ValueError:
-                    coordinates_present = False
-        if not coordinates_present:
-            issues = "*Missing atomic coordinates."
-            return "Other", is_complete, issues
-        
-    elif ext == 'cif':
-        coordinates_present = False
-
-        for line in content.splitlines():
-            if line.startswith('_atom_site'):
-                continue
-            elif line.startswith('_'):
-                continue
-            elif line.startswith('ATOM'):
-                parts = line.split()
-                if len(parts) > 6:
-                    if parts[5] in rna_nucleotides + dna_nucleotides:
-                        nucleotides_found = True
-
-                    try:
-                        x = float(parts[10])
-                        y = float(parts[11])
-                        z = float(parts[12])
-                        coordinates_present = True
-                    except (IndexError, ValueError):
-                        coordinates_present = False
-        if not nucleotides_found:
-            issues = "*File does not contain any RNA or DNA structure."
-            return "Other", is_complete, issues
-
-        if not coordinates_present:
-            issues = "*Missing atomic coordinates."
-            return "Other", is_complete, issues
-
-
-    return "RNA", is_complete, issues
-
-def extract_structure_name(decoded_data, ext):
-    content = decoded_data.decode('utf-8')
-    pdb_id = "Unknown PDB ID"
-
-    if ext == 'pdb':
-        for line in content.splitlines():
-            if line.startswith("HEADER"):
-                pdb_id = line[62:66].strip() 
-                break
-
-    elif ext == 'cif':
-        for line in content.splitlines():
-            if line.startswith("_entry.id"):
-                parts = line.split(maxsplit=1)
-                if len(parts) > 1:
-                    pdb_id = parts[1].strip().strip('"')  
-                break
-
-    return pdb_id
-
-
 @app.callback(
     [
         dash.dependencies.Output('upload-message', 'children'),
@@ -226,61 +160,54 @@ def update_active_link(contents, pathname, filename):
         return [None, None, None, {'display': 'flex'}, molviewer_class, RNAgraph_class]
 
     try:
-        content_type, content_string = contents.split(',')
-        decoded = base64.b64decode(content_string)
-        file_ext = filename.split('.')[-1].lower()
-
-        if file_ext in ['pdb', 'cif']:
-            file_base64 = base64.b64encode(decoded).decode()
-            file_data_url = f"data:{content_type};base64,{file_base64}"
-
-            structure_type, is_complete, issues = check_nucleotide_type_and_completeness(decoded, file_ext)
+        upload_ext, compression = structure_format(filename)
+
+        if upload_ext in ['pdb', 'cif', 'bcif']:
+            if contents.startswith(CHUNKED_PREFIX):
+                decoded, file_ext, digest = load_upload(contents[len(CHUNKED_PREFIX):], filename)
+            elif contents.startswith(MIRROR_PREFIX):
+                decoded, file_ext, _ = load_entry(contents[len(MIRROR_PREFIX):])
+                digest = None
+            else:
+                content_type, content_string = contents.split(',')
+                decoded, file_ext = decode_upload(content_string, filename)
+                digest = None
+
+            pipeline = Pipeline(decoded, file_ext, digest)
+            structure_type, is_complete, issues = pipeline.validation()
             if structure_type == "Other" or not is_complete:
                 return [html.Div(issues), None, None, {'display': 'flex'}, molviewer_class, RNAgraph_class]
             
+            digest = pipeline.digest = digest or put_structure(decoded, file_ext)
+            store = {'hash': digest, 'ext': file_ext, 'name': None, **structure_urls(app, digest, file_ext)}
             if pathname == '/':
-                return [None, {'url': file_data_url, 'ext': file_ext, 'name': None}, None, {'display': 'none'}, molviewer_class, RNAgraph_class]
+                return [None, store, None, {'display': 'none'}, molviewer_class, RNAgraph_class]
             
-            structure_name = extract_structure_name(decoded, file_ext)
-            interactions = calculate_interactions(decoded, file_ext)
-            return [None, {'url': file_data_url, 'ext': file_ext, 'name': structure_name}, interactions, {'display': 'none'}, molviewer_class, RNAgraph_class]
+            store['name'] = pipeline.name()
+            interactions = pipeline.interactions()
+            return [None, store, interactions, {'display': 'none'}, molviewer_class, RNAgraph_class]
 
         return [html.Div('*Invalid file format. Please upload a PDB or CIF file.'), None, None, {'display': 'flex'}, molviewer_class, RNAgraph_class]
 
+    except StructureTooLarge as e:
+        return [html.Div(f"*{e}."), None, None, {'display': 'flex'}, molviewer_class, RNAgraph_class]
     except Exception as e:
         return [html.Div('*There was an error processing this file.'), None, None, {'display': 'flex'}, molviewer_class, RNAgraph_class]
 
-def calculate_interactions(decoded_data, ext):
-    try:
-        
-        if ext == 'pdb':
-            decoded_string = decoded_data.decode('utf-8')
-            structure = parser.read_3d_structure(StringIO(decoded_string))
-        elif ext == 'cif':
-            decoded_string = decoded_data.decode('utf-8')
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.cif') as temp_file:
-                temp_file.write(decoded_data)  
-                temp_file.flush()  
-                temp_file.seek(0)  
-                try:
-                    with open(temp_file.name, 'r') as read_file:
-                        structure = parser.read_3d_structure(read_file)  
-                except Exception as parse_error:
-                    print(f"Error while parsing CIF file: {parse_error}")
-                    return None
-
-        available_interactions = {
-            'phosphodiester': annotator.extract_base_interactions(structure).basePhosphateInteractions,
-            'c_base_base': [pair for pair in annotator.extract_base_interactions(structure).basePairs if pair.lw.name == 'cWW'],
-            'nc_base_base': [pair for pair in annotator.extract_base_interactions(structure).basePairs if pair.lw.name != 'cWW'],
-            'stacking': annotator.extract_base_interactions(structure).stackings
-        }
-
-        return available_interactions
-
-    except Exception as e:
-        print(f"Error in calculate_interactions: {e}")
-        return None
+@app.callback(
+    dash.dependencies.Output('upload-data', 'contents'),
+    dash.dependencies.Output('upload-data', 'filename'),
+    dash.dependencies.Output('upload-message', 'children', allow_duplicate=True),
+    dash.dependencies.Input('pdb-id', 'n_submit'),
+    dash.dependencies.Input('pdb-id-load', 'n_clicks'),
+    dash.dependencies.State('pdb-id', 'value'),
+    prevent_initial_call=True,
+)
+def load_pdb_id(n_submit, n_clicks, pdb_id):
+    path = lookup(pdb_id)
+    if path is None:
+        return dash.no_update, dash.no_update, html.Div(f"*{pdb_id} was not found in the local PDB mirror.")
+    return f"{MIRROR_PREFIX}{normalize_id(pdb_id)}", os.path.basename(path), None
 
 if __name__ == "__main__":
     #app.run_server(debug=True, dev_tools_ui=False)
@@ -0,0 +1,107 @@
+// Large structure files skip dcc.Upload (which base64-encodes the whole file
+// in memory) and are sent in chunks to the resumable /uploads endpoint. The
+// finished upload is handed to the upload callback as 'chunked:<upload id>'.
+(function () {
+    var MAX_RETRIES = 5;
+
+    function config() {
+        var element = document.getElementById('chunked-upload');
+        return element ? element.dataset : null;
+    }
+
+    function showMessage(text) {
+        if (window.dash_clientside && window.dash_clientside.set_props) {
+            window.dash_clientside.set_props('upload-message', {children: text});
+        }
+    }
+
+    function wait(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    async function request(url, options) {
+        var response = await fetch(url, options);
+        var body = await response.json();
+        return {status: response.status, ok: response.ok, body: body};
+    }
+
+    async function uploadFile(file, settings) {
+        var created = await request(settings.url, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size})
+        });
+        if (!created.ok) {
+            throw new Error(created.body.error);
+        }
+
+        var uploadUrl = settings.url + '/' + created.body.upload_id;
+        var chunkSize = created.body.chunk_size || parseInt(settings.chunkSize, 10);
+        var offset = 0;
+        var retries = 0;
+
+        while (offset < file.size) {
+            showMessage('Uploading ' + file.name + ' ' + Math.floor(100 * offset / file.size) + '%');
+            try {
+                var result = await request(uploadUrl, {
+                    method: 'PATCH',
+                    headers: {'Upload-Offset': String(offset), 'Content-Type': 'application/octet-stream'},
+                    body: file.slice(offset, offset + chunkSize)
+                });
+                if (result.status === 409) {
+                    // Out of step with the server (e.g. a retried chunk that did arrive).
+                    result = await request(uploadUrl, {method: 'GET'});
+                }
+                if (!result.ok) {
+                    throw Object.assign(new Error(result.body.error), {fatal: result.status !== 409});
+                }
+                offset = result.body.offset;
+                retries = 0;
+            } catch (error) {
+                if (error.fatal || ++retries > MAX_RETRIES) {
+                    throw error;
+                }
+                await wait(500 * Math.pow(2, retries));
+                var status = await request(uploadUrl, {method: 'GET'});
+                offset = status.body.offset;
+            }
+        }
+        return created.body.upload_id;
+    }
+
+    function intercept(event, file) {
+        var settings = config();
+        if (!settings || !file || file.size <= parseInt(settings.threshold, 10)) {
+            return;
+        }
+        event.preventDefault();
+        event.stopImmediatePropagation();
+
+        if (file.size > parseInt(settings.maxSize, 10)) {
+            showMessage('*File is larger than ' + settings.maxSize + ' bytes.');
+            return;
+        }
+        uploadFile(file, settings).then(function (uploadId) {
+            showMessage(null);
+            window.dash_clientside.set_props('upload-data', {filename: file.name, contents: 'chunked:' + uploadId});
+        }).catch(function (error) {
+            showMessage('*Upload failed: ' + error.message);
+        });
+    }
+
+    document.addEventListener('change', function (event) {
+        var target = event.target;
+        if (target.type === 'file' && target.closest('#upload-data') && target.files.length) {
+            intercept(event, target.files[0]);
+            if (event.defaultPrevented) {
+                target.value = '';
+            }
+        }
+    }, true);
+
+    document.addEventListener('drop', function (event) {
+        if (event.target.closest && event.target.closest('#upload-data') && event.dataTransfer.files.length) {
+            intercept(event, event.dataTransfer.files[0]);
+        }
+    }, true);
+})();
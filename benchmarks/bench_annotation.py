@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import sys
+
+from rnapolis import annotator
+from rnapolis.tertiary import Residue3D
+
+from benchmarks.bench_pipeline import file_ext, measure, read_fixture, rnapolis_parse
+from benchmarks.scaling import synthetic_bytes
+from rnagraph.parallel_annotation import extract_base_interactions
+
+FIXTURES = ['tests/sample.cif']
+SYNTHETIC_SIZES = [2000, 8000]
+WORKERS = [2, 4, 8]
+
+
+def reset_caches(structure):
+    # Residue3D caches base normals and the like on first use; clear them so
+    # every run, serial or parallel, starts from a freshly parsed structure.
+    fields = Residue3D.__dataclass_fields__
+    for residue in structure.residues:
+        for name in [name for name in vars(residue) if name not in fields]:
+            del residue.__dict__[name]
+
+
+def run(fixtures=None, sizes=None, workers=None, repeat=3, warmup=1, log=print):
+    inputs = [(path, read_fixture(path), file_ext(path)) for path in (FIXTURES if fixtures is None else fixtures)]
+    inputs += [(f"synthetic-{size}", synthetic_bytes(size, 'pdb'), 'pdb') for size in (SYNTHETIC_SIZES if sizes is None else sizes)]
+
+    results = []
+    for name, decoded, ext in inputs:
+        structure = rnapolis_parse(decoded, ext)
+
+        def single_pass():
+            reset_caches(structure)
+            return annotator.extract_base_interactions(structure)
+
+        expected = single_pass()
+        row = {'input': name, 'residues': len(structure.residues), 'cpus': os.cpu_count(), 'stages': {}}
+        row['stages']['single_pass'] = measure(single_pass, repeat, warmup)
+        log(f"{name} ({len(structure.residues)} residues, {os.cpu_count()} CPUs)")
+        log(f"  {'single_pass':12s} {row['stages']['single_pass']['median'] * 1000:10.2f} ms")
+
+        for count in (WORKERS if workers is None else workers):
+            def parallel():
+                reset_caches(structure)
+                return extract_base_interactions(structure, workers=count, min_residues=0)
+
+            if parallel() != expected:
+                raise AssertionError(f"{count} workers annotated {name} differently from a single pass")
+            stats = measure(parallel, repeat, warmup)
+            row['stages'][f"workers_{count}"] = stats
+            speedup = row['stages']['single_pass']['median'] / stats['median']
+            log(f"  {f'workers_{count}':12s} {stats['median'] * 1000:10.2f} ms  {speedup:5.2f}x")
+        results.append(row)
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Benchmark parallel base-interaction annotation against a single pass.')
+    arg_parser.add_argument('--fixture', action='append', dest='fixtures', help='fixture path (repeatable, default: bundled fixtures)')
+    arg_parser.add_argument('--size', action='append', dest='sizes', type=int, help='synthetic structure size in nucleotides (repeatable)')
+    arg_parser.add_argument('--workers', action='append', type=int, help='worker count to measure (repeatable, default: 2, 4 and 8)')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--warmup', type=int, default=1)
+    arg_parser.add_argument('--save', help='write the results to this JSON file')
+    args = arg_parser.parse_args(argv)
+
+    results = run(args.fixtures, args.sizes, args.workers, args.repeat, args.warmup)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
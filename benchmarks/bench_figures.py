@@ -0,0 +1,182 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+
+from app import calculate_interactions
+from benchmarks.bench_pipeline import as_browser_json, biopython_parse, file_ext, measure, read_fixture
+from benchmarks.scaling import synthetic_bytes
+from rnagraph.pipeline import collect_centroids, color_map
+from rnagraph.figures import base_figure, interaction_traces, rna_nucleotides, dna_nucleotides
+
+FIXTURES = ['tests/sample.pdb', 'tests/sample.cif', 'tests/large_file.pdb']
+SYNTHETIC_SIZES = [1000, 4000]
+
+
+# graph_objects reference: the figure code update_rna_graph and
+# create_interaction_lines used before the dict builders.
+
+def go_base_figure(points_array, nucleotide_info, heteroatoms_array, heteroatom_info, colors):
+    fig = go.Figure(data=[go.Scatter3d(
+        name='nucleotides',
+        x=points_array[:, 0],
+        y=points_array[:, 1],
+        z=points_array[:, 2],
+        mode='markers',
+        marker=dict(size=8, color=colors, opacity=1.0, line=dict(color='white', width=0.5)),
+        hoverinfo='text',
+        hovertemplate="Nucleotide: %{customdata[0]} %{customdata[4]}<br>Chain: %{customdata[1]}<br>Coordinates:<br> x: %{customdata[2][0]:.2f}<br> y: %{customdata[2][1]:.2f}<br> z: %{customdata[2][2]:.2f}<extra></extra>",
+        customdata=[
+            [nucleotide['Nucleotide'], nucleotide['Chain_id'], nucleotide['Coordinate'], nucleotide['Color'], nucleotide['Nucleotide_id']]
+            for nucleotide in nucleotide_info
+        ],
+    )])
+
+    if heteroatoms_array is not None:
+        fig.add_trace(go.Scatter3d(
+            name='heteroatoms',
+            x=heteroatoms_array[:, 0],
+            y=heteroatoms_array[:, 1],
+            z=heteroatoms_array[:, 2],
+            mode='markers',
+            marker=dict(size=6, color='black', opacity=0.8, line=dict(color='black', width=0.5)),
+            hoverinfo='text',
+            hovertemplate="Heteroatom: %{customdata[0]}<br>Chain: %{customdata[1]}<br>Coordinates:<br>x: %{customdata[2][0]:.2f}<br>y: %{customdata[2][1]:.2f}<br>z: %{customdata[2][2]:.2f}<extra></extra>",
+            customdata=[
+                [heteroatom['Nucleotide'], heteroatom['Chain_id'], heteroatom['Coordinate'], heteroatom['Color'], heteroatom['Nucleotide_id']]
+                for heteroatom in heteroatom_info
+            ],
+            visible=False
+        ))
+    fig.update_scenes(xaxis_showspikes=False, yaxis_showspikes=False, zaxis_showspikes=False)
+    fig.update_layout(
+        autosize=True,
+        scene=dict(xaxis=dict(visible=False), yaxis=dict(visible=False), zaxis=dict(visible=False)),
+        margin=dict(l=0, r=0, t=0, b=0),
+        height=610,
+        paper_bgcolor='#fafafb',
+        clickmode='event+select',
+        dragmode="select",
+        newselection_mode="gradual",
+        showlegend=False
+    )
+    return fig
+
+
+def go_interaction_lines(interaction_list, nucleotide_info=None, heteroatom_info=None, interaction_type=None):
+    lines_styles = {
+        'nc_base_base': {'color': 'black', 'width': 2, 'dash': None},
+        'c_base_base': {'color': 'blue', 'width': 2, 'dash': None},
+        'phosphodiester': {'color': 'green', 'width': 6, 'dash': 'longdash'},
+        'stacking': {'color': 'orange', 'width': 6, 'dash': 'longdash'}
+    }
+
+    def find(nt, residues):
+        return next(residue for residue in residues if residue[4] == nt['auth']['number'] and residue[1] == nt['auth']['chain'] and residue[0] == nt['auth']['name'])
+
+    if not interaction_list:
+        return None
+    lines = []
+    for pair in interaction_list:
+        infos = []
+        for nt in [pair['nt1'], pair['nt2']]:
+            try:
+                if nt['auth']['name'] not in rna_nucleotides and nt['auth']['name'] not in dna_nucleotides:
+                    infos.append(find(nt, heteroatom_info) if heteroatom_info is not None else None)
+                else:
+                    infos.append(find(nt, nucleotide_info))
+            except StopIteration:
+                infos.append(None)
+            if infos[-1] is None:
+                break
+        if len(infos) < 2 or infos[1] is None:
+            continue
+
+        style = lines_styles.get(interaction_type, {'color': 'black', 'width': 1, 'dash': None})
+        lines.append(go.Scatter3d(
+            x=[infos[0][2][0], infos[1][2][0]],
+            y=[infos[0][2][1], infos[1][2][1]],
+            z=[infos[0][2][2], infos[1][2][2]],
+            mode='lines',
+            hoverinfo='none',
+            showlegend=False,
+            name=interaction_type,
+            line=dict(color=style['color'], width=style['width'], dash=style['dash']),
+        ))
+    return lines if lines else None
+
+
+def figure_inputs(decoded, ext):
+    points, nucleotide_info, heteroatoms, heteroatom_info = collect_centroids(biopython_parse(decoded, ext))
+    colors = [color_map.get(nucleotide['Nucleotide'], 'rgb(16, 16, 16)') for nucleotide in nucleotide_info]
+    points_array = np.array(points)
+    heteroatoms_array = np.array(heteroatoms) if heteroatoms else None
+    interactions = as_browser_json(calculate_interactions(decoded, ext) or {})
+    return points_array, nucleotide_info, heteroatoms_array, heteroatom_info, colors, interactions
+
+
+def builders(inputs):
+    points_array, nucleotide_info, heteroatoms_array, heteroatom_info, colors, interactions = inputs
+    nucleotide_data = as_browser_json([[n['Nucleotide'], n['Chain_id'], n['Coordinate'], n['Color'], n['Nucleotide_id']] for n in nucleotide_info])
+    heteroatom_data = as_browser_json([[h['Nucleotide'], h['Chain_id'], h['Coordinate'], h['Color'], h['Nucleotide_id']] for h in heteroatom_info]) if heteroatom_info else None
+
+    def go_figure():
+        fig = go_base_figure(points_array, nucleotide_info, heteroatoms_array, heteroatom_info, colors)
+        for interaction_type, interaction_list in interactions.items():
+            fig.add_traces(go_interaction_lines(interaction_list, nucleotide_data, heteroatom_data, interaction_type) or [])
+        return fig
+
+    def dict_figure():
+        fig = base_figure(points_array, nucleotide_info, heteroatoms_array, heteroatom_info, colors)
+        for interaction_type, interaction_list in interactions.items():
+            fig['data'].extend(interaction_traces(interaction_list, nucleotide_data, heteroatom_data, interaction_type) or [])
+        return fig
+
+    return {
+        'go': go_figure,
+        'dict': dict_figure,
+        'go+json': lambda: to_json_plotly(go_figure()),
+        'dict+json': lambda: to_json_plotly(dict_figure()),
+    }
+
+
+def run(fixtures=None, sizes=None, repeat=5, warmup=1, log=print):
+    inputs = [(path, read_fixture(path), file_ext(path)) for path in (FIXTURES if fixtures is None else fixtures)]
+    inputs += [(f"synthetic-{size}", synthetic_bytes(size, 'pdb'), 'pdb') for size in (SYNTHETIC_SIZES if sizes is None else sizes)]
+
+    results = []
+    for name, decoded, ext in inputs:
+        figure_input = figure_inputs(decoded, ext)
+        if figure_input[0].size == 0:
+            log(f"{name:28s} no nucleotides, nothing to draw")
+            continue
+        row = {'input': name, 'nucleotides': len(figure_input[1]), 'builders': {}}
+        for builder, func in builders(figure_input).items():
+            row['builders'][builder] = measure(func, repeat, warmup)
+        results.append(row)
+        timings = '  '.join(f"{builder} {stats['median'] * 1000:8.2f} ms" for builder, stats in row['builders'].items())
+        log(f"{name:28s} {row['nucleotides']:6d} nt  {timings}")
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Compare graph_objects and plain-dict construction of the RNA graph figure.')
+    arg_parser.add_argument('--fixture', action='append', dest='fixtures', help='fixture path (repeatable, default: bundled fixtures)')
+    arg_parser.add_argument('--size', action='append', dest='sizes', type=int, help='synthetic structure size in nucleotides (repeatable)')
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--warmup', type=int, default=1)
+    arg_parser.add_argument('--save', help='write the results to this JSON file')
+    args = arg_parser.parse_args(argv)
+
+    results = run(args.fixtures, args.sizes, args.repeat, args.warmup)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import argparse
+import json
+import sys
+
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+
+from app import calculate_interactions
+from benchmarks.bench_figures import builders, figure_inputs
+from benchmarks.bench_pipeline import file_ext, measure, read_fixture
+from benchmarks.scaling import synthetic_bytes
+from rnagraph import json_engine
+
+FIXTURES = ['tests/sample.pdb', 'tests/sample.cif', 'tests/large_file.pdb']
+SYNTHETIC_SIZES = [4000, 8000]
+
+
+def payloads(decoded, ext):
+    # The two large callback responses: the full RNA graph figure with every
+    # interaction layer, and the interactions sent to the processed-data store.
+    figure_input = figure_inputs(decoded, ext)
+    figure = builders(figure_input)['dict']() if figure_input[0].size else None
+    return {'figure': figure, 'interactions': calculate_interactions(decoded, ext)}
+
+
+def encoders(engines):
+    def encode(engine):
+        def func(value):
+            previous = pio.json.config.default_engine
+            json_engine.configure_json_engine(engine=engine)
+            try:
+                return to_json_plotly(json_engine.jsonable(value))
+            finally:
+                pio.json.config.default_engine = previous
+        return func
+    return {engine: encode(engine) for engine in engines}
+
+
+def run(fixtures=None, sizes=None, engines=None, repeat=5, warmup=1, log=print):
+    inputs = [(path, read_fixture(path), file_ext(path)) for path in (FIXTURES if fixtures is None else fixtures)]
+    inputs += [(f"synthetic-{size}", synthetic_bytes(size, 'pdb'), 'pdb') for size in (SYNTHETIC_SIZES if sizes is None else sizes)]
+    engines = engines or (['json', 'orjson'] if json_engine.orjson is not None else ['json'])
+
+    results = []
+    for name, decoded, ext in inputs:
+        for payload, value in payloads(decoded, ext).items():
+            if value is None:
+                continue
+            row = {'input': name, 'payload': payload, 'engines': {}}
+            for engine, encode in encoders(engines).items():
+                stats = measure(lambda: encode(value), repeat, warmup)
+                stats['bytes'] = len(encode(value).encode())
+                row['engines'][engine] = stats
+            results.append(row)
+            timings = '  '.join(f"{engine} {stats['median'] * 1000:8.2f} ms {stats['bytes'] / 1024:9.1f} KiB" for engine, stats in row['engines'].items())
+            log(f"{name:22s} {payload:12s} {timings}")
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Compare JSON engines on the largest Dash callback responses.')
+    arg_parser.add_argument('--fixture', action='append', dest='fixtures', help='fixture path (repeatable, default: bundled fixtures)')
+    arg_parser.add_argument('--size', action='append', dest='sizes', type=int, help='synthetic structure size in nucleotides (repeatable)')
+    arg_parser.add_argument('--engine', action='append', dest='engines', choices=['json', 'orjson'])
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--warmup', type=int, default=1)
+    arg_parser.add_argument('--save', help='write the results to this JSON file')
+    args = arg_parser.parse_args(argv)
+
+    results = run(args.fixtures, args.sizes, args.engines, args.repeat, args.warmup)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import plotly
+from plotly.io.json import to_json_plotly
+
+from rnagraph.backbone import backbone_traces
+from rnagraph.ensemble import Ensemble
+from rnagraph.heteroatoms import HETEROATOM_CLASSES, classify_heteroatoms, heteroatom_class_trace
+from rnagraph.interaction_diff import interaction_diff
+from rnagraph.network import network_figure, network_layout
+from rnagraph.spatial import structure_index
+from rnagraph.pipeline import (
+    annotate, build_figure, centroids, check_nucleotide_type_and_completeness, classify_residues, extract_structure_name,
+    interaction_layer, read_rnapolis, read_structure,
+)
+
+FIXTURES = [
+    'tests/sample.pdb',
+    'tests/sample.cif',
+    'tests/small_file.cif',
+    'tests/large_file.pdb',
+]
+
+STAGES = [
+    'validation',
+    'name_extraction',
+    'rnapolis_parse',
+    'annotation',
+    'biopython_parse',
+    'residue_classification',
+    'centroid_build',
+    'interaction_lines',
+    'figure_serialization',
+    'network_view',
+    'ensemble',
+    'interaction_diff',
+    'backbone_layer',
+    'heteroatom_classes',
+]
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+
+def read_fixture(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def file_ext(path):
+    return path.split('.')[-1].lower()
+
+
+def biopython_parse(decoded, ext):
+    return read_structure(decoded, ext, 'bench')
+
+
+def rnapolis_parse(decoded, ext):
+    return read_rnapolis(decoded, ext)
+
+
+def as_browser_json(value):
+    # Callback inputs arrive from the browser as plain JSON, not as the
+    # Python objects the server produced.
+    return json.loads(to_json_plotly(value))
+
+
+def build_stages(path):
+    return build_stages_from_bytes(read_fixture(path), file_ext(path), os.path.basename(path))
+
+
+def build_stages_from_bytes(decoded, ext, filename):
+    # The rnagraph.pipeline stages one by one, each from the previous
+    # stage's output.
+    rnapolis_structure = rnapolis_parse(decoded, ext)
+    biopython_structure = biopython_parse(decoded, ext)
+    classified = classify_residues(biopython_structure)
+    residues = centroids(*classified)
+    interactions = as_browser_json(annotate(rnapolis_structure))
+
+    figure = build_figure(residues) or {'data': [], 'layout': {}}
+    traces = as_browser_json(figure).get('data', [])
+    nucleotide_info = traces[0]['customdata'] if traces else []
+    heteroatom_info = traces[1]['customdata'] if len(traces) > 1 and traces[1].get('name') == 'heteroatoms' else None
+
+    def interaction_lines():
+        lines = []
+        for interaction_type, interaction_list in interactions.items():
+            lines.extend(interaction_layer(interaction_type, interaction_list, nucleotide_info, heteroatom_info))
+        return lines
+
+    figure = {**figure, 'data': figure['data'] + interaction_lines()}
+
+    return {
+        'validation': lambda: check_nucleotide_type_and_completeness(decoded, ext),
+        'name_extraction': lambda: extract_structure_name(decoded, ext),
+        'rnapolis_parse': lambda: rnapolis_parse(decoded, ext),
+        'annotation': lambda: annotate(rnapolis_structure),
+        'biopython_parse': lambda: biopython_parse(decoded, ext),
+        'residue_classification': lambda: classify_residues(biopython_structure),
+        'centroid_build': lambda: centroids(*classified),
+        'interaction_lines': interaction_lines,
+        'figure_serialization': lambda: to_json_plotly(figure),
+        'network_view': lambda: to_json_plotly(network_figure(network_layout(residues[1], interactions), residues[1], interactions)),
+        'ensemble': lambda: Ensemble(list(biopython_structure)),
+        # Against every other interaction of each type, so half are lost.
+        'interaction_diff': lambda: interaction_diff(interactions, {name: records[::2] for name, records in interactions.items()}),
+        'backbone_layer': lambda: backbone_traces(structure_index(biopython_structure), nucleotide_info, heteroatom_info),
+        'heteroatom_classes': lambda: heteroatom_classes(structure_index(biopython_structure)),
+    }
+
+
+def heteroatom_classes(index):
+    classes = classify_heteroatoms(index)
+    return [heteroatom_class_trace(index, classes, name) for name in HETEROATOM_CLASSES]
+
+
+def measure(func, repeat, warmup):
+    for _ in range(warmup):
+        func()
+
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'median': statistics.median(times),
+        'min': min(times),
+        'max': max(times),
+        'repeat': repeat,
+        'peak_memory': peak,
+    }
+
+
+def environment():
+    import Bio
+    import dash
+    import rnapolis
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+        'dash': dash.__version__,
+        'biopython': Bio.__version__,
+        'rnapolis': getattr(rnapolis, '__version__', 'unknown'),
+    }
+
+
+def run(fixtures=None, stages=None, repeat=5, warmup=1, log=print):
+    fixtures = fixtures or FIXTURES
+    stages = stages or STAGES
+    results = {}
+
+    for path in fixtures:
+        stage_funcs = build_stages(path)
+        results[path] = {'size': os.path.getsize(path), 'stages': {}}
+        for stage in stages:
+            result = measure(stage_funcs[stage], repeat, warmup)
+            results[path]['stages'][stage] = result
+            log(f"{path:28s} {stage:22s} {result['median'] * 1000:10.2f} ms {result['peak_memory'] / 1024:10.0f} KB")
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'repeat': repeat,
+        'warmup': warmup,
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.2, min_delta=0.001):
+    regressions = []
+    rows = []
+
+    for path, fixture in current['results'].items():
+        base_fixture = baseline['results'].get(path)
+        if base_fixture is None:
+            continue
+        for stage, result in fixture['stages'].items():
+            base = base_fixture['stages'].get(stage)
+            if base is None:
+                continue
+            ratio = result['median'] / base['median'] if base['median'] else float('inf')
+            delta = result['median'] - base['median']
+            regressed = ratio > 1 + threshold and delta > min_delta
+            row = {
+                'fixture': path,
+                'stage': stage,
+                'baseline': base['median'],
+                'current': result['median'],
+                'ratio': ratio,
+                'regressed': regressed,
+            }
+            rows.append(row)
+            if regressed:
+                regressions.append(row)
+
+    return rows, regressions
+
+
+def baseline_path(name):
+    if name.endswith('.json') or os.sep in name:
+        return name
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save(report, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Benchmark the RNA Graph pipeline stages over the bundled fixtures.')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks and save a JSON baseline')
+    run_parser.add_argument('--save', default='baseline', help='baseline name or path (default: baseline)')
+
+    compare_parser = commands.add_parser('compare', help='run the benchmarks and compare against a saved baseline')
+    compare_parser.add_argument('baseline', help='baseline name or path')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown as a fraction (default: 0.2)')
+    compare_parser.add_argument('--min-delta', type=float, default=0.001, help='ignore slowdowns smaller than this many seconds')
+    compare_parser.add_argument('--save', help='also save the current run under this name or path')
+
+    for sub in [run_parser, compare_parser]:
+        sub.add_argument('--fixture', action='append', dest='fixtures', help='fixture path (repeatable, default: all bundled fixtures)')
+        sub.add_argument('--stage', action='append', dest='stages', choices=STAGES, help='stage to run (repeatable, default: all)')
+        sub.add_argument('--repeat', type=int, default=5)
+        sub.add_argument('--warmup', type=int, default=1)
+
+    args = arg_parser.parse_args(argv)
+    report = run(args.fixtures, args.stages, args.repeat, args.warmup)
+
+    if args.command == 'run':
+        path = baseline_path(args.save)
+        save(report, path)
+        print(f"Saved baseline to {path}")
+        return 0
+
+    if args.save:
+        save(report, baseline_path(args.save))
+
+    rows, regressions = compare(load(baseline_path(args.baseline)), report, args.threshold, args.min_delta)
+    for row in rows:
+        flag = 'REGRESSION' if row['regressed'] else ''
+        print(f"{row['fixture']:28s} {row['stage']:22s} {row['baseline'] * 1000:10.2f} -> {row['current'] * 1000:10.2f} ms  x{row['ratio']:.2f} {flag}")
+    print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from benchmarks.bench_pipeline import biopython_parse, file_ext, measure, read_fixture
+from benchmarks.scaling import synthetic_bytes
+from rnagraph.contacts import ligand_contacts
+from rnagraph.spatial import DEFAULT_CELL_SIZE, KDTree, SpatialIndex, StructureIndex, atom_table
+
+FIXTURES = ['tests/sample.cif']
+# 8000 nucleotides is ~170k atoms, the size of a full ribosome.
+SYNTHETIC_SIZES = [2000, 8000]
+QUERIES = 1000
+
+
+def query_points(coords, count, seed=0):
+    rng = np.random.default_rng(seed)
+    return coords[rng.integers(0, len(coords), size=min(count, len(coords)))]
+
+
+def scan_radius(coords, point, radius):
+    # What a query costs without an index: one pass over every atom.
+    return np.flatnonzero(np.linalg.norm(coords - point, axis=1) <= radius)
+
+
+def cases(coords, cell_size, radius, pair_radius, k):
+    points = query_points(coords, QUERIES)
+    index = SpatialIndex(coords, cell_size)
+    stages = {
+        'build_grid': lambda: SpatialIndex(coords, cell_size),
+        'radius_grid': lambda: [index.radius(point, radius) for point in points],
+        'radius_grid_bulk': lambda: index.query_radius(points, radius),
+        'radius_scan': lambda: [scan_radius(coords, point, radius) for point in points],
+        'nearest_grid': lambda: [index.nearest(point, k) for point in points],
+        'pairs_grid': lambda: index.pairs(pair_radius),
+    }
+    if KDTree is not None:
+        tree = index.kdtree()
+        stages.update({
+            'build_kdtree': lambda: KDTree(coords, 10),
+            'radius_kdtree': lambda: [tree.search(point, radius) for point in points],
+            'pairs_kdtree': lambda: tree.neighbor_search(pair_radius),
+        })
+    return stages
+
+
+def run(fixtures=None, sizes=None, cell_size=DEFAULT_CELL_SIZE, radius=8.0, pair_radius=4.0, k=10, repeat=3, warmup=1, log=print):
+    inputs = [(path, read_fixture(path), file_ext(path)) for path in (FIXTURES if fixtures is None else fixtures)]
+    inputs += [(f"synthetic-{size}", synthetic_bytes(size, 'pdb'), 'pdb') for size in (SYNTHETIC_SIZES if sizes is None else sizes)]
+
+    results = []
+    for name, decoded, ext in inputs:
+        structure = biopython_parse(decoded, ext)
+        coords = atom_table(structure)['coord']
+        row = {'input': name, 'atoms': len(coords), 'stages': {}}
+        row['stages']['atom_table'] = measure(lambda: atom_table(structure), repeat, warmup)
+        index = StructureIndex(structure, cell_size)
+        hetero_residues = sum(residue[4].startswith('H_') for residue in index.residues)
+        row['stages']['ligand_contacts'] = measure(lambda: ligand_contacts(index), repeat, warmup)
+        for stage, func in cases(coords, cell_size, radius, pair_radius, k).items():
+            row['stages'][stage] = measure(func, repeat, warmup)
+        results.append(row)
+        log(f"{name} ({len(coords)} atoms, {hetero_residues} heteroatom residues, {QUERIES} queries, radius {radius}, k {k}, pairs within {pair_radius})")
+        for stage, stats in row['stages'].items():
+            log(f"  {stage:16s} {stats['median'] * 1000:10.2f} ms")
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Benchmark the spatial index against KD-tree and linear scans.')
+    arg_parser.add_argument('--fixture', action='append', dest='fixtures', help='fixture path (repeatable, default: bundled fixtures)')
+    arg_parser.add_argument('--size', action='append', dest='sizes', type=int, help='synthetic structure size in nucleotides (repeatable)')
+    arg_parser.add_argument('--cell-size', type=float, default=DEFAULT_CELL_SIZE)
+    arg_parser.add_argument('--radius', type=float, default=8.0)
+    arg_parser.add_argument('--pair-radius', type=float, default=4.0)
+    arg_parser.add_argument('-k', type=int, default=10)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--warmup', type=int, default=1)
+    arg_parser.add_argument('--save', help='write the results to this JSON file')
+    args = arg_parser.parse_args(argv)
+
+    results = run(args.fixtures, args.sizes, args.cell_size, args.radius, args.pair_radius, args.k, args.repeat, args.warmup)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
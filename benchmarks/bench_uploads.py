@@ -0,0 +1,79 @@
+import argparse
+import base64
+import gzip
+import json
+import sys
+
+from app import check_nucleotide_type_and_completeness
+from benchmarks.bench_pipeline import FIXTURES, measure, read_fixture, file_ext
+from rnagraph.structure_io import decode_upload, mmcif_to_bcif
+
+VARIANTS = ['plain', 'gz', 'bcif', 'bcif.gz']
+
+
+def encode_variant(raw, ext, variant):
+    if variant == 'plain':
+        return raw, ext
+    if variant == 'gz':
+        return gzip.compress(raw), f"{ext}.gz"
+    if ext != 'cif':
+        return None, None
+    if variant == 'bcif':
+        return mmcif_to_bcif(raw), 'bcif'
+    return gzip.compress(mmcif_to_bcif(raw)), 'bcif.gz'
+
+
+def run(fixtures=None, variants=None, repeat=5, warmup=1, log=print):
+    results = []
+    for path in fixtures or FIXTURES:
+        raw = read_fixture(path)
+        ext = file_ext(path)
+        for variant in variants or VARIANTS:
+            payload, suffix = encode_variant(raw, ext, variant)
+            if payload is None:
+                continue
+            content_string = base64.b64encode(payload).decode()
+            filename = f"upload.{suffix}"
+
+            def decode():
+                return decode_upload(content_string, filename)
+
+            def decode_and_validate():
+                decoded, decoded_ext = decode_upload(content_string, filename)
+                return check_nucleotide_type_and_completeness(decoded, decoded_ext)
+
+            decode_stats = measure(decode, repeat, warmup)
+            validate_stats = measure(decode_and_validate, repeat, warmup)
+            row = {
+                'fixture': path,
+                'variant': variant,
+                'file_bytes': len(payload),
+                'upload_bytes': len(content_string),
+                'ratio': len(payload) / len(raw),
+                'decode': decode_stats,
+                'decode_and_validate': validate_stats,
+            }
+            results.append(row)
+            log(f"{path:28s} {variant:8s} {row['file_bytes'] / 1024:10.1f} KB {row['ratio']:6.2f}x "
+                f"decode {decode_stats['median'] * 1000:8.2f} ms  +validate {validate_stats['median'] * 1000:8.2f} ms")
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Compare upload sizes and decode times of plain, gzip and BinaryCIF structures.')
+    arg_parser.add_argument('--fixture', action='append', dest='fixtures', help='fixture path (repeatable, default: all bundled fixtures)')
+    arg_parser.add_argument('--variant', action='append', dest='variants', choices=VARIANTS, help='upload variant (repeatable, default: all)')
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--warmup', type=int, default=1)
+    arg_parser.add_argument('--save', help='write the results to this JSON file')
+    args = arg_parser.parse_args(argv)
+
+    results = run(args.fixtures, args.variants, args.repeat, args.warmup)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import time
+
+PATCH_KEY = '__dash_patch_update'
+
+
+def parse_output(output):
+    if output.startswith('..') and output.endswith('..'):
+        parts = output[2:-2].split('...')
+        multi = True
+    else:
+        parts = [output]
+        multi = False
+    specs = []
+    for part in parts:
+        component_id, prop = part.rsplit('.', 1)
+        specs.append({'id': component_id, 'property': prop})
+    return specs, multi
+
+
+def clean_property(prop):
+    return prop.split('@')[0]
+
+
+def prop_id(component_id, prop):
+    return f"{component_id}.{clean_property(prop)}"
+
+
+def walk_layout(node, props):
+    if isinstance(node, list):
+        for child in node:
+            walk_layout(child, props)
+        return
+    if not isinstance(node, dict) or 'props' not in node:
+        return
+    node_props = node['props']
+    component_id = node_props.get('id')
+    for name, value in node_props.items():
+        if component_id is not None and isinstance(component_id, str):
+            props.setdefault(prop_id(component_id, name), value)
+        if name == 'children' or isinstance(value, (dict, list)):
+            walk_layout(value, props)
+
+
+class Callback:
+    def __init__(self, spec, name=None):
+        self.output = spec['output']
+        self.outputs, self.multi = parse_output(spec['output'])
+        self.inputs = spec['inputs']
+        self.state = spec.get('state', [])
+        self.prevent_initial_call = spec.get('prevent_initial_call', False)
+        self.clientside = bool(spec.get('clientside_function'))
+        self.name = name or self.outputs[0]['id'] + '.' + clean_property(self.outputs[0]['property'])
+        self.input_ids = [prop_id(item['id'], item['property']) for item in self.inputs]
+
+    def body(self, props, changed):
+        def values(items):
+            return [
+                {'id': item['id'], 'property': item['property'], 'value': props.get(prop_id(item['id'], item['property']))}
+                for item in items
+            ]
+
+        return {
+            'output': self.output,
+            'outputs': self.outputs if self.multi else self.outputs[0],
+            'inputs': values(self.inputs),
+            'state': values(self.state),
+            'changedPropIds': [item for item in self.input_ids if item in changed],
+        }
+
+
+class DashSession:
+    # A small stand-in for the Dash renderer: it tracks component props,
+    # fires the server callbacks a property change triggers and follows the
+    # chain of callbacks their outputs trigger in turn.
+
+    def __init__(self, post, dependencies, layout, names=None, max_chain=50):
+        self.post = post
+        names = names or {}
+        self.callbacks = [Callback(spec, names.get(spec['output'])) for spec in dependencies]
+        self.callbacks = [callback for callback in self.callbacks if not callback.clientside]
+        self.props = {}
+        self.max_chain = max_chain
+        walk_layout(layout, self.props)
+
+    def set_props(self, values, trigger=True):
+        self.props.update(values)
+        if not trigger:
+            return []
+        return self.run_triggered(set(values))
+
+    def run_triggered(self, changed, source=None):
+        results = []
+        queue = [(callback, changed) for callback in self.triggered_by(changed, source)]
+        while queue and len(results) < self.max_chain:
+            callback, changed_props = queue.pop(0)
+            result = self.call(callback, changed_props)
+            results.append(result)
+            if result['changed']:
+                queue.extend((other, result['changed']) for other in self.triggered_by(result['changed'], callback))
+            if result['new_layout']:
+                queue.extend((other, set()) for other in self.initial_callbacks(result['new_layout']))
+        return results
+
+    def triggered_by(self, changed, source=None):
+        return [callback for callback in self.callbacks if callback is not source and changed.intersection(callback.input_ids)]
+
+    def initial_callbacks(self, new_props):
+        new_ids = {key.rsplit('.', 1)[0] for key in new_props}
+        return [
+            callback for callback in self.callbacks
+            if not callback.prevent_initial_call and new_ids.intersection(item['id'] for item in callback.inputs)
+        ]
+
+    def call(self, callback, changed):
+        body = callback.body(self.props, changed)
+        start = time.perf_counter()
+        status, payload, size = self.post(body)
+        elapsed = time.perf_counter() - start
+
+        updated = set()
+        new_layout = set()
+        if status == 200 and payload:
+            for component_id, component_props in payload.get('response', {}).items():
+                for name, value in component_props.items():
+                    if isinstance(value, dict) and PATCH_KEY in value:
+                        continue
+                    key = prop_id(component_id, name)
+                    self.props[key] = value
+                    updated.add(key)
+                    if name == 'children':
+                        before = set(self.props)
+                        walk_layout(value, self.props)
+                        new_layout.update(set(self.props) - before)
+
+        return {
+            'callback': callback.name,
+            'status': status,
+            'error': status >= 400,
+            'elapsed': elapsed,
+            'bytes': size,
+            'changed': updated,
+            'new_layout': new_layout,
+        }
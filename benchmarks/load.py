@@ -0,0 +1,191 @@
+import argparse
+import base64
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from benchmarks.dash_client import DashSession
+
+DEFAULT_STRUCTURE = 'tests/sample.cif'
+
+
+def data_url(path):
+    with open(path, 'rb') as f:
+        return f"data:application/octet-stream;base64,{base64.b64encode(f.read()).decode()}"
+
+
+def click_first_nucleotide(props):
+    figure = props.get('rna-graph.figure') or {}
+    traces = figure.get('data') or []
+    if not traces or not traces[0].get('customdata'):
+        return None
+    customdata = traces[0]['customdata']
+    return {'points': [{'customdata': customdata[len(customdata) // 2]}]}
+
+
+def default_scenario(structure_path):
+    # One browser session: upload on the Mol* page, open the RNA graph,
+    # toggle interaction layers, click a nucleotide and restyle.
+    contents = data_url(structure_path)
+    filename = os.path.basename(structure_path)
+    return [
+        ('load', {'url.pathname': '/', '_pages_location.pathname': '/', '_pages_location.search': ''}, True),
+        ('upload', {'upload-data.filename': filename}, False),
+        ('upload', {'upload-data.contents': contents}, True),
+        ('navigate', {'url.pathname': '/page-2', '_pages_location.pathname': '/page-2'}, True),
+        ('interactions', {'interaction-type.value': ['c_base_base', 'stacking']}, True),
+        ('click', {'rna-graph.clickData': click_first_nucleotide}, True),
+        ('interactions', {'interaction-type.value': ['phosphodiester', 'c_base_base', 'nc_base_base', 'stacking']}, True),
+        ('restyle', {'canonical-color.value': 'red'}, True),
+        ('restyle', {'seq.n_clicks': 1}, True),
+        ('clear', {'clear-button.n_clicks': 1}, True),
+    ]
+
+
+def callback_names():
+    try:
+        import dash._callback
+        from app import app
+    except Exception:
+        return {}
+    callback_map = {**dash._callback.GLOBAL_CALLBACK_MAP, **app.callback_map}
+    return {output: getattr(entry.get('callback'), '__name__', output) for output, entry in callback_map.items()}
+
+
+class HttpTransport:
+    def __init__(self, base_url, timeout=300):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def get(self, path):
+        response = self.session.get(self.base_url + path, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def post(self, body):
+        try:
+            response = self.session.post(self.base_url + '/_dash-update-component', json=body, timeout=self.timeout)
+        except requests.RequestException:
+            return 599, None, 0
+        payload = response.json() if response.status_code == 200 else None
+        return response.status_code, payload, len(response.content)
+
+
+def run_session(base_url, scenario, names):
+    transport = HttpTransport(base_url)
+    session = DashSession(transport.post, transport.get('/_dash-dependencies'), transport.get('/_dash-layout'), names)
+    results = []
+    for step, values, trigger in scenario:
+        values = {key: value(session.props) if callable(value) else value for key, value in values.items()}
+        for result in session.set_props(values, trigger):
+            result['step'] = step
+            results.append(result)
+    return results
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None}
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+    return {'p50': p50, 'p95': p95, 'p99': p99}
+
+
+def summarize(results, wall_time):
+    by_callback = defaultdict(list)
+    for result in results:
+        by_callback[result['callback']].append(result)
+
+    summary = {}
+    for name, items in sorted(by_callback.items()):
+        summary[name] = {
+            'requests': len(items),
+            'errors': sum(1 for item in items if item['error']),
+            'error_rate': sum(1 for item in items if item['error']) / len(items),
+            'mean_bytes': sum(item['bytes'] for item in items) / len(items),
+            **percentiles([item['elapsed'] for item in items]),
+        }
+    return {
+        'requests': len(results),
+        'errors': sum(1 for result in results if result['error']),
+        'wall_time': wall_time,
+        'throughput': len(results) / wall_time if wall_time else 0,
+        'callbacks': summary,
+    }
+
+
+def run(base_url, sessions=8, concurrency=4, scenario=None, names=None):
+    scenario = scenario or default_scenario(DEFAULT_STRUCTURE)
+    names = callback_names() if names is None else names
+    results = []
+    failures = []
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_session, base_url, scenario, names) for _ in range(sessions)]
+        for future in futures:
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                failures.append(str(e))
+    report = summarize(results, time.perf_counter() - start)
+    report['sessions'] = sessions
+    report['concurrency'] = concurrency
+    report['failed_sessions'] = failures
+    return report
+
+
+def serve_in_thread(host='127.0.0.1', port=0):
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server(host, port, app.server, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def print_report(report):
+    print(f"{report['sessions']} sessions, concurrency {report['concurrency']}: "
+          f"{report['requests']} requests in {report['wall_time']:.1f} s ({report['throughput']:.1f} req/s), "
+          f"{report['errors']} errors, {len(report['failed_sessions'])} failed sessions")
+    print(f"{'callback':32s} {'n':>6s} {'p50 ms':>10s} {'p95 ms':>10s} {'p99 ms':>10s} {'errors':>8s} {'KB':>10s}")
+    for name, item in report['callbacks'].items():
+        print(f"{name[:32]:32s} {item['requests']:6d} {item['p50']:10.1f} {item['p95']:10.1f} {item['p99']:10.1f} "
+              f"{item['error_rate']:8.1%} {item['mean_bytes'] / 1024:10.1f}")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Replay realistic callback sequences against a running RNA Graph server.')
+    arg_parser.add_argument('--url', default='http://127.0.0.1:8050', help='server base URL')
+    arg_parser.add_argument('--serve', action='store_true', help='start app.server in this process instead of using --url')
+    arg_parser.add_argument('--structure', default=DEFAULT_STRUCTURE, help='structure file uploaded by every session')
+    arg_parser.add_argument('--sessions', type=int, default=8, help='total number of sessions')
+    arg_parser.add_argument('--concurrency', type=int, default=4, help='sessions running at the same time')
+    args = arg_parser.parse_args(argv)
+
+    server = None
+    base_url = args.url
+    if args.serve:
+        server, base_url = serve_in_thread()
+
+    try:
+        report = run(base_url, args.sessions, args.concurrency, default_scenario(args.structure))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print_report(report)
+    return 1 if report['errors'] or report['failed_sessions'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+from rnagraph.recording import load_session
+
+
+def replay(steps, client=None, track_memory=True):
+    if client is None:
+        from app import app
+        client = app.server.test_client()
+
+    results = []
+    for index, step in enumerate(steps):
+        if track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            response = client.post('/_dash-update-component', json=step['body'])
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+            if track_memory:
+                tracemalloc.stop()
+
+        results.append({
+            'step': index,
+            'callback': step.get('callback') or step['body'].get('output'),
+            'status': response.status_code,
+            'recorded_status': step.get('status'),
+            'mismatch': step.get('status') is not None and response.status_code != step['status'],
+            'elapsed': elapsed,
+            'peak_memory': peak,
+            'bytes': len(response.data),
+        })
+    return results
+
+
+def summarize(results):
+    by_callback = defaultdict(lambda: {'calls': 0, 'elapsed': 0.0, 'bytes': 0, 'peak_memory': 0})
+    for result in results:
+        item = by_callback[result['callback']]
+        item['calls'] += 1
+        item['elapsed'] += result['elapsed']
+        item['bytes'] += result['bytes']
+        item['peak_memory'] = max(item['peak_memory'], result['peak_memory'] or 0)
+    return {
+        'steps': len(results),
+        'elapsed': sum(result['elapsed'] for result in results),
+        'mismatches': sum(1 for result in results if result['mismatch']),
+        'callbacks': dict(by_callback),
+    }
+
+
+def compare(baseline, current, threshold=0.2, min_delta=0.005):
+    regressions = []
+    for name, item in current['callbacks'].items():
+        base = baseline['callbacks'].get(name)
+        if not base or not base['elapsed']:
+            continue
+        ratio = item['elapsed'] / base['elapsed']
+        if ratio > 1 + threshold and item['elapsed'] - base['elapsed'] > min_delta:
+            regressions.append({'callback': name, 'baseline': base['elapsed'], 'current': item['elapsed'], 'ratio': ratio})
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Replay a recorded callback session headlessly against the app callbacks.')
+    arg_parser.add_argument('session', help='recorded session (.jsonl written with RNAGRAPH_RECORD_DIR)')
+    arg_parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc (faster, no allocation figures)')
+    arg_parser.add_argument('--save', help='write the summary to this JSON file')
+    arg_parser.add_argument('--baseline', help='compare against a summary saved with --save')
+    arg_parser.add_argument('--threshold', type=float, default=0.2)
+    args = arg_parser.parse_args(argv)
+
+    results = replay(load_session(args.session), track_memory=not args.no_memory)
+    for result in results:
+        memory = f"{result['peak_memory'] / 1024:10.0f} KB" if result['peak_memory'] is not None else ''
+        flag = ' MISMATCH' if result['mismatch'] else ''
+        print(f"{result['step']:4d} {str(result['callback'])[:32]:32s} {result['status']:4d} "
+              f"{result['elapsed'] * 1000:10.1f} ms {result['bytes'] / 1024:10.1f} KB {memory}{flag}")
+
+    summary = summarize(results)
+    print(f"{summary['steps']} steps in {summary['elapsed'] * 1000:.1f} ms, {summary['mismatches']} status mismatches")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    status = 1 if summary['mismatches'] else 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), summary, args.threshold)
+        for item in regressions:
+            print(f"REGRESSION {item['callback']}: {item['baseline'] * 1000:.1f} -> {item['current'] * 1000:.1f} ms (x{item['ratio']:.2f})")
+        status = status or (1 if regressions else 0)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+
+from benchmarks.bench_pipeline import STAGES, build_stages_from_bytes, environment, measure
+from benchmarks.synthetic import generate, load_templates, write_mmcif, write_pdb
+
+SIZES = [250, 500, 1000, 2000, 4000, 8000]
+FORMATS = ['pdb', 'cif']
+NUCLEOTIDES_PER_CHAIN = 1500
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def synthetic_bytes(nucleotides, ext, models=1, ion_ratio=0.05, water_ratio=0.3, ligand_ratio=0.002, templates=None):
+    structure = generate(
+        nucleotides,
+        chains=math.ceil(nucleotides / NUCLEOTIDES_PER_CHAIN),
+        models=models,
+        ions=int(nucleotides * ion_ratio),
+        waters=int(nucleotides * water_ratio),
+        ligands=int(nucleotides * ligand_ratio),
+        templates=templates,
+    )
+    out = io.StringIO()
+    (write_pdb if ext == 'pdb' else write_mmcif)(structure, out)
+    return out.getvalue().encode('utf-8')
+
+
+def exponents(sizes, values, min_value):
+    # Local log-log slope between neighbouring sizes: ~1 is linear, ~2 quadratic.
+    result = []
+    for (n1, v1), (n2, v2) in zip(zip(sizes, values), zip(sizes[1:], values[1:])):
+        if v1 < min_value or v2 < min_value or v1 <= 0:
+            result.append(None)
+        else:
+            result.append(math.log(v2 / v1) / math.log(n2 / n1))
+    return result
+
+
+def superlinear_onset(sizes, values, tolerance=0.2, min_value=0.001):
+    for size, exponent in zip(sizes, exponents(sizes, values, min_value)):
+        if exponent is not None and exponent > 1 + tolerance:
+            return size
+    return None
+
+
+def run(sizes=None, formats=None, stages=None, models=1, repeat=3, warmup=0, log=print):
+    sizes = sorted(sizes or SIZES)
+    formats = formats or FORMATS
+    stages = stages or STAGES
+    templates = load_templates()
+    rows = []
+
+    for ext in formats:
+        for size in sizes:
+            decoded = synthetic_bytes(size, ext, models=models, templates=templates)
+            stage_funcs = build_stages_from_bytes(decoded, ext, f"synthetic.{ext}")
+            for stage in stages:
+                result = measure(stage_funcs[stage], repeat, warmup)
+                rows.append({
+                    'format': ext,
+                    'nucleotides': size,
+                    'bytes': len(decoded),
+                    'stage': stage,
+                    'median': result['median'],
+                    'peak_memory': result['peak_memory'],
+                })
+                log(f"{ext:4s} {size:7d} {stage:22s} {result['median'] * 1000:10.2f} ms {result['peak_memory'] / 1024:10.0f} KB")
+
+    summary = []
+    for ext in formats:
+        for stage in stages:
+            stage_rows = [row for row in rows if row['format'] == ext and row['stage'] == stage]
+            stage_sizes = [row['nucleotides'] for row in stage_rows]
+            times = [row['median'] for row in stage_rows]
+            memory = [row['peak_memory'] for row in stage_rows]
+            summary.append({
+                'format': ext,
+                'stage': stage,
+                'time_exponents': exponents(stage_sizes, times, 0.001),
+                'memory_exponents': exponents(stage_sizes, memory, 64 * 1024),
+                'time_superlinear_from': superlinear_onset(stage_sizes, times),
+                'memory_superlinear_from': superlinear_onset(stage_sizes, memory, min_value=64 * 1024),
+            })
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': environment(),
+        'sizes': sizes,
+        'models': models,
+        'repeat': repeat,
+        'rows': rows,
+        'summary': summary,
+    }
+
+
+def write_csv(report, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['format', 'nucleotides', 'bytes', 'stage', 'median', 'peak_memory'])
+        writer.writeheader()
+        writer.writerows(report['rows'])
+
+
+def plot(report, path):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed, skipping the plot")
+        return False
+
+    formats = sorted({row['format'] for row in report['rows']})
+    figure, axes = plt.subplots(len(formats), 2, figsize=(12, 4 * len(formats)), squeeze=False)
+    for row_axes, ext in zip(axes, formats):
+        for stage in STAGES:
+            stage_rows = [row for row in report['rows'] if row['format'] == ext and row['stage'] == stage]
+            if not stage_rows:
+                continue
+            sizes = [row['nucleotides'] for row in stage_rows]
+            row_axes[0].loglog(sizes, [row['median'] for row in stage_rows], marker='o', label=stage)
+            row_axes[1].loglog(sizes, [row['peak_memory'] / 1024 for row in stage_rows], marker='o', label=stage)
+        row_axes[0].set_title(f"{ext}: time (s)")
+        row_axes[1].set_title(f"{ext}: peak memory (KB)")
+        for ax in row_axes:
+            ax.set_xlabel('nucleotides')
+        row_axes[0].legend(fontsize='small')
+    figure.tight_layout()
+    figure.savefig(path)
+    return True
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Measure how each pipeline stage scales with synthetic structure size.')
+    arg_parser.add_argument('--size', type=int, action='append', dest='sizes', help='nucleotide count (repeatable)')
+    arg_parser.add_argument('--format', action='append', dest='formats', choices=FORMATS)
+    arg_parser.add_argument('--stage', action='append', dest='stages', choices=STAGES)
+    arg_parser.add_argument('--models', type=int, default=1)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--output', help='output path prefix (default: benchmarks/results/scaling-<time>)')
+    arg_parser.add_argument('--plot', action='store_true', help='also write a PNG plot (needs matplotlib)')
+    args = arg_parser.parse_args(argv)
+
+    report = run(args.sizes, args.formats, args.stages, args.models, args.repeat)
+
+    prefix = args.output or os.path.join(RESULTS_DIR, f"scaling-{time.strftime('%Y%m%d-%H%M%S')}")
+    os.makedirs(os.path.dirname(prefix) or '.', exist_ok=True)
+    with open(prefix + '.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    write_csv(report, prefix + '.csv')
+    if args.plot:
+        plot(report, prefix + '.png')
+
+    for item in report['summary']:
+        onset = item['time_superlinear_from']
+        exps = ', '.join('-' if e is None else f"{e:.2f}" for e in item['time_exponents'])
+        print(f"{item['format']:4s} {item['stage']:22s} exponents [{exps}]" + (f"  superlinear from {onset}" if onset else ''))
+    print(f"Saved {prefix}.json")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+import argparse
+import math
+import os
+import string
+import sys
+
+import numpy as np
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'sample.pdb')
+
+rna_nucleotides = ['A', 'C', 'G', 'U', 'I']
+dna_nucleotides = ['DA', 'DC', 'DG', 'DU', 'DI', 'DT']
+
+CHAIN_IDS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+MAX_RESIDUE_NUMBER = 9999
+ION_NAMES = ['MG', 'K']
+
+
+class Residue:
+    def __init__(self, resname, hetero, names, elements, coords):
+        self.resname = resname
+        self.hetero = hetero
+        self.names = names
+        self.elements = elements
+        self.coords = coords
+
+    def moved(self, offset):
+        return Residue(self.resname, self.hetero, self.names, self.elements, self.coords + offset)
+
+
+def load_templates(path=TEMPLATE_PATH):
+    residues = {}
+    order = []
+
+    with open(path) as f:
+        for line in f:
+            if not (line.startswith('ATOM') or line.startswith('HETATM')):
+                continue
+            if line[16] not in ' A':
+                continue
+            key = (line[21], line[22:27], line[17:20].strip())
+            if key not in residues:
+                residues[key] = {'hetero': line.startswith('HETATM'), 'names': [], 'elements': [], 'coords': []}
+                order.append(key)
+            residue = residues[key]
+            residue['names'].append(line[12:16].strip())
+            residue['elements'].append(line[76:78].strip() or line[12:16].strip()[0])
+            residue['coords'].append([float(line[30:38]), float(line[38:46]), float(line[46:54])])
+
+    templates = {'chain': [], 'ligand': None, 'ion': None, 'water': None}
+    for key in order:
+        resname = key[2]
+        residue = residues[key]
+        built = Residue(resname, residue['hetero'], residue['names'], residue['elements'], np.array(residue['coords']))
+        if resname in rna_nucleotides or resname in dna_nucleotides:
+            templates['chain'].append(built)
+        elif resname == 'HOH':
+            templates['water'] = templates['water'] or built
+        elif len(residue['names']) == 1:
+            templates['ion'] = templates['ion'] or built
+        else:
+            templates['ligand'] = templates['ligand'] or built
+
+    if not templates['chain']:
+        raise ValueError(f"No nucleotide templates found in {path}")
+    return templates
+
+
+def block_offsets(count, spacing):
+    side = max(1, math.ceil(count ** (1 / 3)))
+    offsets = []
+    for i in range(count):
+        x, rest = divmod(i, side * side)
+        y, z = divmod(rest, side)
+        offsets.append(np.array([x, y, z], dtype=float) * spacing)
+    return offsets
+
+
+def random_directions(rng, count):
+    vectors = rng.normal(size=(count, 3))
+    return vectors / np.linalg.norm(vectors, axis=1)[:, None]
+
+
+def generate(nucleotides, chains=1, models=1, ions=0, waters=0, ligands=0, jitter=0.5, seed=0, templates=None):
+    templates = templates or load_templates()
+    rng = np.random.default_rng(seed)
+    chains = max(1, min(chains, len(CHAIN_IDS), nucleotides))
+
+    per_chain = [nucleotides // chains + (1 if i < nucleotides % chains else 0) for i in range(chains)]
+    if max(per_chain) > MAX_RESIDUE_NUMBER:
+        raise ValueError(f"At most {MAX_RESIDUE_NUMBER} nucleotides per chain fit in a PDB file, use more chains")
+
+    # Copies of the template chain are tiled on a grid, so every copy keeps
+    # the template's real base pairing and stacking geometry.
+    block = templates['chain']
+    block_coords = np.vstack([residue.coords for residue in block])
+    block_center = block_coords.mean(axis=0)
+    spacing = np.ptp(block_coords, axis=0).max() + 8.0
+    block_count = sum(math.ceil(count / len(block)) for count in per_chain)
+    offsets = iter(block_offsets(block_count, spacing))
+
+    base_chains = []
+    for chain_index, count in enumerate(per_chain):
+        residues = []
+        while len(residues) < count:
+            offset = next(offsets) - block_center
+            for residue in block[:count - len(residues)]:
+                residues.append(residue.moved(offset))
+        base_chains.append({'id': CHAIN_IDS[chain_index], 'residues': residues, 'hetero': []})
+
+    all_residues = [(chain, residue) for chain in base_chains for residue in chain['residues']]
+    phosphates = [(chain, residue.coords[residue.names.index('P')]) for chain, residue in all_residues if 'P' in residue.names]
+    anchors = phosphates or [(chain, residue.coords[0]) for chain, residue in all_residues]
+
+    def place_near(count, distance):
+        picks = rng.integers(0, len(anchors), size=count)
+        directions = random_directions(rng, count)
+        return [(anchors[i][0], anchors[i][1] + direction * distance) for i, direction in zip(picks, directions)]
+
+    if ions and templates['ion'] is not None:
+        for k, (chain, position) in enumerate(place_near(ions, 3.0)):
+            name = ION_NAMES[k % len(ION_NAMES)]
+            chain['hetero'].append(Residue(name, True, [name], [name], position[None, :]))
+
+    if ligands and templates['ligand'] is not None:
+        ligand = templates['ligand']
+        for chain, position in place_near(ligands, 8.0):
+            chain['hetero'].append(ligand.moved(position - ligand.coords.mean(axis=0)))
+
+    if waters and templates['water'] is not None:
+        water = templates['water']
+        for chain, position in place_near(waters, 3.5):
+            chain['hetero'].append(Residue('HOH', True, water.names, water.elements, position[None, :]))
+
+    for chain in base_chains:
+        if len(chain['residues']) + len(chain['hetero']) > MAX_RESIDUE_NUMBER:
+            raise ValueError(f"Chain {chain['id']} has more than {MAX_RESIDUE_NUMBER} residues, use more chains")
+
+    result = []
+    for model in range(models):
+        model_chains = []
+        for chain in base_chains:
+            residues = chain['residues'] + chain['hetero']
+            if model > 0:
+                residues = [residue.moved(rng.normal(scale=jitter, size=residue.coords.shape)) for residue in residues]
+            model_chains.append({'id': chain['id'], 'residues': residues})
+        result.append(model_chains)
+    return result
+
+
+def iter_atoms(structure):
+    serial = 0
+    for model_number, model in enumerate(structure, start=1):
+        for chain in model:
+            for number, residue in enumerate(chain['residues'], start=1):
+                for name, element, coord in zip(residue.names, residue.elements, residue.coords):
+                    serial += 1
+                    yield model_number, chain['id'], number, residue, name, element, coord, serial
+
+
+def pdb_atom_name(name, element):
+    if len(name) < 4 and len(element) == 1:
+        return f" {name:<3s}"
+    return f"{name:<4s}"
+
+
+def write_pdb(structure, out, name='SYNT'):
+    out.write(f"HEADER    RNA{' ' * 37}01-JAN-00   {name[:4]:<4s}{' ' * 14}\n")
+    multi_model = len(structure) > 1
+
+    for model_number, model in enumerate(structure, start=1):
+        if multi_model:
+            out.write(f"MODEL     {model_number:4d}\n")
+        serial = 0
+        for chain in model:
+            last = None
+            for number, residue in enumerate(chain['residues'], start=1):
+                if residue.hetero and last is not None and not last.hetero:
+                    serial += 1
+                    out.write(f"TER   {serial % 100000:5d}      {last.resname:>3s} {chain['id']}{number - 1:4d}\n")
+                record = 'HETATM' if residue.hetero else 'ATOM  '
+                for atom_name, element, (x, y, z) in zip(residue.names, residue.elements, residue.coords):
+                    serial += 1
+                    out.write(
+                        f"{record}{serial % 100000:5d} {pdb_atom_name(atom_name, element)} {residue.resname:>3s} {chain['id']}{number:4d}    "
+                        f"{x:8.3f}{y:8.3f}{z:8.3f}{1.0:6.2f}{20.0:6.2f}          {element:>2s}\n"
+                    )
+                last = residue
+            if last is not None and not last.hetero:
+                serial += 1
+                out.write(f"TER   {serial % 100000:5d}      {last.resname:>3s} {chain['id']}{len(chain['residues']):4d}\n")
+        if multi_model:
+            out.write("ENDMDL\n")
+    out.write("END\n")
+
+
+def cif_value(value):
+    if "'" in value and '"' not in value:
+        return f'"{value}"'
+    if '"' in value or ' ' in value:
+        return f"'{value}'"
+    return value
+
+
+def write_mmcif(structure, out, name='SYNT'):
+    out.write(f"data_{name}\n#\n_entry.id {name}\n#\nloop_\n")
+    for column in [
+        'group_PDB', 'id', 'type_symbol', 'label_atom_id', 'label_alt_id', 'label_comp_id', 'label_asym_id',
+        'label_entity_id', 'label_seq_id', 'pdbx_PDB_ins_code', 'Cartn_x', 'Cartn_y', 'Cartn_z', 'occupancy',
+        'B_iso_or_equiv', 'pdbx_formal_charge', 'auth_seq_id', 'auth_comp_id', 'auth_asym_id', 'auth_atom_id',
+        'pdbx_PDB_model_num',
+    ]:
+        out.write(f"_atom_site.{column}\n")
+
+    for model_number, chain_id, number, residue, atom_name, element, (x, y, z), serial in iter_atoms(structure):
+        if residue.hetero:
+            record, asym, entity, seq = 'HETATM', f"{chain_id}{residue.resname}", '2', '.'
+        else:
+            record, asym, entity, seq = 'ATOM', chain_id, '1', str(number)
+        atom = cif_value(atom_name)
+        out.write(
+            f"{record} {serial} {element} {atom} . {residue.resname} {asym} {entity} {seq} ? "
+            f"{x:.3f} {y:.3f} {z:.3f} 1.00 20.00 ? {number} {residue.resname} {chain_id} {atom} {model_number}\n"
+        )
+    out.write("#\n")
+
+
+def write(structure, path, name='SYNT'):
+    writer = write_mmcif if path.endswith('.cif') else write_pdb
+    with open(path, 'w') as out:
+        writer(structure, out, name)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Write a synthetic RNA structure built from the tests/sample.pdb residue templates.')
+    arg_parser.add_argument('output', help='output path, .pdb or .cif')
+    arg_parser.add_argument('--nucleotides', type=int, required=True)
+    arg_parser.add_argument('--chains', type=int, default=1)
+    arg_parser.add_argument('--models', type=int, default=1)
+    arg_parser.add_argument('--ions', type=int, default=0)
+    arg_parser.add_argument('--waters', type=int, default=0)
+    arg_parser.add_argument('--ligands', type=int, default=0)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args(argv)
+
+    structure = generate(args.nucleotides, args.chains, args.models, args.ions, args.waters, args.ligands, seed=args.seed)
+    write(structure, args.output)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output)} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
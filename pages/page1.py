@@ -42,7 +42,10 @@ dash.clientside_callback(
             pdbProvider: 'pdbe',
             emdbProvider: 'pdbe'
         }).then(viewerInstance => {
-            viewerInstance.loadStructureFromUrl(file_url, structureFormat)
+            var load = data.bcif_url
+                ? viewerInstance.loadStructureFromUrl(data.bcif_url, 'mmcif', true)
+                : viewerInstance.loadStructureFromUrl(file_url, structureFormat);
+            load
                 .catch(error => console.error("Error loading structure:", error));
         });
     }
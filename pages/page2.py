@@ -1,34 +1,47 @@
 import dash
-from dash import dcc, html, callback, Output, Input, State, Patch
-import base64
+from dash import dcc, html, callback, set_props, Output, Input, State, Patch
+import functools
 import numpy as np
 import plotly.graph_objects as go
-import rnapolis
-from rnapolis import annotator, parser
-from Bio.PDB import PDBParser, MMCIFParser
-from io import BytesIO, StringIO
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import dash_daq as daq
-import os
-
-rna_nucleotides = ['A', 'C', 'G', 'U', 'I']
-dna_nucleotides = ['DA', 'DC', 'DG', 'DU', 'DI', 'DT']
+import time
+from rnagraph.backbone import BACKBONE_LAYER
+from rnagraph.figure_cache import figure_cache
+from rnagraph.figures import HIDDEN_AXES
+from rnagraph.contact_map import tile_cache
+from rnagraph.contacts import CONTACT_LAYER
+from rnagraph.ensemble import FLEXIBILITY, FLEXIBILITY_COLORSCALE
+from rnagraph.graph import METRIC_COLORSCALES, METRICS
+from rnagraph.heteroatoms import HETEROATOM_CLASSES, HETEROATOM_LABELS
+from rnagraph.interaction_diff import DIFF_COLORS, diff_traces, is_diff_trace
+from rnagraph.pipeline import Pipeline, backbone_layer, contact_layer, interaction_layer
+from rnagraph.structure_io import decode_upload
+from rnagraph.structure_store import put_structure
 
 colors = []
-color_map = {
-        'A': 'rgb(225, 246, 0)',
-        'C': 'rgb(35, 120, 65)',
-        'G': 'rgb(228, 34, 23)',
-        'U': 'rgb(65, 105, 225)',
-        'I': 'rgb(127, 127, 127)',
-        'DA': 'rgb(225, 246, 0)',
-        'DC': 'rgb(35, 120, 65)',
-        'DG': 'rgb(228, 34, 23)',
-        'DU': 'rgb(65, 105, 225)',
-        'DI': 'rgb(127, 127, 127)',
-        'DT': 'rgb(128, 0, 128)'
-    }
+DIFF_LABELS = {
+    'phosphodiester': 'Base–phosphate',
+    'c_base_base': 'Canonical',
+    'nc_base_base': 'Non-canonical',
+    'stacking': 'Stacking',
+    CONTACT_LAYER: 'Ligand and ion contacts',
+}
+
+STRUCTURE_MISSING = '*This structure is no longer available. Please upload it again.'
+
+def structure_callback(func):
+    # Structures can be pruned from the store while a session still points
+    # at them; the user is asked to upload the file again instead.
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except FileNotFoundError:
+            set_props('upload-message', {'children': html.Div(STRUCTURE_MISSING)})
+            raise PreventUpdate
+    return wrapper
 
 try:
     dash.register_page(__name__, path='/page-2', name="RNA Graph")
@@ -102,17 +115,35 @@ layout = html.Div(
                     id = 'loading-1',
                     type = 'circle',
                     overlay_style={"visibility":"visible"},
-                    children = dcc.Graph(
+                    children = [
+                        dcc.Graph(
                                 id='rna-graph',
                                 style={'display': 'block'},  
                                 className='graph'
-                            )
+                            ),
+                        dcc.Graph(
+                                id='network-graph',
+                                style={'display': 'none'},
+                                className='graph',
+                                config={'scrollZoom': True}
+                            ),
+                        dcc.Graph(
+                                id='contact-map',
+                                style={'display': 'none'},
+                                className='graph'
+                            ),
+                    ]
                 ),
                 dbc.DropdownMenu(
                     label="Colors",  
                     children=[
                         dbc.DropdownMenuItem("Sequence", id="seq"),
                         dbc.DropdownMenuItem("Optional", id="opt"),
+                        dbc.DropdownMenuItem(divider=True),
+                        dbc.DropdownMenuItem(METRICS['interactions'], id="color-interactions"),
+                        dbc.DropdownMenuItem(METRICS['degree'], id="color-degree"),
+                        dbc.DropdownMenuItem(METRICS['component'], id="color-component"),
+                        dbc.DropdownMenuItem(FLEXIBILITY, id="color-rmsf"),
                     ],
                     id = "dropdown-menu",
                     color = "primary",
@@ -168,10 +199,12 @@ layout = html.Div(
                             id='interaction-type',
                             className='checklist-label',
                             options=[
-                                {'label': 'Phosphodiester interactions', 'value': 'phosphodiester'},
+                                {'label': "Backbone (O3'-P bonds)", 'value': BACKBONE_LAYER},
+                                {'label': 'Base–phosphate interactions', 'value': 'phosphodiester'},
                                 {'label': 'Canonical interactions', 'value': 'c_base_base'},
                                 {'label': 'Non-canonical interactions', 'value': 'nc_base_base'},
-                                {'label': 'Stacking interactions', 'value': 'stacking'}
+                                {'label': 'Stacking interactions', 'value': 'stacking'},
+                                {'label': 'Ligand and ion contacts', 'value': 'ligand_contacts'}
                             ],
                             value=[],  
                             inputClassName='checklist-input'
@@ -181,10 +214,35 @@ layout = html.Div(
                             className='checklist-label',
                             options=[
                                 {'label': 'Show heteroatoms', 'value': 'heteroatoms'},
+                                *[{'label': HETEROATOM_LABELS[name], 'value': name} for name in HETEROATOM_CLASSES],
                             ], 
                             value=[],
                             inputClassName='checklist2-input',
                         ),
+                        dcc.RadioItems(
+                            id='graph-view',
+                            className='checklist-label',
+                            options=[
+                                {'label': '3D structure', 'value': '3d'},
+                                {'label': '2D interaction network', 'value': '2d'},
+                                {'label': 'Distance map', 'value': 'map'},
+                            ],
+                            value='3d',
+                            inputClassName='checklist2-input',
+                        ),
+                        html.Div(
+                            [
+                                dcc.Upload(
+                                    id='compare-upload',
+                                    className='compare-upload',
+                                    children=html.Div(['Compare with ', html.A('another structure')]),
+                                    multiple=False,
+                                ),
+                                dcc.Input(id='compare-model', type='number', min=1, step=1, placeholder='or model', debounce=True, className='compare-model'),
+                                html.Div(id='compare-summary', className='compare-summary'),
+                            ],
+                            className='checklist-label compare',
+                        ),
                     ],
                     className='top-section'
                 ),
@@ -196,7 +254,7 @@ layout = html.Div(
                                     className='interaction-description',
                                     children = [
                                         html.Hr(id = 'phosphodiester-hr', style={'borderWidth': '2px', 'width': '44px', 'borderColor': 'green', 'opacity': 'unset', 'borderStyle': 'dashed'}),
-                                        html.Label('Phosphodiester interactions', style = {'fontSize': '14px'})
+                                        html.Label('Base–phosphate interactions', style = {'fontSize': '14px'})
                                     ]
                                 ),
                                 html.Div(
@@ -386,6 +444,104 @@ layout = html.Div(
                             className='interaction-container',
                             id = 'stacking-style-container'
                         ),
+                        html.Div(
+                            [
+                                html.Div(
+                                    className='interaction-description',
+                                    children = [
+                                        html.Hr(id = 'ligand-contacts-hr', style={'borderWidth': '2px', 'width': '44px', 'borderColor': 'violet', 'opacity': 'unset', 'borderStyle': 'dashed'}),
+                                        html.Label('Ligand and ion contacts', style = {'fontSize': '14px'})
+                                    ]
+                                ),
+                                html.Div(
+                                    [
+                                        dcc.Dropdown(
+                                            placeholder="Color",  
+                                            options=[
+                                                {'label': 'Red', 'value': 'red'},
+                                                {'label': 'Green', 'value': 'green'},
+                                                {'label': 'Blue', 'value': 'blue'},
+                                                {'label': 'Orange', 'value': 'orange'},
+                                                {'label': 'Yellow', 'value': 'yellow'},
+                                                {'label': 'Violet', 'value': 'violet'},
+                                                {'label': 'Gray', 'value': 'gray'},
+                                                {'label': 'Black', 'value': 'black'}
+                                            ],
+                                            value = 'violet',
+                                            className = 'dropUp',
+                                            id = 'ligand-contacts-color',
+                                            searchable = False,
+                                            clearable= False,
+                                        ),
+                                        dcc.Dropdown(
+                                            placeholder="Style",  
+                                            options=[
+                                                {'label': 'Solid', 'value': 'solid'},
+                                                {'label': 'Dashed', 'value': 'dash'},
+                                                {'label': 'Dashed Dot', 'value': 'longdash'}
+                                            ],
+                                            value = 'dash',
+                                            className = 'dropUp',
+                                            id = 'ligand-contacts-style',
+                                            searchable = False,
+                                            clearable= False,
+                                        ),
+                                    ],
+                                    className='interaction-dropdown-container'  
+                                ),
+                            ],
+                            className='interaction-container',
+                            id = 'ligand-contacts-style-container'
+                        ),
+                        html.Div(
+                            [
+                                html.Div(
+                                    className='interaction-description',
+                                    children = [
+                                        html.Hr(id = 'backbone-hr', style={'borderWidth': '2px', 'width': '44px', 'borderColor': 'gray', 'opacity': 'unset', 'borderStyle': 'solid'}),
+                                        html.Label("Backbone (O3'-P bonds)", style = {'fontSize': '14px'})
+                                    ]
+                                ),
+                                html.Div(
+                                    [
+                                        dcc.Dropdown(
+                                            placeholder="Color",  
+                                            options=[
+                                                {'label': 'Red', 'value': 'red'},
+                                                {'label': 'Green', 'value': 'green'},
+                                                {'label': 'Blue', 'value': 'blue'},
+                                                {'label': 'Orange', 'value': 'orange'},
+                                                {'label': 'Yellow', 'value': 'yellow'},
+                                                {'label': 'Violet', 'value': 'violet'},
+                                                {'label': 'Gray', 'value': 'gray'},
+                                                {'label': 'Black', 'value': 'black'}
+                                            ],
+                                            value = 'gray',
+                                            className = 'dropUp',
+                                            id = 'backbone-color',
+                                            searchable = False,
+                                            clearable= False,
+                                        ),
+                                        dcc.Dropdown(
+                                            placeholder="Style",  
+                                            options=[
+                                                {'label': 'Solid', 'value': 'solid'},
+                                                {'label': 'Dashed', 'value': 'dash'},
+                                                {'label': 'Dashed Dot', 'value': 'longdash'}
+                                            ],
+                                            value = 'solid',
+                                            className = 'dropUp',
+                                            id = 'backbone-style',
+                                            searchable = False,
+                                            clearable= False,
+                                        ),
+                                    ],
+                                    className='interaction-dropdown-container'  
+                                ),
+                            ],
+                            className='interaction-container',
+                            id = 'backbone-style-container'
+                        ),
                     ],
                     className='bottom-section'
                 ),
@@ -408,140 +564,20 @@ layout = html.Div(
     State('upload-data', 'filename'),
     prevent_initial_call = True
 )
+@structure_callback
 def update_rna_graph(data, filename):
     if data is None or filename is None:
         return go.Figure(), None, None, {'display' : 'none'}, {'display' : 'none'}, dash.no_update
     
     colors.clear()
-    option = [{'label': 'Show heteroatoms', 'value': 'heteroatoms', 'disabled': False}]
-
-    content_type, content_string = data.get('url').split(',')
-    decoded = base64.b64decode(content_string)
-
-    if 'pdb' in filename:
-        parser = PDBParser()
-        structure = parser.get_structure(id=filename.split('.')[0], file=StringIO(decoded.decode('utf-8')))
-    elif 'cif' in filename:
-        parser = MMCIFParser()
-        structure = parser.get_structure(structure_id=filename.split('.')[0], filename=StringIO(decoded.decode('utf-8')))
-
-    points = []
-    heteroatoms =  []
-    nucleotide_info = []
-    heteroatom_info = []
-
-    for model in structure:
-        for chain in model:
-            for residue in chain:
-                if residue.resname in rna_nucleotides or residue.resname in dna_nucleotides:
-                    coord = []
-                    heterocoord = []
-
-                    for atom in residue:
-                        coord.append(atom.get_coord())
-                    
-                    coord_array = np.array(coord)
-                    center = np.mean(coord_array, axis=0) 
-                    points.append(center)  
-                    colors.append(color_map.get(residue.resname, 'rgb(16, 16, 16)'))
-
-                    nucleotide_info.append( {
-                        "Nucleotide" : residue.resname,
-                        "Chain_id" : chain.id,
-                        "Coordinate" : center,
-                        "Color" : color_map.get(residue.resname, 'rgb(16, 16, 16)'),
-                        "Nucleotide_id" : residue.id[1]
-                    })
-                if 'H_' in residue.id[0]:
-                    heterocoord = []
-                    for atom in residue:
-                        heterocoord.append(atom.get_coord())
-                    
-                    heteroatom_coord_array = np.array(heterocoord)
-                    center = np.mean(heteroatom_coord_array, axis=0) 
-                    heteroatoms.append(center)
-
-                    heteroatom_info.append( {
-                        "Nucleotide" : residue.resname,
-                        "Chain_id" : chain.id,
-                        "Coordinate" : center,
-                        "Color" : 'black',
-                        "Nucleotide_id" : residue.id[1]
-                    })
-        break
-    points_array = np.array(points)
-    if points_array.size == 0:
+    pipeline = Pipeline.from_store(data, filename, cache=figure_cache)
+    fig = pipeline.figure()
+    if fig is None:
         return go.Figure(), dash.no_update, {'display': 'none'}, {'display' : 'none'}, {'display': 'none'}, dash.no_update
-    
-    if len(heteroatoms) > 0:
-        heteroatoms_array = np.array(heteroatoms)
-    else: 
-        heteroatoms_array = None
-        option = [{'label': 'Show heteroatoms', 'value': 'heteroatoms', 'disabled': True}]
-
-    fig = go.Figure(data=[go.Scatter3d(
-        name = 'nucleotides',
-        x=points_array[:, 0],  
-        y=points_array[:, 1],  
-        z=points_array[:, 2],  
-        mode='markers',
-        marker=dict(
-            size=8,
-            color=colors,
-            opacity=1.0,
-            line=dict(
-                color='white',
-                width=0.5
-            )
-        ),
-        hoverinfo='text',
-        hovertemplate="Nucleotide: %{customdata[0]} %{customdata[4]}<br>Chain: %{customdata[1]}<br>Coordinates:<br> x: %{customdata[2][0]:.2f}<br> y: %{customdata[2][1]:.2f}<br> z: %{customdata[2][2]:.2f}<extra></extra>",
-        customdata=[
-            [nucleotide['Nucleotide'], nucleotide['Chain_id'], nucleotide['Coordinate'], nucleotide['Color'], nucleotide['Nucleotide_id']] 
-            for nucleotide in nucleotide_info
-        ],
-    )])
-
-    if heteroatoms_array is not None:
-        fig.add_trace(go.Scatter3d(
-            name='heteroatoms',
-            x=heteroatoms_array[:, 0],
-            y=heteroatoms_array[:, 1],
-            z=heteroatoms_array[:, 2],
-            mode='markers',
-            marker=dict(
-                size=6,
-                color='black',
-                opacity=0.8,
-                line=dict(
-                    color='black',
-                    width=0.5
-                )
-            ),
-            hoverinfo='text',
-            hovertemplate="Heteroatom: %{customdata[0]}<br>Chain: %{customdata[1]}<br>Coordinates:<br>x: %{customdata[2][0]:.2f}<br>y: %{customdata[2][1]:.2f}<br>z: %{customdata[2][2]:.2f}<extra></extra>",
-            customdata=[
-                [heteroatom['Nucleotide'], heteroatom['Chain_id'], heteroatom['Coordinate'], heteroatom['Color'], heteroatom['Nucleotide_id']]
-                for heteroatom in heteroatom_info
-            ],
-            visible=False
-        ))
-    fig.update_scenes(xaxis_showspikes=False, yaxis_showspikes=False, zaxis_showspikes=False)
-    fig.update_layout(
-        autosize=True,
-        scene=dict(
-            xaxis=dict(visible=False),
-            yaxis=dict(visible=False),
-            zaxis=dict(visible=False)
-        ),
-        margin=dict(l=0, r=0, t=0, b=0),
-        height = 610,
-        paper_bgcolor='#fafafb',
-        clickmode='event+select',
-        dragmode="select",
-        newselection_mode="gradual",
-        showlegend=False
-    )
+    colors.extend(fig['data'][0]['marker']['color'])
+    present = pipeline.heteroatom_presence()
+    option = [{'label': 'Show heteroatoms', 'value': 'heteroatoms', 'disabled': not has_heteroatom_trace(fig['data'])}]
+    option += [{'label': HETEROATOM_LABELS[name], 'value': name, 'disabled': not present[name]} for name in HETEROATOM_CLASSES]
 
     structure_name = data.get('name')
     return fig, {'display' : 'block'}, structure_name, {'display' : 'block'}, {'display' : 'flex'}, option
@@ -659,24 +695,40 @@ def clear_selection(n_clicks, current_figure, relayoutData):
     Input('heteroatoms-show', 'value'),
     State('rna-graph', 'figure'),
     State('rna-graph', 'relayoutData'),
+    State('store', 'data'),
     prevent_initial_call=True
 )
-def show_heteroatoms(values, current_figure, relayoutData):
-    current_figure = go.Figure(current_figure)
-    
-    if len(current_figure.data) > 1  and current_figure.data[1].name == 'heteroatoms':
+@structure_callback
+def show_heteroatoms(values, current_figure, relayoutData, data=None):
+    # 'heteroatoms' is the residue trace of the figure; each class is a trace
+    # of its own, built from the structure the first time it is shown.
+    values = values or []
+    current_figure = as_figure_dict(current_figure)
+    traces = current_figure['data']
+    shown = []
+
+    if has_heteroatom_trace(traces):
+        traces[1] = {**traces[1], 'visible': 'heteroatoms' in values}
         if 'heteroatoms' in values:
-            current_figure.update_traces(visible=True, selector=dict(name='heteroatoms'))
-            if relayoutData and 'scene.camera' in relayoutData:
-                current_figure.update_layout(scene_camera=relayoutData['scene.camera'])
-            return current_figure, ['heteroatoms']
+            shown.append('heteroatoms')
+
+    names = [trace.get('name') for trace in traces]
+    for name in HETEROATOM_CLASSES:
+        if name in names:
+            i = names.index(name)
+            traces[i] = {**traces[i], 'visible': name in values}
+        elif name in values and data is not None:
+            trace = Pipeline.from_store(data, cache=figure_cache).heteroatom_trace(name)
+            if trace is None:
+                continue
+            traces.append(trace)
         else:
-            current_figure.update_traces(visible=False, selector=dict(name='heteroatoms'))
-            if relayoutData and 'scene.camera' in relayoutData:
-                current_figure.update_layout(scene_camera=relayoutData['scene.camera'])
-            return current_figure, []
-    else:
-        return current_figure, []
+            continue
+        if name in values:
+            shown.append(name)
+
+    set_camera(current_figure['layout'], relayoutData)
+    return current_figure, shown
 
 @callback(
     Output('rna-graph', 'figure', allow_duplicate=True),
@@ -688,6 +740,7 @@ def show_heteroatoms(values, current_figure, relayoutData):
     State('rna-graph', 'relayoutData'),
     prevent_initial_call=True
 )
+@structure_callback
 def update_interaction_info(selected_interactions, data, current_figure, interactions, relayoutData):
     available_interactions = interactions if interactions else {
         'phosphodiester': [],
@@ -697,128 +750,224 @@ def update_interaction_info(selected_interactions, data, current_figure, interac
     }
 
     interaction_options = [
-        {'label': 'Phosphodiester interactions', 'value': 'phosphodiester', 'disabled': True},
+        {'label': "Backbone (O3'-P bonds)", 'value': BACKBONE_LAYER, 'disabled': True},
+        {'label': 'Base–phosphate interactions', 'value': 'phosphodiester', 'disabled': True},
         {'label': 'Canonical interactions', 'value': 'c_base_base', 'disabled': True},
         {'label': 'Non-canonical interactions', 'value': 'nc_base_base', 'disabled': True},
         {'label': 'Stacking interactions', 'value': 'stacking', 'disabled': True},
+        {'label': 'Ligand and ion contacts', 'value': CONTACT_LAYER, 'disabled': True},
     ]
 
-    current_figure = go.Figure(current_figure)
+    # Work on the figure dict directly; rebuilding a go.Figure would
+    # re-validate every trace on each toggle.
+    current_figure = as_figure_dict(current_figure)
+    traces = current_figure['data']
+    layout = current_figure['layout']
 
     if data is not None:   
         interaction_options = [
-            {'label': 'Phosphodiester interactions', 'value': 'phosphodiester', 'disabled': not available_interactions['phosphodiester']},
+            {'label': "Backbone (O3'-P bonds)", 'value': BACKBONE_LAYER, 'disabled': not traces},
+            {'label': 'Base–phosphate interactions', 'value': 'phosphodiester', 'disabled': not available_interactions['phosphodiester']},
             {'label': 'Canonical interactions', 'value': 'c_base_base', 'disabled': not available_interactions['c_base_base']},
             {'label': 'Non-canonical interactions', 'value': 'nc_base_base', 'disabled': not available_interactions['nc_base_base']},
             {'label': 'Stacking interactions', 'value': 'stacking', 'disabled': not available_interactions['stacking']},
+            {'label': 'Ligand and ion contacts', 'value': CONTACT_LAYER, 'disabled': not has_heteroatom_trace(traces)},
         ]
 
         if selected_interactions:
 
-            for i, trace in enumerate(current_figure['data']):
-                if trace['name'] not in selected_interactions and trace['name'] != 'nucleotides' and trace['name'] != 'heteroatoms':
-                    current_figure.update_traces(visible=False, selector=dict(name=trace['name']))
-                elif trace['name'] in selected_interactions:
-                    current_figure.update_traces(visible=True, selector=dict(name=trace['name']))
+            for i, trace in enumerate(traces):
+                if trace.get('name') not in selected_interactions and is_layer_trace(trace):
+                    traces[i] = {**trace, 'visible': False}
+                elif trace.get('name') in selected_interactions:
+                    traces[i] = {**trace, 'visible': True}
 
             for interaction_type in selected_interactions:
-                existing_traces = [trace['name'] for trace in current_figure.data if trace['name'] == interaction_type]
+                existing_traces = [trace.get('name') for trace in traces if trace.get('name') == interaction_type]
                 if interaction_type not in set(existing_traces):
                     interactions = available_interactions.get(interaction_type, [])
+                    if interaction_type == CONTACT_LAYER:
+                        # Contacts are detected from the structure below,
+                        # only once the layer is first shown.
+                        interactions = has_heteroatom_trace(traces)
+                    elif interaction_type == BACKBONE_LAYER:
+                        # So is the backbone, from O3'-P distances.
+                        interactions = bool(traces)
                 
                     if interactions:
-                        if len(current_figure.data) > 1 and current_figure.data[1].name == 'heteroatoms':
-                            interaction_lines = create_interaction_lines(interactions, current_figure.data[0].customdata, current_figure.data[1].customdata, interaction_type)
-                        else:
-                            interaction_lines = create_interaction_lines(interactions, current_figure.data[0].customdata, None, interaction_type)
-                        current_figure.add_traces(interaction_lines)
-                        current_figure.update_layout(
-                            scene=dict(
-                                xaxis=dict(visible=False),
-                                yaxis=dict(visible=False),
-                                zaxis=dict(visible=False)
-                            ),
-                            showlegend=False
-                        )
-                        current_figure.update_traces(
-                                name=interaction_type, 
-                                selector=dict(name=interaction_type)
-                        )
+                        has_heteroatoms = has_heteroatom_trace(traces)
+                        layer_key = (data.get('hash'), 'layer', interaction_type, has_heteroatoms)
+                        interaction_lines = figure_cache.get(layer_key) if data.get('hash') else None
+                        if interaction_lines is None:
+                            if interaction_type == CONTACT_LAYER:
+                                interaction_lines = create_contact_lines(data, traces[0].get('customdata'), traces[1].get('customdata'))
+                            elif interaction_type == BACKBONE_LAYER:
+                                interaction_lines = create_backbone_lines(data, traces[0].get('customdata'), traces[1].get('customdata') if has_heteroatoms else None)
+                            elif has_heteroatoms:
+                                interaction_lines = create_interaction_lines(interactions, traces[0].get('customdata'), traces[1].get('customdata'), interaction_type)
+                            else:
+                                interaction_lines = create_interaction_lines(interactions, traces[0].get('customdata'), None, interaction_type)
+                            interaction_lines = [as_trace_dict(line) for line in interaction_lines or []]
+                            if data.get('hash') and interaction_lines:
+                                figure_cache.put(layer_key, interaction_lines)
+                        traces.extend(interaction_lines)
+                        layout['scene'] = {**layout.get('scene', {}), **{axis: {**layout.get('scene', {}).get(axis, {}), **value} for axis, value in HIDDEN_AXES.items()}}
+                        layout['showlegend'] = False
+
+    set_camera(layout, relayoutData)
+    if data is not None and not selected_interactions:
+        for i, trace in enumerate(traces):
+            if is_layer_trace(trace):
+                traces[i] = {**trace, 'visible': False}
+
+    return current_figure, interaction_options
 
-            if relayoutData and 'scene.camera' in relayoutData:
-                current_figure.update_layout(scene_camera=relayoutData['scene.camera'])
+@callback(
+    Output('rna-graph', 'style'),
+    Output('network-graph', 'style'),
+    Output('contact-map', 'style'),
+    Output('network-graph', 'figure'),
+    Input('graph-view', 'value'),
+    Input('interaction-type', 'value'),
+    Input('store', 'data'),
+    Input('processed-data', 'data'),
+    prevent_initial_call=True
+)
+@structure_callback
+def update_network_graph(view, selected_interactions, data, interactions):
+    shown, hidden = {'display': 'block'}, {'display': 'none'}
+    if data is None or view not in ['2d', 'map']:
+        return shown, hidden, hidden, dash.no_update
+    if view == 'map':
+        return hidden, hidden, shown, dash.no_update
+    # The layout is computed once per structure and kept in the figure cache;
+    # toggling interaction types only redraws the lines.
+    pipeline = Pipeline.from_store(data, cache=figure_cache, interactions=interactions)
+    return hidden, shown, hidden, pipeline.network(selected_interactions or [])
 
-            return current_figure, interaction_options
-        
+@callback(
+    Output('contact-map', 'figure'),
+    Input('graph-view', 'value'),
+    Input('interaction-type', 'value'),
+    Input('contact-map', 'relayoutData'),
+    State('store', 'data'),
+    State('processed-data', 'data'),
+    prevent_initial_call=True
+)
+@structure_callback
+def update_contact_map(view, selected_interactions, relayoutData, data, interactions):
+    if view != 'map' or data is None:
+        return dash.no_update
+    # Only the zoomed-in range is computed; tiles are cached by range.
+    pipeline = Pipeline.from_store(data, cache=figure_cache, interactions=interactions, tile_cache=tile_cache)
+    figure = pipeline.contact_map(relayoutData, selected_interactions or [])
+    return dash.no_update if figure is None else figure
+
+@callback(
+    Output('rna-graph', 'figure', allow_duplicate=True),
+    Input('contact-map', 'clickData'),
+    State('rna-graph', 'figure'),
+    prevent_initial_call=True
+)
+def highlight_contact(clickData, current_figure):
+    # Enlarge the two nucleotides of a clicked map cell in the 3D graph.
+    traces = as_figure_dict(current_figure)['data']
+    if not clickData or not traces:
+        return dash.no_update
+    point = clickData['points'][0]
+    selected = {int(round(point['x'])), int(round(point['y']))}
+    fig = Patch()
+    fig.data[0].marker.size = [16 if i in selected else 8 for i in range(len(traces[0].get('customdata') or []))]
+    return fig
+
+@callback(
+    Output('rna-graph', 'figure', allow_duplicate=True),
+    Output('compare-summary', 'children'),
+    Input('compare-upload', 'contents'),
+    Input('compare-model', 'value'),
+    State('compare-upload', 'filename'),
+    State('store', 'data'),
+    State('processed-data', 'data'),
+    State('rna-graph', 'figure'),
+    State('rna-graph', 'relayoutData'),
+    prevent_initial_call=True
+)
+@structure_callback
+def update_interaction_diff(contents, model, filename, data, interactions, current_figure, relayoutData):
+    # Interactions gained and lost against another structure or another
+    # model of this one, drawn as their own layers over the 3D graph.
+    if data is None:
+        return dash.no_update, None
+    triggered = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
+    current_figure = as_figure_dict(current_figure)
+    traces = [trace for trace in current_figure['data'] if not is_diff_trace(trace)]
+    if (triggered == 'compare-model' and not model) or (triggered == 'compare-upload' and contents is None):
+        return {**current_figure, 'data': traces}, None
+
+    start = time.perf_counter()
+    pipeline = Pipeline.from_store(data, cache=figure_cache, interactions=interactions)
+    try:
+        if triggered == 'compare-model':
+            other = Pipeline.from_store(data, cache=figure_cache, model=int(model))
+            label = f"Model {int(model)}"
         else:
-            if relayoutData and 'scene.camera' in relayoutData:
-                current_figure.update_layout(scene_camera=relayoutData['scene.camera'])
+            decoded, ext = decode_upload(contents.split(',')[1], filename)
+            other = Pipeline(decoded, ext, structure_id=filename.split('.')[0], cache=figure_cache)
+            if not other.is_valid():
+                return dash.no_update, html.Div(other.validation()[2])
+            other.digest = put_structure(decoded, ext)
+            label = filename
+        diff = pipeline.interaction_diff(other)
+    except Exception as e:
+        return dash.no_update, html.Div(f"*{e}")
+
+    traces.extend(diff_traces(diff, traces[0].get('customdata') if traces else None, traces[1].get('customdata') if has_heteroatom_trace(traces) else None))
+    layout = current_figure['layout']
+    set_camera(layout, relayoutData)
+    summary = [html.P(f"{label}, {(time.perf_counter() - start) * 1000:.0f} ms")] + [
+        html.P([
+            f"{DIFF_LABELS.get(interaction_type, interaction_type)}: ",
+            html.Span(f"+{len(changes['gained'])}", style={'color': DIFF_COLORS['gained']}),
+            ' / ',
+            html.Span(f"-{len(changes['lost'])}", style={'color': DIFF_COLORS['lost']}),
+        ])
+        for interaction_type, changes in diff.items()
+    ]
+    return {**current_figure, 'data': traces, 'layout': layout}, summary
 
-            for i, trace in enumerate(current_figure['data']):
-                if trace['name'] != 'nucleotides' and trace['name'] != 'heteroatoms':
-                    current_figure.update_traces(visible = False, selector=dict(name=trace['name']))
+def has_heteroatom_trace(traces):
+    return len(traces) > 1 and traces[1].get('name') == 'heteroatoms'
 
-            return current_figure, interaction_options
-    else:
-        if relayoutData and 'scene.camera' in relayoutData:
-                current_figure.update_layout(scene_camera=relayoutData['scene.camera'])
+def is_layer_trace(trace):
+    # Interaction layers, as opposed to residue markers and diff lines.
+    return trace.get('name') not in ['nucleotides', 'heteroatoms', *HETEROATOM_CLASSES] and not is_diff_trace(trace)
 
-        return current_figure, interaction_options
+def parse_structure(data, filename):
+    return Pipeline.from_store(data, filename).structure()
 
-def create_interaction_lines(interaction_list, nucleotide_info = None, heteroatom_info = None, interaction_type = None):    
-    lines_styles = {
-        'nc_base_base': {'color': 'black', 'width': 2, 'dash': None},
-        'c_base_base': {'color': 'blue', 'width': 2, 'dash': None}, 
-        'phosphodiester': {'color': 'green', 'width': 6, 'dash': 'longdash'},
-        'stacking': {'color': 'orange', 'width': 6, 'dash': 'longdash'}
-    }
+def create_contact_lines(data, nucleotide_info, heteroatom_info):
+    return contact_layer(parse_structure(data, data.get('hash') or 'structure'), nucleotide_info, heteroatom_info)
 
-    if interaction_list:
-        lines = []
-        
-        for pair in interaction_list:
-            nt1 = pair['nt1']
-            nt2 = pair['nt2']
-
-            try:
-                if nt1['auth']['name'] not in rna_nucleotides and nt1['auth']['name'] not in dna_nucleotides:
-                    if heteroatom_info is not None:
-                        nt1_info = next(nucleotide for nucleotide in heteroatom_info if nucleotide[4] == nt1['auth']['number'] and nucleotide[1] == nt1['auth']['chain'] and nucleotide[0] == nt1['auth']['name'])
-                    else:
-                        continue
-                else:
-                    nt1_info = next(nucleotide for nucleotide in nucleotide_info if nucleotide[4] == nt1['auth']['number'] and nucleotide[1] == nt1['auth']['chain'] and nucleotide[0] == nt1['auth']['name'])
-            except StopIteration:
-                continue
-            
-            try:
-                if nt2['auth']['name'] not in rna_nucleotides and nt2['auth']['name'] not in dna_nucleotides:
-                    if heteroatom_info is not None:
-                        nt2_info = next(nucleotide for nucleotide in heteroatom_info if nucleotide[4] == nt2['auth']['number'] and nucleotide[1] == nt2['auth']['chain'] and nucleotide[0] == nt2['auth']['name'])
-                    else:
-                        continue
-                else:
-                    nt2_info = next(nucleotide for nucleotide in nucleotide_info if nucleotide[4] == nt2['auth']['number'] and nucleotide[1] == nt2['auth']['chain'] and nucleotide[0] == nt2['auth']['name'])
-            except StopIteration:
-                continue
+def create_backbone_lines(data, nucleotide_info, heteroatom_info):
+    return backbone_layer(parse_structure(data, data.get('hash') or 'structure'), nucleotide_info, heteroatom_info)
+
+def as_figure_dict(figure):
+    if hasattr(figure, 'to_plotly_json'):
+        figure = figure.to_plotly_json()
+    figure = figure or {}
+    return {**figure, 'data': list(figure.get('data') or []), 'layout': dict(figure.get('layout') or {})}
 
-            nt1_position = nt1_info[2]
-            nt2_position = nt2_info[2]
+def as_trace_dict(trace):
+    if hasattr(trace, 'to_plotly_json'):
+        return trace.to_plotly_json()
+    return trace
 
-            style = lines_styles.get(interaction_type, {'color': 'black', 'width': 1, 'dash': None} )
+def set_camera(layout, relayoutData):
+    if relayoutData and 'scene.camera' in relayoutData:
+        layout['scene'] = {**layout.get('scene', {}), 'camera': relayoutData['scene.camera']}
 
-            lines.append(go.Scatter3d(
-                x=[nt1_position[0], nt2_position[0]],
-                y=[nt1_position[1], nt2_position[1]],
-                z=[nt1_position[2], nt2_position[2]],
-                mode='lines',
-                hoverinfo='none',
-                showlegend=False,
-                name = interaction_type,
-                line=dict(color=style['color'], width=style['width'], dash=style['dash']),
-            ))
-        return lines if lines else None
-    return None
+def create_interaction_lines(interaction_list, nucleotide_info = None, heteroatom_info = None, interaction_type = None):    
+    return interaction_layer(interaction_type, interaction_list, nucleotide_info, heteroatom_info)
 
 @callback(
     Output('rna-graph', 'figure', allow_duplicate=True),
@@ -832,12 +981,13 @@ def create_interaction_lines(interaction_list, nucleotide_info = None, heteroato
 def colors_change(seq_click, opt_click, current_figure,relayoutData): 
     button_id = [p['prop_id'] for p in dash.callback_context.triggered][0]
     style = {'display': 'none'}
-    current_figure = go.Figure(current_figure)
+    traces = as_figure_dict(current_figure)['data']
     fig = Patch()
     if fig:
         if button_id == 'seq.n_clicks':
             fig.data[0].marker.color = colors
-            if len(current_figure.data) > 1 and current_figure.data[1].name == 'heteroatoms':
+            fig.data[0].marker.showscale = False
+            if len(traces) > 1 and traces[1].get('name') == 'heteroatoms':
                 fig.data[1].marker.color = 'black'
         elif button_id == 'opt.n_clicks':
             style = {'display': 'flex', 'position' : 'absolute', 'bottom' : '48px', 'left' : '12px'}
@@ -851,6 +1001,39 @@ def colors_change(seq_click, opt_click, current_figure,relayoutData):
     else:
         return dash.no_update, dash.no_update
 
+@callback(
+    Output('rna-graph', 'figure', allow_duplicate=True),
+    Input('color-interactions', 'n_clicks'),
+    Input('color-degree', 'n_clicks'),
+    Input('color-component', 'n_clicks'),
+    Input('color-rmsf', 'n_clicks'),
+    State('store', 'data'),
+    State('processed-data', 'data'),
+    State('rna-graph', 'relayoutData'),
+    prevent_initial_call=True
+)
+@structure_callback
+def color_by_metric(interactions_click, degree_click, component_click, rmsf_click, data, interactions, relayoutData):
+    if data is None:
+        return dash.no_update
+    metric = dash.callback_context.triggered[0]['prop_id'].split('.')[0][len('color-'):]
+    pipeline = Pipeline.from_store(data, cache=figure_cache, interactions=interactions)
+    fig = Patch()
+    if metric == 'rmsf':
+        # Nucleotides missing from some model are drawn as rigid.
+        fig.data[0].marker.color = np.nan_to_num(pipeline.ensemble().rmsf)
+        fig.data[0].marker.colorscale = FLEXIBILITY_COLORSCALE
+        title = FLEXIBILITY
+    else:
+        fig.data[0].marker.color = pipeline.graph().metric(metric)
+        fig.data[0].marker.colorscale = METRIC_COLORSCALES[metric]
+        title = METRICS[metric]
+    fig.data[0].marker.showscale = True
+    fig.data[0].marker.colorbar = {'title': {'text': title}, 'thickness': 12, 'len': 0.5}
+    if relayoutData and 'scene.camera' in relayoutData:
+        fig.layout.scene.camera = relayoutData['scene.camera']
+    return fig
+
 @callback(
     Output('rna-graph', 'figure', allow_duplicate=True),
     Input('color-picker', 'value'),
@@ -860,12 +1043,12 @@ def colors_change(seq_click, opt_click, current_figure,relayoutData):
 )        
 def color_picker_output(color, current_figure, relayoutData):
     fig = Patch()
-    current_figure = go.Figure(current_figure)
+    traces = as_figure_dict(current_figure)['data']
     if fig and color:
         hex_color = color['hex']
         fig.data[0].marker.color = hex_color
 
-        if len(current_figure.data) > 1 and current_figure.data[1].name == 'heteroatoms':
+        if len(traces) > 1 and traces[1].get('name') == 'heteroatoms':
             fig.data[1].marker.color = hex_color
 
         if relayoutData and 'scene.camera' in relayoutData:
@@ -892,6 +1075,8 @@ def close_picker(n_clicks):
     Output('canonical-style-container', 'style'),
     Output('non-canonical-style-container', 'style'),
     Output('stacking-style-container', 'style'),
+    Output('ligand-contacts-style-container', 'style'),
+    Output('backbone-style-container', 'style'),
     Input('interaction-type', 'value'),
 )
 def interactions_style(value):
@@ -909,8 +1094,15 @@ def interactions_style(value):
         noncanonical_dis = {'display' : 'block'}
     if 'stacking' in value:
         stacking_dis = {'display' : 'block'}
+    contacts_dis = {'display' : 'none'}
+    if CONTACT_LAYER in value:
+        contacts_dis = {'display' : 'block'}
 
-    return phodphodiester_dis, canonical_dis, noncanonical_dis, stacking_dis
+    backbone_dis = {'display' : 'none'}
+    if BACKBONE_LAYER in value:
+        backbone_dis = {'display' : 'block'}
+
+    return phodphodiester_dis, canonical_dis, noncanonical_dis, stacking_dis, contacts_dis, backbone_dis
 
 @callback(
     Output('rna-graph', 'figure', allow_duplicate=True),
@@ -1036,3 +1228,65 @@ def stacking_style(color, style, figure, relayoutData):
     else:
         return dash.no_update, dash.no_update
 
+@callback(
+    Output('rna-graph', 'figure', allow_duplicate=True),
+    Output('ligand-contacts-hr', 'style'),
+    Input('ligand-contacts-color', 'value'),
+    Input('ligand-contacts-style', 'value'),
+    State('rna-graph', 'figure'),
+    State('rna-graph', 'relayoutData'),
+    prevent_initial_call='initial_duplicate'
+)        
+def ligand_contacts_style(color, style, figure, relayoutData):
+    if not figure or 'data' not in figure or not figure['data']:
+        return dash.no_update, dash.no_update
+
+    fig = Patch()
+    updated = False
+
+    for i in range(len(figure['data'])):
+        if figure['data'][i]['name'] == CONTACT_LAYER: 
+            fig.data[i].line.color = color
+            fig.data[i].line.dash = style
+            fig.data[i].line.width = 3
+            updated = True
+    
+    if relayoutData and 'scene.camera' in relayoutData:
+        fig.layout.scene.camera = relayoutData['scene.camera']
+
+    if updated:
+        return fig, {'borderWidth': '2px', 'width': '44px', 'borderColor': color, 'opacity': 'unset', 'borderStyle': style}
+    else:
+        return dash.no_update, dash.no_update
+
+@callback(
+    Output('rna-graph', 'figure', allow_duplicate=True),
+    Output('backbone-hr', 'style'),
+    Input('backbone-color', 'value'),
+    Input('backbone-style', 'value'),
+    State('rna-graph', 'figure'),
+    State('rna-graph', 'relayoutData'),
+    prevent_initial_call='initial_duplicate'
+)        
+def backbone_style(color, style, figure, relayoutData):
+    if not figure or 'data' not in figure or not figure['data']:
+        return dash.no_update, dash.no_update
+
+    fig = Patch()
+    updated = False
+
+    for i in range(len(figure['data'])):
+        if figure['data'][i]['name'] == BACKBONE_LAYER: 
+            fig.data[i].line.color = color
+            fig.data[i].line.dash = style
+            fig.data[i].line.width = 4
+            updated = True
+    
+    if relayoutData and 'scene.camera' in relayoutData:
+        fig.layout.scene.camera = relayoutData['scene.camera']
+
+    if updated:
+        return fig, {'borderWidth': '2px', 'width': '44px', 'borderColor': color, 'opacity': 'unset', 'borderStyle': style}
+    else:
+        return dash.no_update, dash.no_update
+
@@ -0,0 +1,284 @@
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Sequence
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+ARCHIVE_DIR_ENV = 'RNAGRAPH_ARCHIVE_DIR'
+ARCHIVE_SIZE_ENV = 'RNAGRAPH_ARCHIVE_SIZE'
+DEFAULT_ARCHIVE_SIZE = 2 * 1024 * 1024 * 1024
+VERSION = 1
+MANIFEST = 'manifest.json'
+INTERACTION_TYPES = ['phosphodiester', 'c_base_base', 'nc_base_base', 'stacking']
+
+# An archive is a directory holding one .npy file per column (plus a mask for
+# columns with missing values) and a manifest describing the tables, so every
+# column can be memory-mapped on its own.
+
+
+def archive_dir():
+    directory = os.environ.get(ARCHIVE_DIR_ENV)
+    if directory == '':
+        return None
+    directory = directory or os.path.join(tempfile.gettempdir(), 'rnagraph-archives')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def archive_path(digest, kind):
+    directory = archive_dir()
+    if directory is None or not digest:
+        return None
+    return os.path.join(directory, f"{digest}.{kind}")
+
+
+def _flatten(record, prefix=''):
+    flat = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def _unflatten(flat):
+    record = {}
+    for key, value in flat.items():
+        target = record
+        *parents, name = key.split('.')
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return record
+
+
+_MISSING = object()
+# Mask values: 0 for a value, 1 for None, 2 when the record has no such key
+# (e.g. the fields of a nested dict that is None in this row).
+_NONE, _ABSENT = 1, 2
+
+
+def _column(values):
+    mask = np.array([_ABSENT if value is _MISSING else _NONE if value is None else 0 for value in values], dtype=np.uint8)
+    values = [None if value is _MISSING else value for value in values]
+    present = [value for value in values if value is not None]
+    if not present:
+        return None, mask
+    if all(isinstance(value, (int, np.integer)) and not isinstance(value, bool) for value in present):
+        column = np.array([0 if value is None else value for value in values], dtype=np.int64)
+    elif all(isinstance(value, (int, float, np.number)) and not isinstance(value, bool) for value in present):
+        column = np.array([0.0 if value is None else value for value in values], dtype=np.float64)
+    elif all(isinstance(value, np.ndarray) for value in present):
+        fill = np.zeros_like(present[0])
+        column = np.stack([fill if value is None else value for value in values])
+    else:
+        column = np.array(['' if value is None else str(value) for value in values], dtype=str)
+    return column, mask
+
+
+def _write_table(directory, name, records):
+    flat = [_flatten(record) for record in records]
+    keys = list(dict.fromkeys(key for record in flat for key in record))
+    columns = []
+    for index, key in enumerate(keys):
+        column, mask = _column([record.get(key, _MISSING) for record in flat])
+        entry = {'name': key, 'file': None, 'mask': None}
+        if column is not None:
+            entry['file'] = f"{name}.{index}.npy"
+            np.save(os.path.join(directory, entry['file']), column)
+        if mask.any():
+            entry['mask'] = f"{name}.{index}.mask.npy"
+            np.save(os.path.join(directory, entry['mask']), mask)
+        columns.append(entry)
+    return {'rows': len(records), 'columns': columns}
+
+
+class ArchiveTable(Sequence):
+    # The records of an archived table. Columns stay memory-mapped and are
+    # converted on first use, one at a time; records are only built when rows
+    # are read. Plotly serializes the table through tolist().
+
+    def __init__(self, directory, table):
+        self.rows = table['rows']
+        # Mapped up front, so the table stays readable if prune removes the
+        # archive afterwards.
+        self._arrays = {}
+        for entry in table['columns']:
+            array = np.load(os.path.join(directory, entry['file']), mmap_mode='r') if entry['file'] is not None else None
+            mask = np.load(os.path.join(directory, entry['mask']), mmap_mode='r') if entry['mask'] is not None else None
+            self._arrays[entry['name']] = (array, mask)
+        self._columns = {}
+
+    def _load(self, name):
+        if name not in self._columns:
+            array, mask = self._arrays[name]
+            if array is None:
+                values = [None] * self.rows
+            else:
+                # Plain ndarray rows (still backed by the map) so orjson can
+                # serialize them without a conversion pass.
+                values = array if array.ndim > 1 else array.tolist()
+            self._columns[name] = (values, mask.tolist() if mask is not None else None)
+        return self._columns[name]
+
+    def column(self, name):
+        # Values of one column, None where a record has none.
+        if name not in self._arrays:
+            return [None] * self.rows
+        values, mask = self._load(name)
+        if mask is None:
+            return values
+        return [None if state else value for value, state in zip(values, mask)]
+
+    def _records(self, rows):
+        columns = [(name, self._load(name)) for name in self._arrays]
+        for row in rows:
+            flat = {}
+            for name, (values, mask) in columns:
+                state = mask[row] if mask is not None else 0
+                if state != _ABSENT:
+                    flat[name] = None if state == _NONE else values[row]
+            yield _unflatten(flat)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self._records(range(self.rows)[index]))
+        return next(self._records([range(self.rows)[index]]))
+
+    def __iter__(self):
+        return self._records(range(self.rows))
+
+    def tolist(self):
+        return list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, ArchiveTable)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+
+def write_archive(digest, kind, tables):
+    path = archive_path(digest, kind)
+    if path is None:
+        return None
+    temp_dir = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=f".{digest}.")
+    try:
+        manifest = {'version': VERSION, 'tables': {name: _write_table(temp_dir, name, records) for name, records in tables.items()}}
+        with open(os.path.join(temp_dir, MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+        try:
+            os.rename(temp_dir, path)
+        except OSError:
+            # Written concurrently by another session; keep that one.
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    prune(keep=path)
+    return path
+
+
+def read_archive(digest, kind):
+    path = archive_path(digest, kind)
+    if path is None:
+        return None
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get('version') != VERSION:
+        return None
+    try:
+        tables = {name: ArchiveTable(path, table) for name, table in manifest['tables'].items()}
+    except FileNotFoundError:
+        # Pruned while being read.
+        return None
+    # Reads count as use, so prune evicts the least recently used archives.
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return tables
+
+
+def _archive_size(path):
+    size = 0
+    for name in os.listdir(path):
+        try:
+            size += os.path.getsize(os.path.join(path, name))
+        except FileNotFoundError:
+            pass
+    return size
+
+
+def prune(max_bytes=None, keep=None):
+    # Removes the least recently used archives until the directory fits in
+    # max_bytes, leaving keep (the archive just written) in place.
+    directory = archive_dir()
+    if directory is None:
+        return
+    max_bytes = int(os.environ.get(ARCHIVE_SIZE_ENV, DEFAULT_ARCHIVE_SIZE)) if max_bytes is None else max_bytes
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        # Temporary directories of writes still in progress, and files such
+        # as the batch journal.
+        if name.startswith('.') or not os.path.isdir(path):
+            continue
+        try:
+            entries.append((os.stat(path).st_mtime, _archive_size(path), path))
+        except FileNotFoundError:
+            continue
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def save_interactions(digest, interactions):
+    tables = {name: json.loads(to_json_plotly(interactions.get(name) or [])) for name in INTERACTION_TYPES}
+    return write_archive(digest, 'interactions', tables)
+
+
+def load_interactions(digest):
+    return read_archive(digest, 'interactions')
+
+
+def save_residues(digest, nucleotide_info, heteroatom_info):
+    return write_archive(digest, 'residues', {'nucleotides': nucleotide_info, 'heteroatoms': heteroatom_info})
+
+
+def save_heteroatom_classes(digest, names):
+    return write_archive(digest, 'heteroatom_classes', {'classes': [{'name': name} for name in names]})
+
+
+def load_heteroatom_classes(digest):
+    # Names of the heteroatom classes present in an archived structure.
+    tables = read_archive(digest, 'heteroatom_classes')
+    if tables is None:
+        return None
+    return tables['classes'].column('name')
+
+
+def load_residues(digest):
+    # Returns the collect_centroids() tuple for an archived structure.
+    tables = read_archive(digest, 'residues')
+    if tables is None:
+        return None
+    nucleotide_info, heteroatom_info = tables['nucleotides'], tables['heteroatoms']
+    points = nucleotide_info.column('Coordinate')
+    heteroatoms = heteroatom_info.column('Coordinate')
+    return points, nucleotide_info, heteroatoms, heteroatom_info
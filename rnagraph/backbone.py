@@ -0,0 +1,85 @@
+import numpy as np
+
+from rnagraph.figures import line_style, residue_index
+
+# The covalent sugar-phosphate backbone, from geometry rather than from the
+# annotation: consecutive residues of a chain are bonded when the O3' atom of
+# the first is within bond length of the P atom of the next. Anything longer
+# is a chain break (a gap in the model or a missing residue).
+
+BACKBONE_LAYER = 'backbone'
+# O3'-P bonds are about 1.6 Å long.
+BOND_CUTOFF = 2.0
+O3_NAMES = ["O3'", 'O3*']
+
+
+def backbone_steps(index, cutoff=BOND_CUTOFF):
+    # (first, second, bonded) over consecutive backbone residues of the same
+    # chain, as positions in index.residues. Backbone residues are those with
+    # an O3' or P atom, so modified nucleotides keep the chain going.
+    atoms, residues = index.atoms, index.residues
+    o3 = np.full((len(residues), 3), np.nan)
+    phosphorus = np.full((len(residues), 3), np.nan)
+    selected = np.isin(atoms['name'], O3_NAMES)
+    o3[atoms['residue'][selected]] = atoms['coord'][selected]
+    selected = atoms['name'] == 'P'
+    phosphorus[atoms['residue'][selected]] = atoms['coord'][selected]
+
+    polymer = np.flatnonzero(~np.isnan(o3[:, 0]) | ~np.isnan(phosphorus[:, 0]))
+    chains = np.array([residue[0] for residue in residues], dtype=object)
+    first, second = polymer[:-1], polymer[1:]
+    same_chain = chains[first] == chains[second]
+    first, second = first[same_chain], second[same_chain]
+    distances = np.linalg.norm(o3[first] - phosphorus[second], axis=1)
+    # NaN (no O3' or no P) compares False: a break.
+    return first, second, distances <= cutoff
+
+
+def chain_breaks(index, cutoff=BOND_CUTOFF):
+    # Residue records on either side of each break.
+    first, second, bonded = backbone_steps(index, cutoff)
+    return [(index.residues[a], index.residues[b]) for a, b in zip(first[~bonded].tolist(), second[~bonded].tolist())]
+
+
+def backbone_traces(index, nucleotide_info=None, heteroatom_info=None, cutoff=BOND_CUTOFF):
+    # One polyline per chain through the residue markers, None gaps at the
+    # breaks. Residue info is given as figure customdata rows; residues not
+    # drawn in the figure break the line too.
+    first, second, bonded = backbone_steps(index, cutoff)
+    rows = {**residue_index(heteroatom_info), **residue_index(nucleotide_info)}
+
+    def find(position):
+        chain, number, _, name, _ = index.residues[position]
+        return rows.get((number, chain, name))
+
+    lines = {}
+    for a, b in zip(first[bonded].tolist(), second[bonded].tolist()):
+        start, end = find(a), find(b)
+        if start is None or end is None:
+            continue
+        line = lines.setdefault(index.residues[a][0], {'x': [], 'y': [], 'z': [], 'last': None})
+        if line['last'] != a:
+            if line['x']:
+                for axis in 'xyz':
+                    line[axis].append(None)
+            for axis, value in zip('xyz', start[2]):
+                line[axis].append(value)
+        for axis, value in zip('xyz', end[2]):
+            line[axis].append(value)
+        line['last'] = b
+
+    return [
+        {
+            'connectgaps': False,
+            'hoverinfo': 'none',
+            'line': line_style(BACKBONE_LAYER),
+            'mode': 'lines',
+            'name': BACKBONE_LAYER,
+            'showlegend': False,
+            'x': line['x'],
+            'y': line['y'],
+            'z': line['z'],
+            'type': 'scatter3d',
+        }
+        for line in lines.values()
+    ]
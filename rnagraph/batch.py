@@ -0,0 +1,271 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from rnagraph.annotation_archive import archive_dir, archive_path
+from rnagraph.parallel_annotation import ANNOTATION_WORKERS_ENV
+from rnagraph.structure_io import STRUCTURE_EXTENSIONS, decode_file, structure_format
+from rnagraph.structure_store import put_structure
+
+JOURNAL_NAME = 'batch-journal.jsonl'
+DEFAULT_TASKS_PER_CHILD = 20
+# Finished files are written to the journal; on a rerun, files whose path,
+# size and modification time match a journal entry are skipped unread.
+DONE = ['ok', 'invalid']
+
+
+class Source:
+    def __init__(self, key, filename, size, mtime, path=None, archive=None):
+        self.key = key
+        self.filename = filename
+        self.size = size
+        self.mtime = mtime
+        self.path = path
+        self.archive = archive
+
+    def fingerprint(self):
+        return [self.size, self.mtime]
+
+
+def is_structure_file(name):
+    return structure_format(os.path.basename(name))[0] in STRUCTURE_EXTENSIONS
+
+
+def is_archive(path):
+    name = path.lower()
+    return name.endswith(('.tar', '.tar.gz', '.tgz', '.zip'))
+
+
+def _file_source(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return Source(path, os.path.basename(path), stat.st_size, stat.st_mtime_ns, path=path)
+
+
+def archive_sources(path):
+    path = os.path.abspath(path)
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_structure_file(info.filename):
+                    yield Source(f"{path}:{info.filename}", os.path.basename(info.filename), info.file_size, list(info.date_time), archive=path)
+        return
+    with tarfile.open(path) as archive:
+        for member in archive:
+            if member.isfile() and is_structure_file(member.name):
+                yield Source(f"{path}:{member.name}", os.path.basename(member.name), member.size, member.mtime, archive=path)
+
+
+def collect_sources(inputs):
+    # Directories are walked, glob patterns expanded and tar/zip archives
+    # opened; every structure file found is listed once.
+    sources = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = [os.path.join(root, name) for root, _, names in os.walk(item) for name in names]
+        elif glob.has_magic(item):
+            paths = glob.glob(item, recursive=True)
+        else:
+            paths = [item]
+        for path in sorted(paths):
+            if os.path.isdir(path):
+                continue
+            if is_archive(path):
+                found = archive_sources(path)
+            elif is_structure_file(path):
+                found = [_file_source(path)]
+            else:
+                continue
+            for source in found:
+                sources.setdefault(source.key, source)
+    return list(sources.values())
+
+
+def read_archive_members(sources):
+    # Raw bytes of archive members, read in archive order so compressed
+    # tarballs are decompressed once.
+    by_archive = {}
+    for source in sources:
+        if source.archive is not None:
+            by_archive.setdefault(source.archive, set()).add(source.key[len(source.archive) + 1:])
+    for path, names in by_archive.items():
+        if path.lower().endswith('.zip'):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if name in names:
+                        yield f"{path}:{name}", archive.read(name)
+        else:
+            with tarfile.open(path) as archive:
+                for member in archive:
+                    if member.name in names:
+                        yield f"{path}:{member.name}", archive.extractfile(member).read()
+
+
+def read_journal(path):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption.
+                continue
+            if entry.get('status') in DONE:
+                done[entry['key']] = entry
+    return done
+
+
+def _is_done(source, entry):
+    if entry is None or entry.get('fingerprint') != source.fingerprint():
+        return False
+    if entry['status'] == 'invalid':
+        return True
+    # Archives removed since then are written again.
+    return all(os.path.isdir(archive_path(entry['digest'], kind) or '') for kind in ['interactions', 'residues'])
+
+
+def _init_worker(max_memory):
+    # Parallelism comes from the batch pool; annotate each file in one pass.
+    os.environ[ANNOTATION_WORKERS_ENV] = '1'
+    if max_memory and resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, hard))
+
+
+def annotate(filename, data=None, path=None):
+    # Writes the artifacts update_active_link and update_rna_graph read for
+    # one structure file: the stored structure, its interactions and its
+    # residue table. Imported here so the parent process stays light.
+    from rnagraph.pipeline import Pipeline
+
+    start = time.perf_counter()
+    if data is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+    try:
+        decoded, ext = decode_file(data, filename)
+        pipeline = Pipeline(decoded, ext, structure_id=filename.split('.')[0])
+        if not pipeline.is_valid():
+            return {'status': 'invalid', 'error': pipeline.validation()[2], 'bytes': len(decoded), 'seconds': time.perf_counter() - start}
+
+        digest = pipeline.digest = put_structure(decoded, ext)
+        if pipeline.interactions() is None:
+            error = pipeline.annotation_error
+            return {'status': 'failed', 'error': f"{type(error).__name__}: {error}", 'digest': digest, 'bytes': len(decoded), 'seconds': time.perf_counter() - start}
+        pipeline.residues()
+        return {'status': 'ok', 'digest': digest, 'ext': ext, 'bytes': len(decoded), 'seconds': time.perf_counter() - start}
+    except Exception as e:
+        return {'status': 'failed', 'error': f"{type(e).__name__}: {e}", 'bytes': len(data), 'seconds': time.perf_counter() - start}
+
+
+def run(inputs, workers=None, journal=None, tasks_per_child=DEFAULT_TASKS_PER_CHILD, max_memory=None, log=print):
+    if archive_dir() is None:
+        raise ValueError('The annotation archive is disabled, so there is nothing to write')
+    workers = workers or os.cpu_count() or 1
+    journal = journal or os.path.join(archive_dir(), JOURNAL_NAME)
+    done = read_journal(journal)
+
+    sources = collect_sources(inputs)
+    pending = [source for source in sources if not _is_done(source, done.get(source.key))]
+    summary = {'files': len(sources), 'skipped': len(sources) - len(pending), 'ok': 0, 'invalid': 0, 'failed': 0, 'bytes': 0, 'busy_seconds': 0.0}
+    log(f"{len(sources)} structure files, {summary['skipped']} already done, {len(pending)} to annotate with {workers} workers")
+
+    start = time.perf_counter()
+    members = read_archive_members(pending)
+    by_key = {source.key: source for source in pending}
+    queue = [source for source in pending if source.archive is None]
+
+    def new_pool():
+        return ProcessPoolExecutor(workers, max_tasks_per_child=tasks_per_child, initializer=_init_worker, initargs=(max_memory,))
+
+    pool = new_pool()
+    with open(journal, 'a') as journal_file:
+        running = {}
+
+        def submit_next():
+            # At most two files per worker in flight, so archive members are
+            # not all held in memory at once.
+            while len(running) < 2 * workers:
+                if queue:
+                    source = queue.pop(0)
+                    future = pool.submit(annotate, source.filename, path=source.path)
+                else:
+                    member = next(members, None)
+                    if member is None:
+                        return
+                    source = by_key[member[0]]
+                    future = pool.submit(annotate, source.filename, data=member[1])
+                running[future] = source
+
+        try:
+            submit_next()
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                if any(isinstance(future.exception(), BrokenProcessPool) for future in finished):
+                    # A worker died (killed, or past --max-memory in C code)
+                    # and took the pool with it. Which file it was working on
+                    # is unknown, so every file in flight fails and a new
+                    # pool takes the rest.
+                    finished, _ = wait(running)
+                    pool.shutdown()
+                    pool = new_pool()
+                for future in finished:
+                    source = running.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        result = {'status': 'failed', 'error': 'worker process died', 'bytes': 0, 'seconds': 0.0}
+                    summary[result['status']] += 1
+                    summary['bytes'] += result['bytes']
+                    summary['busy_seconds'] += result['seconds']
+                    entry = {'key': source.key, 'fingerprint': source.fingerprint(), **result}
+                    journal_file.write(json.dumps(entry) + '\n')
+                    journal_file.flush()
+                    if result['status'] != 'ok':
+                        log(f"  {result['status']}: {source.key}: {result.get('error')}")
+                submit_next()
+        finally:
+            pool.shutdown()
+
+    summary['seconds'] = time.perf_counter() - start
+    processed = summary['ok'] + summary['invalid'] + summary['failed']
+    log(
+        f"{processed} files in {summary['seconds']:.1f} s ({summary['ok']} ok, {summary['invalid']} invalid, {summary['failed']} failed): "
+        f"{processed / max(summary['seconds'], 1e-9):.2f} files/s, {summary['bytes'] / 1e6 / max(summary['seconds'], 1e-9):.2f} MB/s"
+    )
+    return summary
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Annotate structure files ahead of time, writing the artifacts the web app reads.')
+    arg_parser.add_argument('inputs', nargs='+', help='structure files, directories, glob patterns or tar/zip archives')
+    arg_parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    arg_parser.add_argument('--journal', help=f"progress journal (default: <archive dir>/{JOURNAL_NAME})")
+    arg_parser.add_argument('--tasks-per-child', type=int, default=DEFAULT_TASKS_PER_CHILD, help='files a worker handles before it is replaced')
+    arg_parser.add_argument('--max-memory', type=int, help='address space limit per worker in MiB')
+    args = arg_parser.parse_args(argv)
+
+    max_memory = args.max_memory * 1024 * 1024 if args.max_memory else None
+    try:
+        summary = run(args.inputs, args.workers, args.journal, args.tasks_per_child, max_memory)
+    except ValueError as e:
+        arg_parser.error(str(e))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
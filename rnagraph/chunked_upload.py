@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+import flask
+
+from rnagraph.structure_io import STRUCTURE_EXTENSIONS, decode_structure, iter_gunzip, structure_format
+from rnagraph.structure_store import get_structure, prune, put_structure, structure_path
+
+SPOOL_DIR_ENV = 'RNAGRAPH_SPOOL_DIR'
+MAX_UPLOAD_SIZE_ENV = 'RNAGRAPH_MAX_UPLOAD_SIZE'
+DEFAULT_MAX_UPLOAD_SIZE = 512 * 1024 * 1024
+CHUNK_SIZE = 4 * 1024 * 1024
+# Files above this size bypass dcc.Upload and go through the chunked endpoint.
+CHUNKED_THRESHOLD = 8 * 1024 * 1024
+STALE_AFTER = 24 * 3600
+CHUNKED_PREFIX = 'chunked:'
+READ_SIZE = 256 * 1024
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+_hashes = {}
+# One lock per upload, held only for the offset checks, the metadata and the
+# spool file moves; request bodies are read and files decompressed outside.
+_locks = {}
+_lock = threading.Lock()
+
+
+class UploadError(Exception):
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def spool_dir():
+    directory = os.environ.get(SPOOL_DIR_ENV) or os.path.join(tempfile.gettempdir(), 'rnagraph-uploads')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def max_upload_size():
+    return int(os.environ.get(MAX_UPLOAD_SIZE_ENV, DEFAULT_MAX_UPLOAD_SIZE))
+
+
+def _paths(upload_id):
+    if not _UPLOAD_ID.match(upload_id or ''):
+        raise UploadError('Unknown upload', 404)
+    base = os.path.join(spool_dir(), upload_id)
+    return f"{base}.part", f"{base}.json"
+
+
+def _read_meta(upload_id):
+    part_path, meta_path = _paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        raise UploadError('Unknown upload', 404)
+    try:
+        meta['offset'] = os.path.getsize(part_path)
+    except FileNotFoundError:
+        meta['offset'] = meta['size'] if meta.get('digest') else 0
+    return meta
+
+
+def _write_meta(upload_id, meta):
+    _, meta_path = _paths(upload_id)
+    with open(meta_path, 'w') as f:
+        json.dump({key: value for key, value in meta.items() if key != 'offset'}, f)
+
+
+def _upload_lock(upload_id):
+    with _lock:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+
+def _hasher(upload_id, offset):
+    # The running hash lives in this process; after a restart or on another
+    # worker it is rebuilt from the spooled bytes.
+    state = _hashes.get(upload_id)
+    if state is not None and state[0] == offset:
+        return state[1]
+    hasher = hashlib.sha256()
+    part_path, _ = _paths(upload_id)
+    with open(part_path, 'rb') as f:
+        remaining = offset
+        while remaining:
+            block = f.read(min(READ_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def remove_stale(max_age=STALE_AFTER):
+    cutoff = time.time() - max_age
+    for name in os.listdir(spool_dir()):
+        path = os.path.join(spool_dir(), name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                _hashes.pop(name.split('.')[0], None)
+                with _lock:
+                    _locks.pop(name.split('.')[0], None)
+        except FileNotFoundError:
+            pass
+
+
+def create_upload(filename, size):
+    ext, _ = structure_format(filename or '')
+    if ext not in STRUCTURE_EXTENSIONS:
+        raise UploadError('Invalid file format. Please upload a PDB or CIF file.')
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError('Missing upload size')
+    if size > max_upload_size():
+        raise UploadError(f"File is larger than {max_upload_size()} bytes", 413)
+
+    remove_stale()
+    upload_id = uuid.uuid4().hex
+    part_path, _ = _paths(upload_id)
+    open(part_path, 'wb').close()
+    _write_meta(upload_id, {'filename': filename, 'size': size, 'sha256': None})
+    return {'upload_id': upload_id, 'offset': 0, 'size': size, 'chunk_size': CHUNK_SIZE, 'complete': False}
+
+
+def upload_status(upload_id):
+    meta = _read_meta(upload_id)
+    return {'upload_id': upload_id, 'offset': meta['offset'], 'size': meta['size'], 'chunk_size': CHUNK_SIZE, 'complete': meta['sha256'] is not None}
+
+
+def _check_chunk(meta, offset, length):
+    if meta['sha256'] is not None:
+        raise UploadError('Upload is already complete', 409)
+    if offset != meta['offset']:
+        raise UploadError(f"Expected offset {meta['offset']}", 409)
+    if length is not None and offset + length > meta['size']:
+        raise UploadError('Chunk goes past the declared size', 413)
+
+
+def append_chunk(upload_id, offset, stream, length=None):
+    meta = _read_meta(upload_id)
+    _check_chunk(meta, offset, length)
+
+    # The body is received before the upload is locked, so a slow client
+    # only holds up its own upload; chunks of the usual size stay in memory.
+    with tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE) as chunk:
+        received = 0
+        while True:
+            block = stream.read(READ_SIZE)
+            if not block:
+                break
+            received += len(block)
+            if offset + received > meta['size']:
+                raise UploadError('Chunk goes past the declared size', 413)
+            chunk.write(block)
+        chunk.seek(0)
+
+        with _upload_lock(upload_id):
+            meta = _read_meta(upload_id)
+            _check_chunk(meta, offset, length)
+            # A copy, so a failed write leaves the running hash as it was.
+            hasher = _hasher(upload_id, offset).copy()
+            part_path, _ = _paths(upload_id)
+            with open(part_path, 'r+b') as f:
+                f.seek(offset)
+                for block in iter(lambda: chunk.read(READ_SIZE), b''):
+                    f.write(block)
+                    hasher.update(block)
+
+            written = offset + received
+            if written == meta['size']:
+                meta['sha256'] = hasher.hexdigest()
+                _write_meta(upload_id, meta)
+                _hashes.pop(upload_id, None)
+            else:
+                _hashes[upload_id] = (written, hasher)
+
+    return {'upload_id': upload_id, 'offset': written, 'size': meta['size'], 'complete': meta['sha256'] is not None, 'sha256': meta['sha256']}
+
+
+def _stored(upload_id):
+    meta = _read_meta(upload_id)
+    if not meta.get('digest'):
+        return None
+    return get_structure(meta['digest'], meta['ext']), meta['ext'], meta['digest']
+
+
+def load_upload(upload_id, filename=None):
+    # Turns a completed upload into (decoded bytes, ext, digest). Plain files
+    # are moved into the structure store as they are, compressed ones are
+    # decompressed straight from the spool file. The metadata is kept so the
+    # callback can load the same upload again, e.g. after navigation.
+    with _upload_lock(upload_id):
+        stored = _stored(upload_id)
+        if stored is not None:
+            return stored
+        meta = _read_meta(upload_id)
+        if meta['sha256'] is None:
+            raise UploadError('Upload is not complete', 409)
+        ext, compression = structure_format(filename or meta['filename'])
+        part_path, _ = _paths(upload_id)
+
+        plain = compression is None and ext != 'bcif'
+        if plain:
+            digest = meta['sha256']
+            path = structure_path(digest, ext)
+            moved = not os.path.exists(path)
+            if moved:
+                os.replace(part_path, path)
+            else:
+                os.remove(part_path)
+            meta.update(digest=digest, ext=ext)
+            _write_meta(upload_id, meta)
+            decoded = get_structure(digest, ext)
+
+    if plain:
+        if moved:
+            prune(keep=path)
+        return decoded, ext, digest
+
+    # Decompressed without the lock; a concurrent load of the same upload
+    # may finish first, and then its result is used.
+    try:
+        with open(part_path, 'rb') as f:
+            if compression == 'gz':
+                data = b''.join(iter_gunzip(iter(lambda: f.read(READ_SIZE), b'')))
+            else:
+                data = f.read()
+    except FileNotFoundError:
+        stored = _stored(upload_id)
+        if stored is None:
+            raise UploadError('Unknown upload', 404)
+        return stored
+    decoded, ext = decode_structure(data, ext)
+    digest = put_structure(decoded, ext)
+
+    with _upload_lock(upload_id):
+        meta = _read_meta(upload_id)
+        if not meta.get('digest'):
+            meta.update(digest=digest, ext=ext)
+            _write_meta(upload_id, meta)
+        try:
+            os.remove(part_path)
+        except FileNotFoundError:
+            pass
+    return decoded, ext, digest
+
+
+def _error(error):
+    return flask.jsonify({'error': str(error)}), error.status
+
+
+def _create():
+    body = flask.request.get_json(silent=True) or {}
+    try:
+        return flask.jsonify(create_upload(body.get('filename'), body.get('size'))), 201
+    except UploadError as e:
+        return _error(e)
+
+
+def _upload(upload_id):
+    try:
+        if flask.request.method == 'PATCH':
+            offset = int(flask.request.headers.get('Upload-Offset', -1))
+            result = append_chunk(upload_id, offset, flask.request.stream, flask.request.content_length)
+        else:
+            result = upload_status(upload_id)
+    except UploadError as e:
+        return _error(e)
+    except ValueError:
+        return flask.jsonify({'error': 'Invalid Upload-Offset'}), 400
+    response = flask.jsonify(result)
+    response.headers['Upload-Offset'] = str(result['offset'])
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def install_upload_routes(app):
+    prefix = app.config.routes_pathname_prefix
+    app.server.add_url_rule(f"{prefix}uploads", 'rnagraph_upload_create', _create, methods=['POST'])
+    app.server.add_url_rule(f"{prefix}uploads/<upload_id>", 'rnagraph_upload', _upload, methods=['GET', 'PATCH'])
+
+
+def upload_config(app):
+    # Read by assets/chunked_upload.js from the data attributes of the
+    # element with id 'chunked-upload'.
+    return {
+        'data-url': app.get_relative_path('/uploads'),
+        'data-chunk-size': str(CHUNK_SIZE),
+        'data-threshold': str(CHUNKED_THRESHOLD),
+        'data-max-size': str(max_upload_size()),
+    }
@@ -0,0 +1,136 @@
+import math
+import os
+
+import numpy as np
+
+from rnagraph.figure_cache import FigureCache
+from rnagraph.figures import LINE_STYLES, template
+
+# Nucleotide-nucleotide distance map drawn from the centroid array. Distances
+# are computed in float32, a block of rows at a time, and reduced to at most
+# TILE_SIZE bins per axis (minimum distance per bin, so contacts survive the
+# downsampling). Only the visible range is computed; a full 5,000-nucleotide
+# map never holds more than BLOCK_ROWS rows of distances at once.
+
+TILE_SIZE = 512
+BLOCK_ROWS = 256
+DISTANCE_CAP = 30.0
+TILE_CACHE_ENV = 'RNAGRAPH_TILE_CACHE_ENTRIES'
+# Tiles are up to 1 MB each, so they get a smaller cache of their own.
+DEFAULT_TILE_CACHE_ENTRIES = 64
+MAP_HOVER = "Nucleotides %{y} and %{x}<br>Distance: %{z:.1f} Å<extra></extra>"
+
+
+tile_cache = FigureCache(max_entries=int(os.environ.get(TILE_CACHE_ENV, DEFAULT_TILE_CACHE_ENTRIES)))
+
+
+def bin_edges(start, stop, size=TILE_SIZE):
+    # Boundaries of at most size bins covering [start, stop).
+    bins = max(min(stop - start, size), 1)
+    return start + (np.arange(bins + 1) * (stop - start)) // bins
+
+
+def snap_range(start, stop, count, size=TILE_SIZE):
+    # Widen a visible range to a grid that depends only on its scale, so
+    # nearby zooms and pans share cached tiles.
+    start, stop = max(int(math.floor(start)), 0), min(int(math.ceil(stop)), count)
+    if stop <= start:
+        return 0, count
+    quantum = 1 << max(int(math.log2(max((stop - start) // 8, 1))), 0)
+    return start - start % quantum, min(-(-stop // quantum) * quantum, count)
+
+
+def distance_tile(points, row_range, col_range, size=TILE_SIZE, block=BLOCK_ROWS):
+    # (row edges, column edges, minimum distance per bin) for the given
+    # nucleotide ranges.
+    points = np.asarray(points, dtype=np.float32)
+    points = points - points.mean(axis=0) if len(points) else points
+    row_edges = bin_edges(*row_range, size)
+    col_edges = bin_edges(*col_range, size)
+    cols = points[col_edges[0]:col_edges[-1]]
+    col_norms = np.einsum('ij,ij->i', cols, cols)
+    col_starts = col_edges[:-1] - col_edges[0]
+
+    tile = np.empty((len(row_edges) - 1, len(col_edges) - 1), dtype=np.float32)
+    first_bin = 0
+    while first_bin < len(row_edges) - 1:
+        # Whole row bins, at least one, up to block rows.
+        last_bin = max(np.searchsorted(row_edges, row_edges[first_bin] + block, side='right') - 1, first_bin + 1)
+        rows = points[row_edges[first_bin]:row_edges[last_bin]]
+        squared = np.einsum('ij,ij->i', rows, rows)[:, None] + col_norms[None, :] - 2 * rows @ cols.T
+        reduced = np.minimum.reduceat(squared, col_starts, axis=1)
+        row_starts = row_edges[first_bin:last_bin] - row_edges[first_bin]
+        tile[first_bin:last_bin] = np.minimum.reduceat(reduced, row_starts, axis=0)
+        first_bin = last_bin
+    np.sqrt(np.maximum(tile, 0, out=tile), out=tile)
+    return row_edges, col_edges, tile
+
+
+def _centers(edges):
+    return (edges[:-1] + edges[1:] - 1) / 2
+
+
+def overlay_trace(first, second, row_range, col_range, name):
+    # Interacting pairs inside the tile, both halves of the symmetric map.
+    rows = np.concatenate([first, second])
+    cols = np.concatenate([second, first])
+    inside = (rows >= row_range[0]) & (rows < row_range[1]) & (cols >= col_range[0]) & (cols < col_range[1])
+    return {
+        'hoverinfo': 'skip',
+        'marker': {'color': LINE_STYLES.get(name, {'color': 'black'})['color'], 'size': 4, 'symbol': 'square-open'},
+        'mode': 'markers',
+        'name': name,
+        'showlegend': False,
+        'x': cols[inside],
+        'y': rows[inside],
+        'type': 'scattergl',
+    }
+
+
+def contact_map_figure(tile, overlays=()):
+    row_edges, col_edges, distances = tile
+    data = [{
+        'colorbar': {'thickness': 12, 'title': {'text': 'Å'}},
+        'colorscale': 'Viridis',
+        'hovertemplate': MAP_HOVER,
+        'name': 'distances',
+        'reversescale': True,
+        'x': _centers(col_edges),
+        'y': _centers(row_edges),
+        'z': distances,
+        'zauto': False,
+        'zmax': DISTANCE_CAP,
+        'zmin': 0,
+        'type': 'heatmap',
+    }]
+    data.extend(overlays)
+    return {
+        'data': data,
+        'layout': {
+            'autosize': True,
+            'dragmode': 'zoom',
+            'height': 610,
+            'margin': {'b': 40, 'l': 50, 'r': 0, 't': 10},
+            'paper_bgcolor': '#fafafb',
+            'showlegend': False,
+            'template': template(),
+            # Keeps the user's zoom when a new tile replaces the figure.
+            'uirevision': 'contact-map',
+            'xaxis': {'title': {'text': 'Nucleotide'}, 'constrain': 'domain'},
+            'yaxis': {'title': {'text': 'Nucleotide'}, 'autorange': 'reversed', 'scaleanchor': 'x', 'constrain': 'domain'},
+        },
+    }
+
+
+def visible_range(relayoutData, axis, count):
+    # The nucleotide range shown on one axis after a zoom or pan, the whole
+    # structure after a reset.
+    relayoutData = relayoutData or {}
+    if f"{axis}.range[0]" in relayoutData:
+        bounds = relayoutData[f"{axis}.range[0]"], relayoutData[f"{axis}.range[1]"]
+    elif f"{axis}.range" in relayoutData:
+        bounds = relayoutData[f"{axis}.range"]
+    else:
+        return 0, count
+    low, high = sorted(bounds)
+    return low, high + 1
@@ -0,0 +1,56 @@
+import numpy as np
+
+from rnagraph.figures import dna_nucleotides, rna_nucleotides
+
+CONTACT_LAYER = 'ligand_contacts'
+DEFAULT_CUTOFF = 4.0
+HYDROGENS = ('H', 'D')
+
+
+def _element_mask(elements, include):
+    if include is None:
+        return ~np.isin(elements, HYDROGENS)
+    return np.isin(elements, [element.upper() for element in include])
+
+
+def _residue_record(residue):
+    chain, number, icode, name, _ = residue
+    return {'label': None, 'auth': {'chain': chain, 'number': number, 'icode': icode or None, 'name': name}}
+
+
+def ligand_contacts(index, cutoff=DEFAULT_CUTOFF, ligand_elements=None, nucleotide_elements=None):
+    # Heteroatom residue / nucleotide pairs with atoms at most cutoff apart,
+    # one record per residue pair for its closest atoms. Element filters
+    # are lists of element symbols (as Biopython reports them, upper case);
+    # by default every non-hydrogen atom counts.
+    atoms, residues = index.atoms, index.residues
+    hetero = np.array([residue[4].startswith('H_') for residue in residues], dtype=bool)
+    nucleotide = np.array([residue[3] in rna_nucleotides or residue[3] in dna_nucleotides for residue in residues], dtype=bool)
+    if not hetero.any() or not nucleotide.any():
+        return []
+
+    # Element filters only look at the few atoms that can take part:
+    # heteroatom residues on one side, atoms near them on the other.
+    hetero_atoms = np.flatnonzero(hetero[atoms['residue']])
+    ligand_atoms = hetero_atoms[_element_mask(atoms['element'][hetero_atoms], ligand_elements)]
+
+    queries, found, distances = index.atom_index.query_radius(atoms['coord'][ligand_atoms], cutoff)
+    keep = nucleotide[atoms['residue'][found]] & _element_mask(atoms['element'][found], nucleotide_elements)
+    first, second, distances = ligand_atoms[queries[keep]], found[keep], distances[keep]
+
+    # Closest atom pair per (heteroatom residue, nucleotide) pair.
+    first_residue, second_residue = atoms['residue'][first], atoms['residue'][second]
+    order = np.lexsort((distances, second_residue, first_residue))
+    pair_keys = first_residue[order] * len(residues) + second_residue[order]
+    closest = order[np.concatenate([[True], pair_keys[1:] != pair_keys[:-1]])] if len(order) else order
+
+    return [
+        {
+            'nt1': _residue_record(residues[first_residue[i]]),
+            'nt2': _residue_record(residues[second_residue[i]]),
+            'atom1': str(atoms['name'][first[i]]),
+            'atom2': str(atoms['name'][second[i]]),
+            'distance': round(float(distances[i]), 3),
+        }
+        for i in closest
+    ]
@@ -0,0 +1,110 @@
+import numpy as np
+
+from rnagraph.figures import dna_nucleotides, rna_nucleotides
+
+# Superposition of the models of a structure (or of related structures, one
+# model each) as batched NumPy over a models x nucleotides x 3 array: Kabsch
+# fits, per-nucleotide RMSF and the pairwise model RMSD matrix. Nucleotides
+# are matched by chain and residue id, in the order of the first model.
+
+ATOM_NAME = "C4'"
+ITERATIONS = 3
+FLEXIBILITY = 'Flexibility (RMSF, Å)'
+FLEXIBILITY_COLORSCALE = 'YlOrRd'
+
+
+def nucleotide_keys(model):
+    return [
+        (chain.id, residue.id) for chain in model for residue in chain
+        if residue.resname in rna_nucleotides or residue.resname in dna_nucleotides
+    ]
+
+
+def ensemble_coordinates(models, atom_name=ATOM_NAME):
+    # (keys, models x nucleotides x 3 array) with the atom_name atom of each
+    # nucleotide, its centroid when the atom is missing (or atom_name is
+    # None) and NaN where a model lacks the nucleotide.
+    models = list(models)
+    keys = nucleotide_keys(models[0]) if models else []
+    positions = {key: position for position, key in enumerate(keys)}
+    coordinates = np.full((len(models), len(keys), 3), np.nan)
+    for index, model in enumerate(models):
+        for chain in model:
+            for residue in chain:
+                position = positions.get((chain.id, residue.id))
+                if position is None:
+                    continue
+                if atom_name is not None and atom_name in residue:
+                    coordinates[index, position] = residue[atom_name].get_coord()
+                else:
+                    coordinates[index, position] = np.mean([atom.get_coord() for atom in residue], axis=0)
+    return keys, coordinates
+
+
+def kabsch(mobile, target):
+    # Rotations (models x 3 x 3) that best fit each centered model in mobile
+    # onto the centered target, applied as mobile @ rotation.
+    covariance = np.einsum('mni,nj->mij', mobile, target)
+    u, _, vt = np.linalg.svd(covariance)
+    # Reflections are turned into proper rotations.
+    sign = np.sign(np.linalg.det(u @ vt))
+    u[:, :, -1] *= np.where(sign == 0, 1, sign)[:, None]
+    return u @ vt
+
+
+def superpose(coordinates, fit=None, iterations=ITERATIONS):
+    # Models fitted on the fit nucleotides (all by default) to their mean:
+    # first onto the first model, then onto the mean of the fitted models.
+    fit = np.ones(coordinates.shape[1], dtype=bool) if fit is None else fit
+    centered = coordinates - coordinates[:, fit].mean(axis=1)[:, None]
+    reference = centered[0, fit]
+    aligned = centered
+    for _ in range(iterations):
+        aligned = centered @ kabsch(centered[:, fit], reference)
+        reference = aligned[:, fit].mean(axis=0)
+    return aligned
+
+
+def rmsf(aligned):
+    # Root mean square fluctuation of each nucleotide about its mean position.
+    deviations = aligned - aligned.mean(axis=0)
+    return np.sqrt(np.einsum('mni,mni->n', deviations, deviations) / len(aligned))
+
+
+def rmsd_matrix(coordinates, fit=None):
+    # RMSD of every pair of models after their own optimal superposition,
+    # from the singular values of all pairwise covariance matrices at once.
+    fit = np.ones(coordinates.shape[1], dtype=bool) if fit is None else fit
+    points = coordinates[:, fit]
+    points = points - points.mean(axis=1)[:, None]
+    count, size = len(points), points.shape[1]
+    stacked = points.transpose(0, 2, 1).reshape(3 * count, size)
+    covariance = (stacked @ stacked.T).reshape(count, 3, count, 3).transpose(0, 2, 1, 3)
+    singular = np.linalg.svd(covariance, compute_uv=False)
+    sign = np.where(np.linalg.det(covariance) < 0, -1.0, 1.0)
+    overlap = singular[..., 0] + singular[..., 1] + sign * singular[..., 2]
+    squares = np.einsum('mni,mni->m', points, points)
+    msd = (squares[:, None] + squares[None, :] - 2 * overlap) / size
+    rmsd = np.sqrt(np.maximum(msd, 0))
+    np.fill_diagonal(rmsd, 0)
+    return rmsd
+
+
+class Ensemble:
+    # Models superposed on the nucleotides present in all of them. rmsf is
+    # NaN for nucleotides missing from some model.
+
+    def __init__(self, models, atom_name=ATOM_NAME, iterations=ITERATIONS):
+        self.keys, self.coordinates = ensemble_coordinates(models, atom_name)
+        self.complete = ~np.isnan(self.coordinates).any(axis=(0, 2))
+        if self.complete.any():
+            self.aligned = superpose(self.coordinates, self.complete, iterations)
+            self.rmsf = rmsf(self.aligned)
+            self.rmsd = rmsd_matrix(self.coordinates, self.complete)
+        else:
+            self.aligned = self.coordinates
+            self.rmsf = np.full(len(self.keys), np.nan)
+            self.rmsd = np.zeros((len(self.coordinates), len(self.coordinates)))
+
+    def __len__(self):
+        return len(self.coordinates)
@@ -0,0 +1,67 @@
+import os
+import threading
+from collections import OrderedDict
+
+import flask
+
+MAX_ENTRIES_ENV = 'RNAGRAPH_FIGURE_CACHE_ENTRIES'
+DEFAULT_MAX_ENTRIES = 256
+
+
+class FigureCache:
+    # LRU cache of built figures and interaction layers, keyed by the
+    # structure's content hash and the options the value depends on.
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get(MAX_ENTRIES_ENV, DEFAULT_MAX_ENTRIES))
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+
+figure_cache = FigureCache()
+
+
+def install_cache_stats_route(app):
+    prefix = app.config.routes_pathname_prefix
+    app.server.add_url_rule(f"{prefix}_rnagraph/figure-cache", 'rnagraph_figure_cache', lambda: flask.jsonify(figure_cache.stats()))
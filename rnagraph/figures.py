@@ -0,0 +1,200 @@
+import numpy as np
+import plotly.io as pio
+
+# Plain-dict builders for the RNA graph figure. They emit the same JSON as the
+# graph_objects code they replace but skip Plotly's property validation.
+
+rna_nucleotides = ['A', 'C', 'G', 'U', 'I']
+dna_nucleotides = ['DA', 'DC', 'DG', 'DU', 'DI', 'DT']
+
+NUCLEOTIDE_HOVER = "Nucleotide: %{customdata[0]} %{customdata[4]}<br>Chain: %{customdata[1]}<br>Coordinates:<br> x: %{customdata[2][0]:.2f}<br> y: %{customdata[2][1]:.2f}<br> z: %{customdata[2][2]:.2f}<extra></extra>"
+HETEROATOM_HOVER = "Heteroatom: %{customdata[0]}<br>Chain: %{customdata[1]}<br>Coordinates:<br>x: %{customdata[2][0]:.2f}<br>y: %{customdata[2][1]:.2f}<br>z: %{customdata[2][2]:.2f}<extra></extra>"
+
+LINE_STYLES = {
+    'nc_base_base': {'color': 'black', 'width': 2, 'dash': None},
+    'c_base_base': {'color': 'blue', 'width': 2, 'dash': None},
+    'phosphodiester': {'color': 'green', 'width': 6, 'dash': 'longdash'},
+    'stacking': {'color': 'orange', 'width': 6, 'dash': 'longdash'},
+    'ligand_contacts': {'color': 'violet', 'width': 3, 'dash': 'dash'},
+    'backbone': {'color': 'gray', 'width': 4, 'dash': None},
+}
+DEFAULT_LINE_STYLE = {'color': 'black', 'width': 1, 'dash': None}
+
+HIDDEN_AXES = {'xaxis': {'visible': False}, 'yaxis': {'visible': False}, 'zaxis': {'visible': False}}
+
+_templates = {}
+
+
+def template():
+    # go.Figure bakes the default template into the layout; do the same so
+    # the browser renders dict figures identically.
+    name = pio.templates.default
+    if name not in _templates:
+        _templates[name] = pio.templates[name].to_plotly_json() if name else {}
+    return _templates[name]
+
+
+def axes(points):
+    # Contiguous x/y/z columns: orjson only writes C-contiguous arrays
+    # directly, anything else sends Plotly through a full cleaning pass.
+    x, y, z = np.ascontiguousarray(np.asarray(points).T)
+    return {'x': x, 'y': y, 'z': z}
+
+
+CUSTOMDATA_FIELDS = ['Nucleotide', 'Chain_id', 'Coordinate', 'Color', 'Nucleotide_id']
+
+
+def field(records, name):
+    # One field of every record; archived tables hand over the column itself.
+    if hasattr(records, 'column'):
+        return records.column(name)
+    return [record[name] for record in records]
+
+
+def customdata(residue_info):
+    return [list(row) for row in zip(*(field(residue_info, name) for name in CUSTOMDATA_FIELDS))]
+
+
+def nucleotide_trace(points, nucleotide_info, colors):
+    return {
+        'customdata': customdata(nucleotide_info),
+        'hoverinfo': 'text',
+        'hovertemplate': NUCLEOTIDE_HOVER,
+        'marker': {'color': colors, 'line': {'color': 'white', 'width': 0.5}, 'opacity': 1.0, 'size': 8},
+        'mode': 'markers',
+        'name': 'nucleotides',
+        **axes(points),
+        'type': 'scatter3d',
+    }
+
+
+def heteroatom_trace(heteroatoms, heteroatom_info):
+    return {
+        'customdata': customdata(heteroatom_info),
+        'hoverinfo': 'text',
+        'hovertemplate': HETEROATOM_HOVER,
+        'marker': {'color': 'black', 'line': {'color': 'black', 'width': 0.5}, 'opacity': 0.8, 'size': 6},
+        'mode': 'markers',
+        'name': 'heteroatoms',
+        'visible': False,
+        **axes(heteroatoms),
+        'type': 'scatter3d',
+    }
+
+
+def base_layout():
+    return {
+        'autosize': True,
+        'clickmode': 'event+select',
+        'dragmode': 'select',
+        'height': 610,
+        'margin': {'b': 0, 'l': 0, 'r': 0, 't': 0},
+        'newselection': {'mode': 'gradual'},
+        'paper_bgcolor': '#fafafb',
+        'scene': {
+            'xaxis': {'showspikes': False, 'visible': False},
+            'yaxis': {'showspikes': False, 'visible': False},
+            'zaxis': {'showspikes': False, 'visible': False},
+        },
+        'showlegend': False,
+        'template': template(),
+    }
+
+
+def base_figure(points, nucleotide_info, heteroatoms, heteroatom_info, colors):
+    data = [nucleotide_trace(points, nucleotide_info, colors)]
+    if heteroatoms is not None:
+        data.append(heteroatom_trace(heteroatoms, heteroatom_info))
+    return {'data': data, 'layout': base_layout()}
+
+
+def empty_figure():
+    return {'data': [], 'layout': {'template': template()}}
+
+
+def residue_index(residue_customdata):
+    # (number, chain, name) -> customdata row, keeping the first match like
+    # the linear scan it replaces.
+    index = {}
+    for residue in residue_customdata or []:
+        index.setdefault((residue[4], residue[1], residue[0]), residue)
+    return index
+
+
+def line_style(interaction_type):
+    style = LINE_STYLES.get(interaction_type, DEFAULT_LINE_STYLE)
+    line = {'color': style['color'], 'width': style['width']}
+    if style['dash'] is not None:
+        line['dash'] = style['dash']
+    return line
+
+
+def line_trace(start, end, interaction_type):
+    return {
+        'hoverinfo': 'none',
+        'line': line_style(interaction_type),
+        'mode': 'lines',
+        'name': interaction_type,
+        'showlegend': False,
+        'x': [start[0], end[0]],
+        'y': [start[1], end[1]],
+        'z': [start[2], end[2]],
+        'type': 'scatter3d',
+    }
+
+
+def interaction_traces(interaction_list, nucleotide_info=None, heteroatom_info=None, interaction_type=None):
+    if not interaction_list:
+        return None
+    nucleotides = residue_index(nucleotide_info)
+    heteroatoms = residue_index(heteroatom_info) if heteroatom_info is not None else None
+
+    def find(nt):
+        auth = nt['auth']
+        key = (auth['number'], auth['chain'], auth['name'])
+        if auth['name'] not in rna_nucleotides and auth['name'] not in dna_nucleotides:
+            return heteroatoms.get(key) if heteroatoms is not None else None
+        return nucleotides.get(key)
+
+    lines = []
+    for pair in interaction_list:
+        nt1_info = find(pair['nt1'])
+        if nt1_info is None:
+            continue
+        nt2_info = find(pair['nt2'])
+        if nt2_info is None:
+            continue
+        lines.append(line_trace(nt1_info[2], nt2_info[2], interaction_type))
+    return lines if lines else None
+
+
+def contact_traces(contacts, nucleotide_info=None, heteroatom_info=None, interaction_type='ligand_contacts'):
+    # All contacts in one trace, segments separated by None gaps, so a
+    # structure with hundreds of ions adds a single trace to the figure.
+    if not contacts or heteroatom_info is None:
+        return None
+    nucleotides = residue_index(nucleotide_info)
+    heteroatoms = residue_index(heteroatom_info)
+    x, y, z = [], [], []
+    for contact in contacts:
+        start = heteroatoms.get((contact['nt1']['auth']['number'], contact['nt1']['auth']['chain'], contact['nt1']['auth']['name']))
+        end = nucleotides.get((contact['nt2']['auth']['number'], contact['nt2']['auth']['chain'], contact['nt2']['auth']['name']))
+        if start is None or end is None:
+            continue
+        x.extend([start[2][0], end[2][0], None])
+        y.extend([start[2][1], end[2][1], None])
+        z.extend([start[2][2], end[2][2], None])
+    if not x:
+        return None
+    return [{
+        'connectgaps': False,
+        'hoverinfo': 'none',
+        'line': line_style(interaction_type),
+        'mode': 'lines',
+        'name': interaction_type,
+        'showlegend': False,
+        'x': x,
+        'y': y,
+        'z': z,
+        'type': 'scatter3d',
+    }]
@@ -0,0 +1,103 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, shortest_path
+
+from rnagraph.network import NETWORK_TYPES
+
+# The interaction network as a sparse (CSR) adjacency matrix over the
+# nucleotides, in the order of the figure's nucleotide trace, with vectorized
+# analytics for colouring residues by a metric.
+
+METRICS = {
+    'interactions': 'Interaction count',
+    'degree': 'Interaction partners',
+    'component': 'Connected component',
+}
+METRIC_COLORSCALES = {'interactions': 'Viridis', 'degree': 'Viridis', 'component': 'Turbo'}
+
+
+def _symmetric(first, second, size):
+    matrix = coo_matrix((np.ones(len(first), dtype=np.int32), (first, second)), shape=(size, size)).tocsr()
+    return (matrix + matrix.T).tocsr()
+
+
+class InteractionGraph:
+    # Nodes are nucleotides, identified as in the residue customdata rows
+    # [name, chain, coordinate, color, number]. Edges are the annotated
+    # interactions of the given types; with backbone, consecutive nucleotides
+    # of a chain are joined as well for components and paths.
+
+    def __init__(self, residue_customdata, interactions, types=None, backbone=True):
+        self.keys = {}
+        for position, residue in enumerate(residue_customdata or []):
+            self.keys.setdefault((residue[4], residue[1], residue[0]), position)
+        self.size = len(residue_customdata or [])
+        self.types = list(NETWORK_TYPES if types is None else types)
+
+        first, second, kinds = [], [], []
+        for kind, name in enumerate(self.types):
+            for interaction in (interactions or {}).get(name) or []:
+                nt1, nt2 = interaction['nt1']['auth'], interaction['nt2']['auth']
+                i = self.keys.get((nt1['number'], nt1['chain'], nt1['name']))
+                j = self.keys.get((nt2['number'], nt2['chain'], nt2['name']))
+                if i is not None and j is not None and i != j:
+                    first.append(i)
+                    second.append(j)
+                    kinds.append(kind)
+        self.first = np.array(first, dtype=np.int64)
+        self.second = np.array(second, dtype=np.int64)
+        self.kinds = np.array(kinds, dtype=np.int64)
+        # Interaction multiplicities per nucleotide pair.
+        self.interactions = _symmetric(self.first, self.second, self.size)
+
+        self.adjacency = self.interactions
+        if backbone and self.size > 1:
+            chains = np.array([residue[1] for residue in residue_customdata], dtype=object)
+            links = np.flatnonzero(chains[:-1] == chains[1:])
+            self.adjacency = (self.interactions + _symmetric(links, links + 1, self.size)).tocsr()
+
+    def __len__(self):
+        return self.size
+
+    def interaction_counts(self, interaction_type=None):
+        # Annotated interactions each nucleotide takes part in.
+        mask = slice(None) if interaction_type is None else self.kinds == self.types.index(interaction_type)
+        return np.bincount(self.first[mask], minlength=self.size) + np.bincount(self.second[mask], minlength=self.size)
+
+    def degree(self):
+        # Distinct interaction partners of each nucleotide.
+        return np.diff(self.interactions.indptr)
+
+    def components(self):
+        # Component label of each nucleotide, largest component first.
+        _, labels = connected_components(self.adjacency, directed=False)
+        sizes = np.bincount(labels)
+        rank = np.empty_like(sizes)
+        rank[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+        return rank[labels]
+
+    def distances(self, source):
+        # Hops from source to every nucleotide, inf where unreachable.
+        return shortest_path(self.adjacency, directed=False, unweighted=True, indices=source)
+
+    def shortest_path(self, source, target):
+        # Nucleotide positions on a shortest path, [] when there is none.
+        _, predecessors = shortest_path(self.adjacency, directed=False, unweighted=True, indices=source, return_predecessors=True)
+        if source != target and predecessors[target] < 0:
+            return []
+        path = [target]
+        while path[-1] != source:
+            path.append(int(predecessors[path[-1]]))
+        return path[::-1]
+
+    def position(self, number, chain, name):
+        return self.keys.get((number, chain, name))
+
+    def metric(self, name):
+        if name == 'interactions':
+            return self.interaction_counts()
+        if name == 'degree':
+            return self.degree()
+        if name == 'component':
+            return self.components()
+        raise ValueError(f"Unknown metric {name!r}, expected one of {', '.join(METRICS)}")
@@ -0,0 +1,81 @@
+import numpy as np
+
+from rnagraph.figures import HETEROATOM_HOVER, axes
+from rnagraph.spatial import residue_centroids
+
+# Hetero residues (and waters) sorted into classes from the atom table in one
+# pass, so each class can be drawn as its own trace, built the first time it
+# is shown. Waters only get plain markers: crystal structures have thousands.
+
+HETEROATOM_CLASSES = ['ions', 'modified', 'ligands', 'waters']
+HETEROATOM_LABELS = {
+    'ions': 'Ions',
+    'modified': 'Modified nucleotides',
+    'ligands': 'Ligands',
+    'waters': 'Waters',
+}
+WATER_NAMES = ['HOH', 'WAT', 'H2O', 'DOD', 'D2O']
+# Metal cations and halide anions.
+ION_NAMES = [
+    'MG', 'K', 'NA', 'CA', 'MN', 'ZN', 'CO', 'NI', 'CU', 'CU1', 'FE', 'FE2', 'CD', 'SR', 'BA', 'CS', 'RB', 'LI',
+    'TL', 'HG', 'PB', 'AG', 'AU', 'PT', 'IR', 'OS', 'RU', 'RH', 'YB', 'LU', 'EU', 'TB', 'SM', 'GD', 'LA',
+    'CL', 'BR', 'IOD', 'F',
+]
+# Single-atom residues of these elements are not ions.
+ORGANIC_ELEMENTS = ['H', 'D', 'C', 'N', 'O', 'S', 'P']
+SUGAR_ATOMS = ["C1'", 'C1*']
+CLASS_STYLES = {
+    'ions': {'color': 'rgb(148, 103, 189)', 'size': 6},
+    'modified': {'color': 'rgb(140, 86, 75)', 'size': 8},
+    'ligands': {'color': 'black', 'size': 6},
+    'waters': {'color': 'rgb(23, 190, 207)', 'size': 3},
+}
+
+
+def classify_heteroatoms(index):
+    # Class of each residue of index.residues, '' for polymer residues.
+    # Hetero residues with a sugar C1' atom are modified nucleotides; known
+    # ion names and lone non-organic atoms are ions.
+    atoms, residues = index.atoms, index.residues
+    names = np.array([residue[3] for residue in residues], dtype=str)
+    flags = np.array([residue[4] for residue in residues], dtype=str)
+    counts = np.bincount(atoms['residue'], minlength=len(residues))
+    # Atoms are grouped by residue, so the first atom of each is found by
+    # a search.
+    first_atoms = np.minimum(np.searchsorted(atoms['residue'], np.arange(len(residues))), max(len(atoms['residue']) - 1, 0))
+    elements = atoms['element'][first_atoms] if len(atoms['residue']) else np.full(len(residues), '')
+    sugar = np.zeros(len(residues), dtype=bool)
+    sugar[atoms['residue'][np.isin(atoms['name'], SUGAR_ATOMS)]] = True
+
+    water = (flags == 'W') | np.isin(names, WATER_NAMES)
+    hetero = np.char.startswith(flags, 'H_') | water
+    ion = np.isin(names, ION_NAMES) | ((counts == 1) & ~np.isin(elements, ORGANIC_ELEMENTS))
+    classes = np.full(len(residues), '', dtype='U8')
+    classes[hetero] = 'ligands'
+    classes[hetero & sugar] = 'modified'
+    classes[hetero & ion] = 'ions'
+    classes[water] = 'waters'
+    return classes
+
+
+def heteroatom_class_trace(index, classes, name):
+    # Markers at the residue centroids of one class, None when it is empty.
+    positions = np.flatnonzero(classes == name)
+    if not len(positions):
+        return None
+    centers = residue_centroids(index.atoms)[positions]
+    style = CLASS_STYLES[name]
+    trace = {
+        'hoverinfo': 'skip',
+        'marker': {'color': style['color'], 'line': {'color': style['color'], 'width': 0.5}, 'opacity': 0.8, 'size': style['size']},
+        'mode': 'markers',
+        'name': name,
+        **axes(centers),
+        'type': 'scatter3d',
+    }
+    if name != 'waters':
+        residues = [index.residues[position] for position in positions.tolist()]
+        trace['customdata'] = [[residue[3], residue[0], center.tolist(), style['color'], residue[1]] for residue, center in zip(residues, centers)]
+        trace['hoverinfo'] = 'text'
+        trace['hovertemplate'] = HETEROATOM_HOVER
+    return trace
@@ -0,0 +1,124 @@
+import numpy as np
+
+from rnagraph.contacts import CONTACT_LAYER
+from rnagraph.figures import dna_nucleotides, line_style, residue_index, rna_nucleotides
+from rnagraph.network import NETWORK_TYPES
+
+# Interactions gained and lost between two structures (or two models of one).
+# Both sides are turned into columns, residues at either end get an id from
+# one index over both structures, and every interaction becomes an integer
+# code, so the comparison is a pair of np.isin calls per type.
+
+DIFF_TYPES = NETWORK_TYPES + [CONTACT_LAYER]
+DIFF_CHANGES = ['gained', 'lost']
+DIFF_COLORS = {'gained': 'rgb(0, 158, 115)', 'lost': 'rgb(213, 94, 0)'}
+# Base pairs are told apart by their Leontis-Westhof class as well; stackings
+# have no direction.
+CLASS_FIELDS = {'c_base_base': 'lw', 'nc_base_base': 'lw'}
+UNORDERED = ['stacking']
+
+
+def interaction_columns(records, residues, class_field=None):
+    # Residue ids at both ends, from the residues dict shared by the two
+    # sides ((chain, number, insertion code) -> id), and the class column.
+    columns = {}
+    for end in ['nt1', 'nt2']:
+        ends = (record[end]['auth'] for record in records)
+        ids = (residues.setdefault((nt['chain'], nt['number'], nt.get('icode') or ''), len(residues)) for nt in ends)
+        columns[end] = np.fromiter(ids, dtype=np.int64, count=len(records))
+    columns['class'] = np.array([record.get(class_field) or '' for record in records] if class_field else [''] * len(records), dtype=str)
+    return columns
+
+
+def reversed_class(name):
+    # cWH seen from the other residue is cHW.
+    return name[0] + name[2] + name[1] if len(name) == 3 else name
+
+
+def interaction_codes(columns, size, unordered=False):
+    # One int64 per interaction, equal for the same interaction on either
+    # side: residue ids in ascending order (the class turned around with
+    # them) and the class.
+    first, second, classes = columns['nt1'], columns['nt2'], columns['class']
+    swap = first > second
+    if unordered:
+        classes = np.full(len(first), '')
+    elif swap.any():
+        names, inverse = np.unique(classes, return_inverse=True)
+        classes = np.where(swap, np.array([reversed_class(name) for name in names], dtype=str)[inverse], classes)
+    return classes, np.minimum(first, second) * size + np.maximum(first, second)
+
+
+def interaction_diff(before, after, types=None):
+    # {type: {'gained': records of after, 'lost': records of before, 'kept':
+    # count}} for two {type: records} dicts.
+    types = DIFF_TYPES if types is None else types
+    residues = {}
+    columns = {}
+    for name in types:
+        class_field = CLASS_FIELDS.get(name)
+        columns[name] = [interaction_columns(list(side.get(name) or []), residues, class_field) for side in (before, after)]
+
+    size = max(len(residues), 1)
+    diff = {}
+    for name in types:
+        (old_classes, old_pairs), (new_classes, new_pairs) = [interaction_codes(side, size, name in UNORDERED) for side in columns[name]]
+        _, class_ids = np.unique(np.concatenate([old_classes, new_classes]), return_inverse=True)
+        codes = class_ids * size * size + np.concatenate([old_pairs, new_pairs])
+        old_codes, new_codes = codes[:len(old_pairs)], codes[len(old_pairs):]
+        gained = ~np.isin(new_codes, old_codes)
+        lost = ~np.isin(old_codes, new_codes)
+        old, new = list(before.get(name) or []), list(after.get(name) or [])
+        diff[name] = {
+            'gained': [new[i] for i in np.flatnonzero(gained)],
+            'lost': [old[i] for i in np.flatnonzero(lost)],
+            'kept': int(len(new) - gained.sum()),
+        }
+    return diff
+
+
+def diff_trace_name(interaction_type, change):
+    return f"{interaction_type} {change}"
+
+
+def is_diff_trace(trace):
+    return (trace.get('name') or '').endswith(tuple(f" {change}" for change in DIFF_CHANGES))
+
+
+def diff_traces(diff, nucleotide_info=None, heteroatom_info=None):
+    # One line trace per interaction type and change, segments separated by
+    # None gaps. Residue info is given as figure customdata rows; ends not
+    # in the figure are left out.
+    nucleotides = residue_index(nucleotide_info)
+    heteroatoms = residue_index(heteroatom_info)
+
+    def find(nt):
+        auth = nt['auth']
+        index = nucleotides if auth['name'] in rna_nucleotides or auth['name'] in dna_nucleotides else heteroatoms
+        return index.get((auth['number'], auth['chain'], auth['name']))
+
+    traces = []
+    for interaction_type, changes in diff.items():
+        for change in DIFF_CHANGES:
+            x, y, z = [], [], []
+            for record in changes[change]:
+                start, end = find(record['nt1']), find(record['nt2'])
+                if start is None or end is None:
+                    continue
+                x.extend([start[2][0], end[2][0], None])
+                y.extend([start[2][1], end[2][1], None])
+                z.extend([start[2][2], end[2][2], None])
+            if x:
+                traces.append({
+                    'connectgaps': False,
+                    'hoverinfo': 'none',
+                    'line': {**line_style(interaction_type), 'color': DIFF_COLORS[change]},
+                    'mode': 'lines',
+                    'name': diff_trace_name(interaction_type, change),
+                    'showlegend': False,
+                    'x': x,
+                    'y': y,
+                    'z': z,
+                    'type': 'scatter3d',
+                })
+    return traces
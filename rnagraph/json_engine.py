@@ -0,0 +1,58 @@
+import dataclasses
+import enum
+import os
+
+import plotly.io as pio
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_ENGINE_ENV = 'RNAGRAPH_JSON_ENGINE'
+ENGINES = ['auto', 'orjson', 'json']
+
+# Dash serializes layouts and callback responses with plotly.io.json, so the
+# engine set here applies to every response. orjson writes NumPy arrays
+# natively; the json engine is kept as a fallback when orjson is missing.
+
+
+def resolve_engine(engine=None):
+    engine = engine or os.environ.get(JSON_ENGINE_ENV) or 'auto'
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown JSON engine {engine!r}, expected one of {', '.join(ENGINES)}")
+    if engine == 'json' or orjson is None:
+        return 'json'
+    return 'orjson'
+
+
+def configure_json_engine(app=None, engine=None):
+    engine = resolve_engine(engine)
+    pio.json.config.default_engine = engine
+    if app is not None:
+        app.server.config[JSON_ENGINE_ENV] = engine
+    return engine
+
+
+def active_engine():
+    return resolve_engine(pio.json.config.default_engine)
+
+
+def jsonable(value):
+    # orjson serializes the rnapolis dataclasses and enums itself; the json
+    # engine's encoder does not, so convert them to plain values there.
+    if active_engine() == 'orjson':
+        return value
+    return _plain(value)
+
+
+def _plain(value):
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {field.name: _plain(getattr(value, field.name)) for field in dataclasses.fields(value)}
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
@@ -0,0 +1,204 @@
+import math
+
+import numpy as np
+
+from rnagraph.figures import LINE_STYLES, line_style, template
+
+# A 2D view of the interaction network: nucleotides laid out by their
+# secondary structure and drawn with WebGL (scattergl) traces, one trace per
+# interaction type, so it stays responsive with 10k+ nucleotides.
+
+NETWORK_TYPES = ['phosphodiester', 'c_base_base', 'nc_base_base', 'stacking']
+SPACING = 1.0
+NETWORK_HOVER = "Nucleotide: %{customdata[0]} %{customdata[2]}<br>Chain: %{customdata[1]}<extra></extra>"
+
+
+def residue_keys(nucleotide_info):
+    # Position of each nucleotide by (number, chain, name), the key the
+    # interaction records carry.
+    keys = {}
+    for position, nucleotide in enumerate(nucleotide_info):
+        keys.setdefault((nucleotide['Nucleotide_id'], nucleotide['Chain_id'], nucleotide['Nucleotide']), position)
+    return keys
+
+
+def interaction_positions(interactions, keys):
+    # (first, second) nucleotide positions of the interactions whose ends
+    # are both nucleotides of the layout.
+    first, second = [], []
+    for interaction in interactions or []:
+        nt1, nt2 = interaction['nt1']['auth'], interaction['nt2']['auth']
+        i = keys.get((nt1['number'], nt1['chain'], nt1['name']))
+        j = keys.get((nt2['number'], nt2['chain'], nt2['name']))
+        if i is not None and j is not None and i != j:
+            first.append(i)
+            second.append(j)
+    return np.array(first, dtype=np.int64), np.array(second, dtype=np.int64)
+
+
+def nested_pairs(first, second):
+    # The largest nested subset found greedily from the 5' end: each
+    # nucleotide keeps one partner, and pairs crossing an accepted pair
+    # (pseudoknots) are left out of the layout.
+    i, j = np.minimum(first, second), np.maximum(first, second)
+    order = np.lexsort((-j, i))
+    paired = set()
+    open_pairs = []
+    pairs = []
+    for a, b in zip(i[order].tolist(), j[order].tolist()):
+        if a in paired or b in paired:
+            continue
+        while open_pairs and open_pairs[-1] < a:
+            open_pairs.pop()
+        if open_pairs and b > open_pairs[-1]:
+            continue
+        open_pairs.append(b)
+        paired.update((a, b))
+        pairs.append((a, b))
+    return pairs
+
+
+def _loop_angles(table, count):
+    # The loop walk of ViennaRNA's simple_xy_coordinates, without recursion:
+    # loops only add to disjoint stretches of angles, so they can be handled
+    # in any order.
+    angle = np.zeros(count + 5)
+    pending = [(0, count + 1)]
+    while pending:
+        i, j = pending.pop()
+        vertices = 2
+        remember = []
+        i_old = i - 1
+        j += 1
+        while i != j:
+            partner = table[i]
+            if not partner or i == 0:
+                i += 1
+                vertices += 1
+                continue
+            vertices += 2
+            k, l = i, partner
+            remember.extend((k, l))
+            i = partner + 1
+            start_k, start_l = k, l
+            ladder = 0
+            while True:
+                k += 1
+                l -= 1
+                ladder += 1
+                if table[k] != l or table[k] <= k:
+                    break
+            fill = ladder - 2
+            if ladder >= 2:
+                angle[[start_k + 1 + fill, start_l - 1 - fill, start_k, start_l]] += math.pi / 2
+                if fill >= 1:
+                    angle[start_k + 1:start_k + fill + 1] = math.pi
+                    angle[start_l - fill:start_l] = math.pi
+            if k <= l:
+                pending.append((k, l))
+        polygon = math.pi * (vertices - 2) / vertices
+        remember.append(j)
+        begin = max(i_old, 0)
+        for v in range(0, len(remember), 2):
+            angle[begin:remember[v] + 1] += polygon
+            if v + 1 < len(remember):
+                begin = remember[v + 1]
+    return angle
+
+
+def layout_coordinates(count, pairs, spacing=SPACING):
+    # (count, 2) positions for a strand of count nucleotides with the given
+    # nested pairs (0-based): stems are ladders, loops regular polygons.
+    if count == 0:
+        return np.zeros((0, 2))
+    table = np.zeros(count + 3, dtype=np.int64)
+    for i, j in pairs:
+        table[i + 1], table[j + 1] = j + 1, i + 1
+    angle = _loop_angles(table, count)
+    alpha = np.concatenate([[0.0], np.cumsum(math.pi - angle[2:count + 1])])
+    steps = spacing * np.column_stack([np.cos(alpha[:-1]), np.sin(alpha[:-1])])
+    return np.vstack([np.zeros((1, 2)), np.cumsum(steps, axis=0)])
+
+
+def network_layout(nucleotide_info, interactions):
+    # Nucleotides in file order, chains one after another, folded by their
+    # canonical pairs.
+    keys = residue_keys(nucleotide_info)
+    first, second = interaction_positions((interactions or {}).get('c_base_base'), keys)
+    return layout_coordinates(len(nucleotide_info), nested_pairs(first, second))
+
+
+def segments(coords, first, second):
+    # x and y arrays for line segments, NaN-separated (written as null, a
+    # gap between segments).
+    x = np.full(3 * len(first), np.nan)
+    y = np.full(3 * len(first), np.nan)
+    x[0::3], x[1::3] = coords[first, 0], coords[second, 0]
+    y[0::3], y[1::3] = coords[first, 1], coords[second, 1]
+    return x, y
+
+
+def backbone_positions(nucleotide_info):
+    # Consecutive nucleotides of the same chain.
+    chains = np.array([nucleotide['Chain_id'] for nucleotide in nucleotide_info], dtype=object)
+    first = np.flatnonzero(chains[:-1] == chains[1:]) if len(chains) > 1 else np.zeros(0, dtype=np.int64)
+    return first, first + 1
+
+
+def edge_trace(coords, first, second, name, line):
+    x, y = segments(coords, first, second)
+    return {
+        'connectgaps': False,
+        'hoverinfo': 'none',
+        'line': line,
+        'mode': 'lines',
+        'name': name,
+        'showlegend': False,
+        'x': x,
+        'y': y,
+        'type': 'scattergl',
+    }
+
+
+def node_trace(coords, nucleotide_info):
+    return {
+        'customdata': [[nucleotide['Nucleotide'], nucleotide['Chain_id'], nucleotide['Nucleotide_id']] for nucleotide in nucleotide_info],
+        'hovertemplate': NETWORK_HOVER,
+        'marker': {'color': [nucleotide['Color'] for nucleotide in nucleotide_info], 'line': {'color': 'white', 'width': 0.5}, 'size': 7},
+        'mode': 'markers',
+        'name': 'nucleotides',
+        'x': np.ascontiguousarray(coords[:, 0]),
+        'y': np.ascontiguousarray(coords[:, 1]),
+        'type': 'scattergl',
+    }
+
+
+def network_figure(coords, nucleotide_info, interactions, selected=None):
+    # Backbone, the selected interaction types (all by default) and the
+    # nucleotides on top.
+    keys = residue_keys(nucleotide_info)
+    selected = NETWORK_TYPES if selected is None else [name for name in NETWORK_TYPES if name in selected]
+    data = [edge_trace(coords, *backbone_positions(nucleotide_info), 'backbone', {'color': 'lightgray', 'width': 1})]
+    for name in selected:
+        first, second = interaction_positions((interactions or {}).get(name), keys)
+        if len(first):
+            line = line_style(name) if name in LINE_STYLES else {'color': 'black', 'width': 1}
+            # WebGL lines are drawn solid; the 3D widths are too heavy here.
+            data.append(edge_trace(coords, first, second, name, {'color': line['color'], 'width': min(line['width'], 2)}))
+    data.append(node_trace(coords, nucleotide_info))
+    return {
+        'data': data,
+        'layout': {
+            'autosize': True,
+            'dragmode': 'pan',
+            'height': 610,
+            'hovermode': 'closest',
+            'margin': {'b': 0, 'l': 0, 'r': 0, 't': 0},
+            'paper_bgcolor': '#fafafb',
+            'plot_bgcolor': '#fafafb',
+            'showlegend': False,
+            'template': template(),
+            'xaxis': {'visible': False},
+            'yaxis': {'visible': False, 'scaleanchor': 'x', 'scaleratio': 1},
+        },
+    }
@@ -0,0 +1,344 @@
+import math
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from operator import itemgetter
+
+import numpy
+from rnapolis import annotator
+from rnapolis.annotator import (
+    BASE_ACCEPTORS,
+    BASE_ATOMS,
+    BASE_DONORS,
+    BASE_EDGES,
+    HYDROGEN_BOND_ANGLE_RANGE,
+    HYDROGEN_BOND_MAX_DISTANCE,
+    PHOSPHATE_ACCEPTORS,
+    RIBOSE_ACCEPTORS,
+    STACKING_MAX_ANGLE_BETWEEN_NORMALS,
+    STACKING_MAX_ANGLE_BETWEEN_VECTOR_AND_NORMAL,
+    STACKING_MAX_DISTANCE,
+    BaseInteractions,
+    BasePair,
+    BasePhosphate,
+    BaseRibose,
+    BPh,
+    BR,
+    KDTree,
+    LeontisWesthof,
+    Residue,
+    Stacking,
+    StackingTopology,
+    angle_between_vectors,
+    detect_bph_br_classification,
+    detect_cis_trans,
+    detect_saenger,
+    merge_and_clean_bph_br,
+)
+
+ANNOTATION_WORKERS_ENV = 'RNAGRAPH_ANNOTATION_WORKERS'
+# Below this many residues a process pool costs more than it saves.
+MIN_PARALLEL_RESIDUES = 1000
+# Several chunks per worker, so one dense region does not hold up the pool.
+CHUNKS_PER_WORKER = 4
+
+# rnapolis.annotator.find_pairs resolves competing hydrogen bonds and base
+# edges greedily, in the iteration order of its KD-tree pair set, so the
+# structure cannot be cut into blocks annotated separately without changing
+# the result. Instead the candidate pairs are enumerated once, exactly as
+# rnapolis does. Workers classify chunks of them, which is the geometry and
+# nearly all of the time, and the greedy passes are replayed here in the
+# original order. Stacking has no greedy step. The functions below follow
+# find_pairs and find_stackings of rnapolis step by step, as of the version
+# below; with any other version rnapolis annotates on its own.
+REPLAY_VERSION = '0.4.17'
+
+# Set in each worker by the pool initializer; the parent never writes it, so
+# concurrent annotations do not share it.
+_state = {}
+
+
+def _installed_rnapolis():
+    try:
+        return metadata.version('rnapolis')
+    except metadata.PackageNotFoundError:
+        return None
+
+
+REPLAY_SUPPORTED = _installed_rnapolis() == REPLAY_VERSION
+
+
+def annotation_workers(workers=None):
+    value = workers if workers is not None else os.environ.get(ANNOTATION_WORKERS_ENV) or 1
+    if value == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def hydrogen_bond_candidates(structure):
+    coordinates = []
+    atom_map, type_map, residue_map = {}, {}, {}
+    for residue in structure.residues:
+        acceptors = BASE_ACCEPTORS.get(residue.one_letter_name, []) + RIBOSE_ACCEPTORS + PHOSPHATE_ACCEPTORS
+        donors = BASE_DONORS.get(residue.one_letter_name, [])
+        for atom_name in acceptors + donors:
+            atom = residue.find_atom(atom_name)
+            if atom:
+                xyz = (atom.x, atom.y, atom.z)
+                coordinates.append(xyz)
+                atom_map[xyz] = atom
+                type_map[xyz] = 'acceptor' if atom_name in acceptors else 'donor'
+                residue_map[xyz] = residue
+    return coordinates, atom_map, type_map, residue_map
+
+
+def stacking_candidates(structure):
+    coordinates, residue_map = [], {}
+    for residue in structure.residues:
+        base_atoms = BASE_ATOMS.get(residue.one_letter_name, [])
+        xs, ys, zs = [], [], []
+        for atom_name in base_atoms:
+            atom = residue.find_atom(atom_name)
+            if atom is not None:
+                xs.append(atom.x)
+                ys.append(atom.y)
+                zs.append(atom.z)
+        if len(xs) > 0:
+            geometric_center = (sum(xs) / len(xs), sum(ys) / len(ys), sum(zs) / len(zs))
+            coordinates.append(geometric_center)
+            residue_map[geometric_center] = residue
+    return coordinates, residue_map
+
+
+def candidate_pairs(coordinates, distance):
+    if len(coordinates) < 2:
+        return []
+    # Listing the set keeps its iteration order, the order rnapolis uses.
+    return list(KDTree(coordinates).query_pairs(distance))
+
+
+def chunks(pairs, pieces):
+    # Candidates are listed residue by residue, so grouping pairs by their
+    # first index gives every chunk a compact stretch of residues, whose
+    # base normals its worker then computes once instead of every worker
+    # computing nearly all of them.
+    if not pairs:
+        return []
+    order = numpy.argsort(numpy.array(pairs)[:, 0], kind='stable')
+    return [chunk for chunk in numpy.array_split(order, min(pieces, len(order))) if len(chunk)]
+
+
+def _edge_labels(atom_i, atom_j, residue_i, residue_j):
+    # The base-base branch of find_pairs and the edge matching of the
+    # hydrogen bond it keeps; an empty list when either step rejects it.
+    if residue_i.base_normal_vector is None or residue_j.base_normal_vector is None:
+        return []
+    vector = atom_i.coordinates - atom_j.coordinates
+    angle1 = math.degrees(angle_between_vectors(residue_i.base_normal_vector, vector))
+    angle2 = math.degrees(angle_between_vectors(residue_j.base_normal_vector, vector))
+    low, high = HYDROGEN_BOND_ANGLE_RANGE
+    if not (low < angle1 < high and low < angle2 < high):
+        return []
+
+    edges_i = BASE_EDGES.get(residue_i.one_letter_name, dict()).get(atom_i.name, None)
+    edges_j = BASE_EDGES.get(residue_j.one_letter_name, dict()).get(atom_j.name, None)
+    if edges_i is None or edges_j is None:
+        return []
+    cis_trans = detect_cis_trans(residue_i, residue_j)
+    if cis_trans is None:
+        return []
+    if residue_i < residue_j:
+        return [(False, cis_trans, edge_i, edge_j) for edge_i in edges_i for edge_j in edges_j]
+    return [(True, cis_trans, edge_j, edge_i) for edge_i in edges_i for edge_j in edges_j]
+
+
+def classify_hydrogen_bonds(positions):
+    coordinates, atom_map, type_map, residue_map, pairs = _state['hydrogen_bonds']
+    classified = []
+    for position in positions.tolist():
+        i, j = pairs[position]
+        type_i = type_map[coordinates[i]]
+        type_j = type_map[coordinates[j]]
+        if type_i == type_j:
+            continue
+
+        atom_i = atom_map[coordinates[i]]
+        atom_j = atom_map[coordinates[j]]
+        if atom_i.label is not None and atom_i.label == atom_j.label:
+            continue
+        if atom_i.auth is not None and atom_i.auth == atom_j.auth:
+            continue
+
+        residue_i = residue_map[coordinates[i]]
+        residue_j = residue_map[coordinates[j]]
+        if type_i == 'donor':
+            donor_residue, donor_atom, acceptor_atom = residue_i, atom_i, atom_j
+        else:
+            donor_residue, donor_atom, acceptor_atom = residue_j, atom_j, atom_i
+
+        # Which branch find_pairs takes depends on the atoms already used,
+        # so every branch that could apply is evaluated here.
+        phosphate = atom_i.name in PHOSPHATE_ACCEPTORS or atom_j.name in PHOSPHATE_ACCEPTORS
+        ribose = atom_i.name in RIBOSE_ACCEPTORS or atom_j.name in RIBOSE_ACCEPTORS
+        bph_br = detect_bph_br_classification(donor_residue, donor_atom, acceptor_atom) if phosphate or ribose else None
+        labels = _edge_labels(atom_i, atom_j, residue_i, residue_j)
+        # Pairs that change nothing on any branch are dropped.
+        if bph_br is not None or labels:
+            classified.append((position, phosphate, ribose, bph_br, labels))
+    return classified
+
+
+def classify_stackings(positions):
+    coordinates, residue_map, pairs = _state['stackings']
+    classified = []
+    for position in positions.tolist():
+        i, j = pairs[position]
+        residue_i = residue_map[coordinates[i]]
+        residue_j = residue_map[coordinates[j]]
+
+        normal_i = residue_i.base_normal_vector
+        normal_j = residue_j.base_normal_vector
+        if normal_i is None or normal_j is None:
+            continue
+
+        angle = min([angle_between_vectors(normal_i, normal_j), angle_between_vectors(-normal_i, normal_j)])
+        if math.degrees(angle) > STACKING_MAX_ANGLE_BETWEEN_NORMALS:
+            continue
+
+        vector = numpy.array([coordinates[i][k] - coordinates[j][k] for k in (0, 1, 2)])
+        angle = min(angle_between_vectors(vector, normal_i), angle_between_vectors(vector, normal_j))
+        if math.degrees(angle) > STACKING_MAX_ANGLE_BETWEEN_VECTOR_AND_NORMAL:
+            continue
+
+        same_direction = True if numpy.dot(normal_i, normal_j) > 0.0 else False
+        if residue_i < residue_j:
+            classified.append((position, False, 'upward' if same_direction else 'inward'))
+        else:
+            classified.append((position, True, 'downward' if same_direction else 'outward'))
+    return classified
+
+
+def _order(residue):
+    # Residue3D.__lt__ as a sort key, which sorts much faster than the
+    # comparisons themselves and orders the same way.
+    return (residue.model, residue.chain, residue.number, residue.icode or ' ')
+
+
+def _pair_order(item):
+    return (_order(item[0]), _order(item[1]), *item[2:])
+
+
+def resolve_pairs(candidates, pairs, classified):
+    coordinates, atom_map, type_map, residue_map = candidates
+    used_atoms = set()
+    labels, base_phosphate_pairs, base_ribose_pairs = [], [], []
+    for position, phosphate, ribose, bph_br, pair_labels in classified:
+        i, j = pairs[position]
+        atom_i, atom_j = atom_map[coordinates[i]], atom_map[coordinates[j]]
+        residue_i, residue_j = residue_map[coordinates[i]], residue_map[coordinates[j]]
+        if type_map[coordinates[i]] == 'donor':
+            donor_residue, acceptor_residue = residue_i, residue_j
+        else:
+            donor_residue, acceptor_residue = residue_j, residue_i
+
+        for applies, found in [(phosphate, base_phosphate_pairs), (ribose, base_ribose_pairs)]:
+            if applies and atom_i not in used_atoms and atom_j not in used_atoms:
+                if bph_br is not None:
+                    used_atoms.add(atom_i)
+                    used_atoms.add(atom_j)
+                    found.append((donor_residue, acceptor_residue, bph_br))
+                break
+        else:
+            for swapped, cis_trans, edge_a, edge_b in pair_labels:
+                first, second = (residue_j, residue_i) if swapped else (residue_i, residue_j)
+                labels.append((first, second, cis_trans, edge_a, edge_b))
+
+    base_base_pairs = []
+    occupied = set()
+    for interaction, hydrogen_bond_count in Counter(labels).most_common():
+        if hydrogen_bond_count < 2:
+            continue
+        residue_i, residue_j, cis_trans, edge_i, edge_j = interaction
+        if (residue_i, edge_i) in occupied or (residue_j, edge_j) in occupied:
+            continue
+        occupied.add((residue_i, edge_i))
+        occupied.add((residue_j, edge_j))
+        base_base_pairs.append((residue_i, residue_j, LeontisWesthof[f"{cis_trans}{edge_i}{edge_j}"]))
+
+    base_pairs = [
+        BasePair(Residue(residue_i.label, residue_i.auth), Residue(residue_j.label, residue_j.auth), lw, detect_saenger(residue_i, residue_j, lw))
+        for residue_i, residue_j, lw in sorted(base_base_pairs, key=_pair_order)
+    ]
+    base_phosphates = [
+        BasePhosphate(Residue(residue_i.label, residue_i.auth), Residue(residue_j.label, residue_j.auth), BPh[f"_{bph}"])
+        for (residue_i, residue_j), bphs in merge_and_clean_bph_br(sorted(base_phosphate_pairs, key=_pair_order)).items()
+        for bph in bphs
+    ]
+    base_riboses = [
+        BaseRibose(Residue(residue_i.label, residue_i.auth), Residue(residue_j.label, residue_j.auth), BR[f"_{br}"])
+        for (residue_i, residue_j), brs in merge_and_clean_bph_br(sorted(base_ribose_pairs, key=_pair_order)).items()
+        for br in brs
+    ]
+    return base_pairs, base_phosphates, base_riboses
+
+
+def resolve_stackings(candidates, pairs, classified):
+    coordinates, residue_map = candidates
+    found = []
+    for position, swapped, topology in classified:
+        i, j = pairs[position]
+        residue_i, residue_j = residue_map[coordinates[i]], residue_map[coordinates[j]]
+        found.append((residue_j, residue_i, topology) if swapped else (residue_i, residue_j, topology))
+    return [
+        Stacking(Residue(residue_i.label, residue_i.auth), Residue(residue_j.label, residue_j.auth), StackingTopology[topology])
+        for residue_i, residue_j, topology in sorted(found, key=_pair_order)
+    ]
+
+
+def _init_worker(state):
+    _state.update(state)
+
+
+def _fork_context():
+    # The candidates reach the workers through the pool initializer, which
+    # only fork passes on without pickling the rnapolis residues.
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def extract_base_interactions(structure, workers=None, min_residues=MIN_PARALLEL_RESIDUES):
+    # Drop-in replacement for rnapolis.annotator.extract_base_interactions
+    # that classifies candidate pairs of large structures in a process pool.
+    # Forking a process with other threads running (the web server) can
+    # deadlock on locks they hold, so the pool is only used by
+    # single-threaded callers: the batch command, scripts and benchmarks.
+    workers = annotation_workers(workers)
+    context = _fork_context()
+    if workers < 2 or len(structure.residues) < min_residues or context is None:
+        return annotator.extract_base_interactions(structure)
+    if not REPLAY_SUPPORTED or threading.active_count() > 1:
+        return annotator.extract_base_interactions(structure)
+
+    bond_candidates = hydrogen_bond_candidates(structure)
+    bond_pairs = candidate_pairs(bond_candidates[0], HYDROGEN_BOND_MAX_DISTANCE)
+    stack_candidates = stacking_candidates(structure)
+    stack_pairs = candidate_pairs(stack_candidates[0], STACKING_MAX_DISTANCE)
+
+    state = {
+        'hydrogen_bonds': (*bond_candidates, bond_pairs),
+        'stackings': (*stack_candidates, stack_pairs),
+    }
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(state,)) as pool:
+        bond_results = pool.map(classify_hydrogen_bonds, chunks(bond_pairs, workers * CHUNKS_PER_WORKER))
+        stack_results = pool.map(classify_stackings, chunks(stack_pairs, workers * CHUNKS_PER_WORKER))
+        # Back into KD-tree set order for the greedy replay.
+        bond_classified = sorted((item for result in bond_results for item in result), key=itemgetter(0))
+        stack_classified = sorted((item for result in stack_results for item in result), key=itemgetter(0))
+
+    base_pairs, base_phosphates, base_riboses = resolve_pairs(bond_candidates, bond_pairs, bond_classified)
+    stackings = resolve_stackings(stack_candidates, stack_pairs, stack_classified)
+    return BaseInteractions(base_pairs, stackings, base_riboses, base_phosphates, [])
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+
+from rnagraph.structure_io import decode_structure, iter_gunzip, structure_format
+
+MIRROR_ENV = 'RNAGRAPH_PDB_MIRROR'
+INDEX_ENV = 'RNAGRAPH_PDB_MIRROR_INDEX'
+INDEX_NAME = 'rnagraph-index.json'
+MIRROR_PREFIX = 'mirror:'
+READ_SIZE = 256 * 1024
+
+# Matches wwPDB mirror names (1abc.cif.gz, pdb1abc.ent.gz, pdb_00001abc.cif)
+# as well as plain downloads (1ABC.pdb).
+_ENTRY_FILE = re.compile(r'^(?:pdb_0000|pdb)?([0-9][a-z0-9]{3})\.(cif|bcif|pdb|ent)(\.gz)?$', re.IGNORECASE)
+_PDB_ID = re.compile(r'^(?:pdb_0000)?([0-9][a-z0-9]{3})$', re.IGNORECASE)
+# Preferred file for an entry when the mirror holds several formats.
+FORMAT_PREFERENCE = ['cif', 'bcif', 'pdb']
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def mirror_dir():
+    return os.environ.get(MIRROR_ENV) or None
+
+
+def index_path(directory=None):
+    directory = directory or mirror_dir()
+    return os.environ.get(INDEX_ENV) or os.path.join(directory, INDEX_NAME)
+
+
+def normalize_id(pdb_id):
+    match = _PDB_ID.match((pdb_id or '').strip())
+    return match.group(1).lower() if match else None
+
+
+def build_index(directory, path=None):
+    entries = {}
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            match = _ENTRY_FILE.match(name)
+            if not match:
+                continue
+            pdb_id = match.group(1).lower()
+            ext = structure_format(name)[0]
+            relative = os.path.relpath(os.path.join(root, name), directory)
+            current = entries.get(pdb_id)
+            if current is None or FORMAT_PREFERENCE.index(ext) < FORMAT_PREFERENCE.index(structure_format(current)[0]):
+                entries[pdb_id] = relative
+
+    path = path or index_path(directory)
+    temp_path = f"{path}.part"
+    with open(temp_path, 'w') as f:
+        json.dump({'root': os.path.abspath(directory), 'entries': entries}, f, separators=(',', ':'), sort_keys=True)
+    os.replace(temp_path, path)
+    return entries
+
+
+def load_index(path=None):
+    path = path or index_path()
+    mtime = os.path.getmtime(path)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path) as f:
+            index = json.load(f)
+        _cache[path] = (mtime, index)
+        return index
+
+
+def lookup(pdb_id):
+    pdb_id = normalize_id(pdb_id)
+    if pdb_id is None or mirror_dir() is None:
+        return None
+    try:
+        index = load_index()
+    except FileNotFoundError:
+        return None
+    relative = index['entries'].get(pdb_id)
+    if relative is None:
+        return None
+    return os.path.join(mirror_dir() or index['root'], relative)
+
+
+def load_entry(pdb_id):
+    # Returns (decoded bytes, ext, filename) for an entry of the mirror, in
+    # the same form decode_upload gives for an uploaded file.
+    path = lookup(pdb_id)
+    if path is None:
+        raise KeyError(pdb_id)
+    filename = os.path.basename(path)
+    ext, compression = structure_format(filename)
+    with open(path, 'rb') as f:
+        if compression == 'gz':
+            data = b''.join(iter_gunzip(iter(lambda: f.read(READ_SIZE), b'')))
+        else:
+            data = f.read()
+    decoded, ext = decode_structure(data, ext)
+    return decoded, ext, filename
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Build the index of a local PDB mirror.')
+    arg_parser.add_argument('directory', nargs='?', default=mirror_dir(), help=f"mirror directory (default: ${MIRROR_ENV})")
+    arg_parser.add_argument('--index', help=f"index file (default: <directory>/{INDEX_NAME})")
+    args = arg_parser.parse_args(argv)
+    if not args.directory:
+        arg_parser.error(f"no mirror directory given and {MIRROR_ENV} is not set")
+
+    entries = build_index(args.directory, args.index)
+    print(f"Indexed {len(entries)} entries in {args.index or index_path(args.directory)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
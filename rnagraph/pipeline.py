@@ -0,0 +1,512 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from io import StringIO
+
+import numpy as np
+from Bio.PDB import MMCIFParser, PDBParser
+from Bio.PDB.Structure import Structure
+from plotly.io.json import to_json_plotly
+from rnapolis import parser
+
+from rnagraph.annotation_archive import (
+    load_heteroatom_classes, load_interactions, load_residues, save_heteroatom_classes, save_interactions, save_residues,
+)
+from rnagraph.backbone import BACKBONE_LAYER, backbone_traces
+from rnagraph.contact_map import TILE_SIZE, contact_map_figure, distance_tile, overlay_trace, snap_range, visible_range
+from rnagraph.contacts import CONTACT_LAYER, ligand_contacts
+from rnagraph.ensemble import Ensemble
+from rnagraph.figures import base_figure, contact_traces, customdata, dna_nucleotides, field, interaction_traces, rna_nucleotides
+from rnagraph.graph import InteractionGraph
+from rnagraph.heteroatoms import HETEROATOM_CLASSES, classify_heteroatoms, heteroatom_class_trace
+from rnagraph.interaction_diff import interaction_diff
+from rnagraph.json_engine import jsonable
+from rnagraph.network import network_figure, network_layout
+from rnagraph.parallel_annotation import extract_base_interactions
+from rnagraph.spatial import structure_index
+from rnagraph.structure_io import decode_file
+from rnagraph.structure_store import content_hash, structure_bytes
+
+logger = logging.getLogger(__name__)
+
+# The structure pipeline behind both pages, as plain functions over bytes,
+# parsed structures and dicts: parse -> classify residues -> centroids ->
+# annotate -> layers -> figure dict. Nothing here needs a running Dash app.
+
+color_map = {
+    'A': 'rgb(225, 246, 0)',
+    'C': 'rgb(35, 120, 65)',
+    'G': 'rgb(228, 34, 23)',
+    'U': 'rgb(65, 105, 225)',
+    'I': 'rgb(127, 127, 127)',
+    'DA': 'rgb(225, 246, 0)',
+    'DC': 'rgb(35, 120, 65)',
+    'DG': 'rgb(228, 34, 23)',
+    'DU': 'rgb(65, 105, 225)',
+    'DI': 'rgb(127, 127, 127)',
+    'DT': 'rgb(128, 0, 128)'
+}
+DEFAULT_COLOR = 'rgb(16, 16, 16)'
+
+
+def check_nucleotide_type_and_completeness(decoded_data, ext):
+    content = decoded_data.decode('utf-8')
+    nucleotides_found = False
+    is_complete = True
+    issues = ""
+
+    if ext == 'pdb':
+        coordinates_present = False
+
+        for line in content.splitlines():
+            if line.startswith('ATOM') or line.startswith('HETATM'):
+                if line.startswith('ATOM'):
+                    residue_name = line[17:20].strip()
+
+                    if residue_name in rna_nucleotides + dna_nucleotides:
+                        nucleotides_found = True
+
+                try:
+                    x = float(line[30:38].strip())
+                    y = float(line[38:46].strip())
+                    z = float(line[46:54].strip())
+                    coordinates_present = True
+                except ValueError:
+                    coordinates_present = False
+        if not coordinates_present:
+            issues = "*Missing atomic coordinates."
+            return "Other", is_complete, issues
+
+    elif ext == 'cif':
+        coordinates_present = False
+
+        for line in content.splitlines():
+            if line.startswith('_atom_site'):
+                continue
+            elif line.startswith('_'):
+                continue
+            elif line.startswith('ATOM'):
+                parts = line.split()
+                if len(parts) > 6:
+                    if parts[5] in rna_nucleotides + dna_nucleotides:
+                        nucleotides_found = True
+
+                    try:
+                        x = float(parts[10])
+                        y = float(parts[11])
+                        z = float(parts[12])
+                        coordinates_present = True
+                    except (IndexError, ValueError):
+                        coordinates_present = False
+        if not nucleotides_found:
+            issues = "*File does not contain any RNA or DNA structure."
+            return "Other", is_complete, issues
+
+        if not coordinates_present:
+            issues = "*Missing atomic coordinates."
+            return "Other", is_complete, issues
+
+
+    return "RNA", is_complete, issues
+
+
+def extract_structure_name(decoded_data, ext):
+    content = decoded_data.decode('utf-8')
+    pdb_id = "Unknown PDB ID"
+
+    if ext == 'pdb':
+        for line in content.splitlines():
+            if line.startswith("HEADER"):
+                pdb_id = line[62:66].strip()
+                break
+
+    elif ext == 'cif':
+        for line in content.splitlines():
+            if line.startswith("_entry.id"):
+                parts = line.split(maxsplit=1)
+                if len(parts) > 1:
+                    pdb_id = parts[1].strip().strip('"')
+                break
+
+    return pdb_id
+
+
+def select_model(structure, model):
+    # A structure holding only the model numbered model in the file.
+    chosen = next((candidate for candidate in structure if candidate.serial_num == model), None)
+    if chosen is None:
+        raise ValueError(f"Model {model} not found in {structure.id}")
+    single = Structure(structure.id)
+    single.add(chosen)
+    return single
+
+
+def read_structure(decoded, ext, structure_id='structure', model=None):
+    # Biopython structure, for residues, centroids and contacts.
+    if ext == 'pdb':
+        structure = PDBParser(QUIET=True).get_structure(structure_id, StringIO(decoded.decode('utf-8')))
+    else:
+        structure = MMCIFParser(QUIET=True).get_structure(structure_id, StringIO(decoded.decode('utf-8')))
+    return structure if model is None else select_model(structure, model)
+
+
+MODEL_COLUMN = '_atom_site.pdbx_PDB_model_num'
+CIF_TOKEN = re.compile(r"""'[^']*'(?=\s|$)|"[^"]*"(?=\s|$)|\S+""")
+
+
+def pdb_model_lines(lines, model=None):
+    # Coordinate records of one model (the first by default) and every
+    # other record, without MODEL/ENDMDL.
+    kept, current = [], None
+    for line in lines:
+        if line.startswith('MODEL'):
+            current = int(line[10:14])
+            model = current if model is None else model
+        elif line.startswith('ENDMDL'):
+            current = None
+        elif current is None or current == model:
+            kept.append(line)
+    return kept
+
+
+def cif_model_lines(lines, model=None):
+    # The same for the _atom_site loop of an mmCIF file.
+    kept, columns = [], []
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('_atom_site.'):
+            columns.append(stripped.split()[0])
+        elif stripped.startswith(('_', '#', 'loop_', 'data_')):
+            columns = []
+        elif stripped and MODEL_COLUMN in columns:
+            number = int(CIF_TOKEN.findall(stripped)[columns.index(MODEL_COLUMN)])
+            model = number if model is None else model
+            if number != model:
+                continue
+        kept.append(line)
+    return kept
+
+
+def single_model(decoded, ext, model=None):
+    # rnapolis removes duplicate atoms across models before it picks one,
+    # so every model but the first loses its copies: it is given the chosen
+    # model (or the first) alone.
+    if (b'MODEL' if ext == 'pdb' else MODEL_COLUMN.encode()) not in decoded:
+        return decoded
+    lines = decoded.decode('utf-8').splitlines(keepends=True)
+    lines = pdb_model_lines(lines, model) if ext == 'pdb' else cif_model_lines(lines, model)
+    return ''.join(lines).encode('utf-8')
+
+
+def read_rnapolis(decoded, ext, model=None):
+    # rnapolis structure, for base interaction annotation.
+    decoded = single_model(decoded, ext, model)
+    if ext == 'pdb':
+        return parser.read_3d_structure(StringIO(decoded.decode('utf-8')))
+
+    # rnapolis reads mmCIF through a file name.
+    with tempfile.NamedTemporaryFile(suffix='.cif') as temp_file:
+        temp_file.write(decoded)
+        temp_file.flush()
+        with open(temp_file.name, 'r') as read_file:
+            return parser.read_3d_structure(read_file)
+
+
+def annotate(structure, workers=None):
+    base_interactions = extract_base_interactions(structure, workers=workers)
+    return {
+        'phosphodiester': base_interactions.basePhosphateInteractions,
+        'c_base_base': [pair for pair in base_interactions.basePairs if pair.lw.name == 'cWW'],
+        'nc_base_base': [pair for pair in base_interactions.basePairs if pair.lw.name != 'cWW'],
+        'stacking': base_interactions.stackings
+    }
+
+
+def calculate_interactions(decoded_data, ext):
+    try:
+        return annotate(read_rnapolis(decoded_data, ext))
+    except Exception:
+        logger.exception('Error in calculate_interactions')
+        return None
+
+
+def classify_residues(structure):
+    # (chain id, residue) pairs of the first model: nucleotides and
+    # heteroatom residues (ligands, ions, waters).
+    nucleotides, heteroatoms = [], []
+    for model in structure:
+        for chain in model:
+            for residue in chain:
+                if residue.resname in rna_nucleotides or residue.resname in dna_nucleotides:
+                    nucleotides.append((chain.id, residue))
+                if 'H_' in residue.id[0]:
+                    heteroatoms.append((chain.id, residue))
+        break
+    return nucleotides, heteroatoms
+
+
+def _residue_info(chain_id, residue, center, color):
+    return {
+        "Nucleotide" : residue.resname,
+        "Chain_id" : chain_id,
+        "Coordinate" : center,
+        "Color" : color,
+        "Nucleotide_id" : residue.id[1]
+    }
+
+
+def centroids(nucleotides, heteroatoms):
+    points = []
+    heteroatom_points = []
+    nucleotide_info = []
+    heteroatom_info = []
+
+    for chain_id, residue in nucleotides:
+        center = np.mean(np.array([atom.get_coord() for atom in residue]), axis=0)
+        points.append(center)
+        nucleotide_info.append(_residue_info(chain_id, residue, center, color_map.get(residue.resname, DEFAULT_COLOR)))
+    for chain_id, residue in heteroatoms:
+        center = np.mean(np.array([atom.get_coord() for atom in residue]), axis=0)
+        heteroatom_points.append(center)
+        heteroatom_info.append(_residue_info(chain_id, residue, center, 'black'))
+    return points, nucleotide_info, heteroatom_points, heteroatom_info
+
+
+def collect_centroids(structure):
+    return centroids(*classify_residues(structure))
+
+
+def interaction_layer(interaction_type, interactions, nucleotide_info, heteroatom_info=None):
+    # Line traces for one interaction type. Residue info is given as figure
+    # customdata rows (rnagraph.figures.customdata), as the browser sends it.
+    return interaction_traces(interactions, nucleotide_info, heteroatom_info, interaction_type) or []
+
+
+def contact_layer(structure, nucleotide_info, heteroatom_info):
+    return contact_traces(ligand_contacts(structure_index(structure)), nucleotide_info, heteroatom_info, CONTACT_LAYER) or []
+
+
+def backbone_layer(structure, nucleotide_info, heteroatom_info):
+    return backbone_traces(structure_index(structure), nucleotide_info, heteroatom_info)
+
+
+def build_figure(residues):
+    # Figure dict for the collect_centroids() tuple, None without nucleotides.
+    points, nucleotide_info, heteroatoms, heteroatom_info = residues
+    if not len(points):
+        return None
+    heteroatoms_array = np.array(heteroatoms) if len(heteroatoms) > 0 else None
+    colors = field(nucleotide_info, 'Color')
+    return base_figure(np.array(points), nucleotide_info, heteroatoms_array, heteroatom_info, colors)
+
+
+class Pipeline:
+    # One structure through the stages above. Each stage runs at most once
+    # and its time is kept in timings. With a digest, interactions and
+    # residues go through the annotation archive, and the figure and its
+    # layers through cache (a FigureCache) when one is given. With a model
+    # number, every stage works on that model alone instead of the first.
+
+    def __init__(self, decoded, ext, digest=None, structure_id='structure', cache=None, workers=None, interactions=None, tile_cache=None, model=None):
+        # decoded may also be a function returning the bytes, so a store
+        # entry is only read from disk when a stage needs it. interactions
+        # already at hand (the processed-data store) skip annotation.
+        # Distance map tiles go to tile_cache.
+        self.source = decoded
+        self.ext = ext
+        self.digest = digest
+        self.structure_id = structure_id
+        self.cache = cache
+        self.tile_cache = tile_cache
+        self.workers = workers
+        self.model = model
+        self.results = {} if interactions is None else {'annotate': interactions}
+        self.timings = {}
+        # Why annotation failed, when interactions() returned None.
+        self.annotation_error = None
+
+    @classmethod
+    def from_file(cls, path, cache=None, workers=None):
+        filename = os.path.basename(path)
+        with open(path, 'rb') as f:
+            decoded, ext = decode_file(f.read(), filename)
+        return cls(decoded, ext, content_hash(decoded), filename.split('.')[0], cache, workers)
+
+    @classmethod
+    def from_store(cls, data, filename=None, cache=None, workers=None, interactions=None, tile_cache=None, model=None):
+        filename = filename or data.get('hash') or 'structure'
+        ext = data.get('ext', 'pdb' if 'pdb' in filename else 'cif')
+        return cls(lambda: structure_bytes(data), ext, data.get('hash'), filename.split('.')[0], cache, workers, interactions, tile_cache, model)
+
+    def key(self):
+        # Archive and cache key: the content hash, and the model when one
+        # was picked.
+        if not self.digest or self.model is None:
+            return self.digest
+        return f"{self.digest}.model{self.model}"
+
+    def _stage(self, name, func):
+        if name not in self.results:
+            start = time.perf_counter()
+            self.results[name] = func()
+            self.timings[name] = time.perf_counter() - start
+        return self.results[name]
+
+    def _cached(self, key, func, cache=None):
+        cache = cache or self.cache
+        if cache is None or not self.digest:
+            return func()
+        value = cache.get((self.key(), *key))
+        if value is None:
+            value = func()
+            if value is not None and len(value):
+                cache.put((self.key(), *key), value)
+        return value
+
+    def decoded(self):
+        return self._stage('read', lambda: self.source() if callable(self.source) else self.source)
+
+    def validation(self):
+        return self._stage('validation', lambda: check_nucleotide_type_and_completeness(self.decoded(), self.ext))
+
+    def is_valid(self):
+        structure_type, is_complete, _ = self.validation()
+        return structure_type != 'Other' and is_complete
+
+    def name(self):
+        return self._stage('name', lambda: extract_structure_name(self.decoded(), self.ext))
+
+    def structure(self):
+        return self._stage('parse', lambda: read_structure(self.decoded(), self.ext, self.structure_id, self.model))
+
+    def rnapolis_structure(self):
+        return self._stage('rnapolis_parse', lambda: read_rnapolis(self.decoded(), self.ext, self.model))
+
+    def _interactions(self):
+        interactions = load_interactions(self.key())
+        if interactions is None:
+            try:
+                interactions = jsonable(annotate(self.rnapolis_structure(), self.workers))
+            except Exception as e:
+                logger.exception('Annotation of %s failed', self.structure_id)
+                self.annotation_error = e
+                return None
+            save_interactions(self.key(), interactions)
+        return interactions
+
+    def interactions(self):
+        # Interactions ready for the processed-data store, None when annotation
+        # fails.
+        return self._stage('annotate', self._interactions)
+
+    def plain_interactions(self):
+        # The interactions as the browser sends them back, plain dicts.
+        return self._stage('plain_interactions', lambda: json.loads(to_json_plotly(self.interactions() or {})))
+
+    def _residues(self):
+        residues = load_residues(self.key())
+        if residues is None:
+            nucleotides, heteroatoms = self._stage('classify', lambda: classify_residues(self.structure()))
+            residues = centroids(nucleotides, heteroatoms)
+            save_residues(self.key(), residues[1], residues[3])
+        return residues
+
+    def residues(self):
+        return self._stage('centroids', self._residues)
+
+    def contacts(self):
+        # Heteroatom residue / nucleotide contact records.
+        return self._stage('contacts', lambda: ligand_contacts(structure_index(self.structure())))
+
+    def heteroatom_classes(self):
+        # Class of each residue of the structure index (see heteroatoms).
+        return self._stage('heteroatom_classes', lambda: classify_heteroatoms(structure_index(self.structure())))
+
+    def _heteroatom_presence(self):
+        names = load_heteroatom_classes(self.key())
+        if names is None:
+            classes = self.heteroatom_classes()
+            names = [name for name in HETEROATOM_CLASSES if (classes == name).any()]
+            save_heteroatom_classes(self.key(), names)
+        return {name: name in names for name in HETEROATOM_CLASSES}
+
+    def heteroatom_presence(self):
+        # {class: whether the structure has any}, archived like the residue
+        # table so a figure from the archive needs no parse for its toggles.
+        return self._stage('heteroatom_presence', lambda: self._cached(('heteroatom_presence',), self._heteroatom_presence))
+
+    def heteroatom_trace(self, name):
+        # Markers for one heteroatom class, None when the structure has none.
+        def build():
+            return heteroatom_class_trace(structure_index(self.structure()), self.heteroatom_classes(), name)
+
+        return self._stage(f"heteroatoms:{name}", lambda: self._cached(('heteroatoms', name), build))
+
+    def interaction_diff(self, other):
+        # Interactions and contacts gained and lost going from this structure
+        # to other (another Pipeline), with the index built over both.
+        def build():
+            return interaction_diff({**self.plain_interactions(), CONTACT_LAYER: self.contacts()}, {**other.plain_interactions(), CONTACT_LAYER: other.contacts()})
+
+        if not other.key():
+            return build()
+        return self._cached(('interaction_diff', other.key()), build)
+
+    def figure(self):
+        return self._stage('figure', lambda: self._cached(('figure',), lambda: build_figure(self.residues())))
+
+    def layer(self, interaction_type):
+        def build():
+            _, nucleotide_info, _, heteroatom_info = self.residues()
+            nucleotide_rows = customdata(nucleotide_info)
+            heteroatom_rows = customdata(heteroatom_info) if heteroatom_info else None
+            if interaction_type == CONTACT_LAYER:
+                return contact_layer(self.structure(), nucleotide_rows, heteroatom_rows)
+            if interaction_type == BACKBONE_LAYER:
+                return backbone_layer(self.structure(), nucleotide_rows, heteroatom_rows)
+            return interaction_layer(interaction_type, self.plain_interactions().get(interaction_type), nucleotide_rows, heteroatom_rows)
+
+        # Keyed like the page 2 layers, which know the figure but not the
+        # residue table.
+        figure = self.figure()
+        has_heteroatoms = figure is not None and len(figure['data']) > 1
+        return self._stage(f"layer:{interaction_type}", lambda: self._cached(('layer', interaction_type, has_heteroatoms), build))
+
+    def network_layout(self):
+        # 2D positions of the nucleotides, computed once per structure.
+        return self._stage('network_layout', lambda: self._cached(('network_layout',), lambda: network_layout(self.residues()[1], self.plain_interactions())))
+
+    def network(self, selected=None):
+        return network_figure(self.network_layout(), self.residues()[1], self.plain_interactions(), selected)
+
+    def graph(self):
+        # Sparse interaction graph over the nucleotides, in figure order.
+        return self._stage('graph', lambda: self._cached(('graph',), lambda: InteractionGraph(customdata(self.residues()[1]), self.plain_interactions())))
+
+    def ensemble(self):
+        # All models superposed, with per-nucleotide RMSF in figure order.
+        return self._stage('ensemble', lambda: self._cached(('ensemble',), lambda: Ensemble(list(self.structure()))))
+
+    def centroid_array(self):
+        return self._stage('centroid_array', lambda: np.asarray(self.residues()[0], dtype=np.float32).reshape(-1, 3))
+
+    def contact_tile(self, row_range, col_range, size=TILE_SIZE):
+        return self._cached(('distance_tile', *row_range, *col_range, size), lambda: distance_tile(self.centroid_array(), row_range, col_range, size), self.tile_cache)
+
+    def contact_map(self, relayoutData=None, selected=(), size=TILE_SIZE):
+        # Distance map of the range visible after relayoutData, with markers
+        # for the selected interaction types.
+        count = len(self.centroid_array())
+        if count == 0:
+            return None
+        row_range = snap_range(*visible_range(relayoutData, 'yaxis', count), count, size)
+        col_range = snap_range(*visible_range(relayoutData, 'xaxis', count), count, size)
+        graph = self.graph()
+        overlays = [
+            overlay_trace(graph.first[graph.kinds == kind], graph.second[graph.kinds == kind], row_range, col_range, name)
+            for kind, name in enumerate(graph.types) if name in selected
+        ]
+        return contact_map_figure(self.contact_tile(row_range, col_range, size), overlays)
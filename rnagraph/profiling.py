@@ -0,0 +1,195 @@
+import cProfile
+import functools
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qs, urlparse
+
+import flask
+
+PROFILE_ENV = 'RNAGRAPH_PROFILE'
+PROFILE_DIR_ENV = 'RNAGRAPH_PROFILE_DIR'
+PROFILE_CALLBACKS_ENV = 'RNAGRAPH_PROFILE_CALLBACKS'
+PROFILE_INTERVAL_ENV = 'RNAGRAPH_PROFILE_INTERVAL'
+PROFILE_HEADER = 'X-RNAgraph-Profile'
+PROFILE_QUERY = 'profile'
+PROFILE_MODES = ['cprofile', 'sample']
+
+
+def profiling_enabled():
+    return os.environ.get(PROFILE_ENV, '').lower() in ['1', 'true', 'yes', 'on']
+
+
+def profile_dir():
+    return os.environ.get(PROFILE_DIR_ENV) or os.path.join(tempfile.gettempdir(), 'rnagraph-profiles')
+
+
+def requested_mode(request):
+    value = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY)
+
+    # The renderer posts callbacks without the page query string, but the
+    # browser still sends the page URL as the referrer.
+    if not value and request.referrer:
+        value = parse_qs(urlparse(request.referrer).query).get(PROFILE_QUERY, [None])[0]
+
+    if not value or value.lower() in ['0', 'false', 'no', 'off']:
+        return None
+    value = value.lower()
+    return value if value in PROFILE_MODES else 'cprofile'
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _pstats_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return [f"{stack} {count}" for stack, count in self.samples.most_common()]
+
+    def summary(self, limit=40):
+        own = Counter()
+        for stack, count in self.samples.items():
+            own[stack.rsplit(';', 1)[-1]] += count
+        total = sum(own.values()) or 1
+        lines = [f"{total} samples, {self.interval * 1000:.1f} ms interval", '']
+        for name, count in own.most_common(limit):
+            lines.append(f"{count:8d} {100 * count / total:6.1f}%  {name}")
+        return lines
+
+
+def collapse_pstats(stats, max_depth=64):
+    # cProfile only records caller/callee edges, so the stacks are
+    # reconstructed by splitting each function's time across its callees.
+    callees = {}
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, entry in stats.stats.items() if not entry[4]]
+    samples = Counter()
+
+    def walk(func, stack, weight):
+        cc, nc, tt, ct, callers = stats.stats[func]
+        stack = stack + [_pstats_name(func)]
+        if ct <= 0 or weight <= 0:
+            return
+        scale = weight / ct
+        samples[';'.join(stack)] += tt * scale
+        if len(stack) >= max_depth:
+            return
+        for callee, edge_ct in callees.get(func, []):
+            if _pstats_name(callee) in stack:
+                continue
+            walk(callee, stack, edge_ct * scale)
+
+    for root in roots:
+        walk(root, [], stats.stats[root][3])
+
+    # Weights are written in microseconds so flamegraph tools get integers.
+    return [f"{stack} {int(round(value * 1e6))}" for stack, value in samples.most_common() if value * 1e6 >= 1]
+
+
+def _callback_name(app, body):
+    try:
+        callback = app.callback_map[body['output']]['callback']
+        return getattr(callback, '__name__', 'callback')
+    except (KeyError, TypeError):
+        return 'callback'
+
+
+def _write_lines(path, lines):
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines))
+        f.write('\n')
+
+
+def _run_profiled(view, mode, name):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{time.time_ns() % 1000000:06d}-{name}")
+
+    if mode == 'sample':
+        profiler = SamplingProfiler(float(os.environ.get(PROFILE_INTERVAL_ENV, '0.001')))
+        profiler.start()
+        try:
+            response = view()
+        finally:
+            profiler.stop()
+            _write_lines(base + '.txt', profiler.summary())
+            _write_lines(base + '.collapsed', profiler.collapsed())
+        profile_path = base + '.txt'
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = view()
+        finally:
+            profiler.disable()
+            profiler.dump_stats(base + '.prof')
+            _write_lines(base + '.collapsed', collapse_pstats(pstats.Stats(profiler)))
+        profile_path = base + '.prof'
+
+    response = flask.make_response(response)
+    response.headers['X-RNAgraph-Profile-Path'] = profile_path
+    return response
+
+
+def install_profiler(app):
+    if not profiling_enabled():
+        return False
+
+    endpoint = app.config.routes_pathname_prefix + '_dash-update-component'
+    dispatch = app.server.view_functions[endpoint]
+    selected = [name.strip() for name in os.environ.get(PROFILE_CALLBACKS_ENV, '').split(',') if name.strip()]
+
+    @functools.wraps(dispatch)
+    def profiled_dispatch(*args, **kwargs):
+        mode = requested_mode(flask.request)
+        if mode is None:
+            return dispatch(*args, **kwargs)
+
+        name = _callback_name(app, flask.request.get_json(silent=True) or {})
+        if selected and name not in selected:
+            return dispatch(*args, **kwargs)
+
+        return _run_profiled(functools.partial(dispatch, *args, **kwargs), mode, name)
+
+    app.server.view_functions[endpoint] = profiled_dispatch
+    return True
@@ -0,0 +1,90 @@
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+import flask
+from dash.exceptions import PreventUpdate
+
+RECORD_DIR_ENV = 'RNAGRAPH_RECORD_DIR'
+SESSION_COOKIE = 'rnagraph_recording'
+SESSION_HEADER = 'X-RNAgraph-Session'
+
+_lock = threading.Lock()
+
+
+def valid_session(session):
+    # Session ids name the recording files, so only ids this module hands
+    # out (uuid4 hex) are accepted.
+    return bool(session) and re.fullmatch('[0-9a-f]{32}', session) is not None
+
+
+def recording_dir():
+    return os.environ.get(RECORD_DIR_ENV)
+
+
+def _callback_name(app, body):
+    try:
+        return app.callback_map[body['output']]['callback'].__name__
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+def _append(path, entry):
+    line = json.dumps(entry, separators=(',', ':'))
+    with _lock:
+        with open(path, 'a') as f:
+            f.write(line)
+            f.write('\n')
+
+
+def install_recorder(app):
+    directory = recording_dir()
+    if not directory:
+        return False
+    os.makedirs(directory, exist_ok=True)
+
+    endpoint = app.config.routes_pathname_prefix + '_dash-update-component'
+    dispatch = app.server.view_functions[endpoint]
+
+    @functools.wraps(dispatch)
+    def recorded_dispatch(*args, **kwargs):
+        request = flask.request
+        session = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+        new_session = not valid_session(session)
+        if new_session:
+            session = uuid.uuid4().hex
+
+        body = request.get_json(silent=True)
+        entry = {
+            'session': session,
+            'time': time.time(),
+            'callback': _callback_name(app, body or {}),
+            'body': body,
+        }
+
+        start = time.perf_counter()
+        try:
+            response = flask.make_response(dispatch(*args, **kwargs))
+        except PreventUpdate:
+            entry.update(status=204, elapsed=time.perf_counter() - start, bytes=0)
+            _append(os.path.join(directory, f"{session}.jsonl"), entry)
+            raise
+
+        entry.update(status=response.status_code, elapsed=time.perf_counter() - start, bytes=response.calculate_content_length() or 0)
+        _append(os.path.join(directory, f"{session}.jsonl"), entry)
+
+        if new_session:
+            response.set_cookie(SESSION_COOKIE, session, samesite='Lax')
+        return response
+
+    app.server.view_functions[endpoint] = recorded_dispatch
+    return True
+
+
+def load_session(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,292 @@
+import itertools
+import math
+
+import numpy as np
+
+try:
+    from Bio.PDB.kdtrees import KDTree
+except ImportError:
+    KDTree = None
+
+DEFAULT_CELL_SIZE = 4.0
+# Queries reaching further than this many cells along an axis go to the
+# KD-tree instead of scanning (2 * reach + 1) ** 3 cells.
+MAX_REACH = 2
+# Upper bound on candidate pairs materialized at once by pairs().
+PAIR_CHUNK = 1 << 22
+
+
+def atom_table(structure):
+    # Columns for every atom of the first model, plus one row per residue.
+    coords, residue_index, names, elements, residues = [], [], [], [], []
+    for model in structure:
+        for chain in model:
+            for residue in chain:
+                atoms = list(residue)
+                if not atoms:
+                    continue
+                residue_index.extend([len(residues)] * len(atoms))
+                residues.append((chain.id, residue.id[1], residue.id[2].strip(), residue.resname, residue.id[0]))
+                for atom in atoms:
+                    coords.append(atom.get_coord())
+                    names.append(atom.get_name())
+                    elements.append(atom.element)
+        break
+    return {
+        'coord': np.array(coords, dtype=np.float64).reshape(-1, 3),
+        'residue': np.array(residue_index, dtype=np.int64),
+        'name': np.array(names, dtype=str),
+        'element': np.array(elements, dtype=str),
+        'residues': residues,
+    }
+
+
+def residue_centroids(table):
+    counts = np.bincount(table['residue'], minlength=len(table['residues']))
+    sums = np.zeros((len(table['residues']), 3))
+    np.add.at(sums, table['residue'], table['coord'])
+    return sums / np.maximum(counts, 1)[:, None]
+
+
+def _half_shell(reach):
+    # Neighbour offsets that visit every pair of distinct cells once.
+    return [offset for offset in itertools.product(range(-reach, reach + 1), repeat=3) if offset > (0, 0, 0)]
+
+
+class SpatialIndex:
+    # Uniform-grid cell list over an (n, 3) coordinate array. Points are
+    # sorted by cell so each cell is a contiguous slice; wide queries fall
+    # back to Biopython's KD-tree.
+
+    def __init__(self, coords, cell_size=DEFAULT_CELL_SIZE):
+        if cell_size <= 0:
+            raise ValueError('cell_size must be positive')
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 3)
+        self.cell_size = float(cell_size)
+        self._kdtree = None
+
+        if len(self.coords):
+            self.origin = self.coords.min(axis=0)
+            cells = np.floor((self.coords - self.origin) / self.cell_size).astype(np.int64)
+            self.dims = cells.max(axis=0) + 1
+        else:
+            self.origin = np.zeros(3)
+            cells = np.zeros((0, 3), dtype=np.int64)
+            self.dims = np.ones(3, dtype=np.int64)
+
+        keys = self._key(cells)
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_coords = self.coords[self.order]
+        sorted_keys = keys[self.order]
+        self.cell_keys, self.cell_starts, self.cell_counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+        self.cell_coords = np.stack(np.unravel_index(self.cell_keys, tuple(self.dims)), axis=1) if len(self.cell_keys) else np.zeros((0, 3), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def _key(self, cells):
+        return np.ravel_multi_index(cells.T, tuple(self.dims)) if len(cells) else np.zeros(0, dtype=np.int64)
+
+    def _cell_of(self, point):
+        return np.floor((np.asarray(point, dtype=np.float64) - self.origin) / self.cell_size).astype(np.int64)
+
+    def _occupied(self, cells):
+        # Positions in cell_keys of the given cell coordinates, -1 where the
+        # cell is outside the grid or empty.
+        inside = np.all((cells >= 0) & (cells < self.dims), axis=1)
+        found = np.full(len(cells), -1, dtype=np.int64)
+        if not inside.any() or not len(self.cell_keys):
+            return found
+        keys = self._key(cells[inside])
+        position = np.searchsorted(self.cell_keys, keys)
+        position = np.minimum(position, len(self.cell_keys) - 1)
+        hit = self.cell_keys[position] == keys
+        found[np.flatnonzero(inside)[hit]] = position[hit]
+        return found
+
+    def _block(self, point, reach):
+        # Sorted positions of every point in the cells within reach of point.
+        cell = self._cell_of(point)
+        low, high = np.maximum(cell - reach, 0), np.minimum(cell + reach, self.dims - 1)
+        if np.any(low > high):
+            return np.zeros(0, dtype=np.int64)
+        axes = [np.arange(start, stop + 1) for start, stop in zip(low, high)]
+        found = self._occupied(np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3))
+        found = found[found >= 0]
+        starts, counts = self.cell_starts[found], self.cell_counts[found]
+        return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+    def _covers(self, point, reach):
+        cell = self._cell_of(point)
+        return bool(np.all(cell - reach <= 0) and np.all(cell + reach >= self.dims - 1))
+
+    def kdtree(self):
+        if self._kdtree is None:
+            if KDTree is None:
+                raise RuntimeError('Bio.PDB.kdtrees is not available')
+            self._kdtree = KDTree(self.coords, 10)
+        return self._kdtree
+
+    def _use_kdtree(self, radius):
+        return KDTree is not None and len(self.coords) > 0 and math.ceil(radius / self.cell_size) > MAX_REACH
+
+    def _ranges(self, cells, offsets):
+        # Sorted-position ranges [lo, hi) of the cells at each offset from
+        # each query cell, as (queries, offsets) arrays.
+        neighbours = self._occupied((cells[:, None, :] + offsets[None, :, :]).reshape(-1, 3)).reshape(len(cells), len(offsets))
+        hit = neighbours >= 0
+        lo, hi = np.zeros(neighbours.shape, dtype=np.int64), np.zeros(neighbours.shape, dtype=np.int64)
+        lo[hit] = self.cell_starts[neighbours[hit]]
+        hi[hit] = lo[hit] + self.cell_counts[neighbours[hit]]
+        return lo, hi
+
+    def _expand(self, lo, hi):
+        # Yields (row, position) candidate arrays for every position in each
+        # row's ranges, at most about PAIR_CHUNK candidates at a time.
+        counts = np.maximum(hi - lo, 0)
+        bounds = np.cumsum(counts.sum(axis=1))
+        start = 0
+        while start < len(lo):
+            base = bounds[start - 1] if start else 0
+            stop = max(start + 1, int(np.searchsorted(bounds, base + PAIR_CHUNK, side='right')))
+            block_counts, block_lo = counts[start:stop].ravel(), lo[start:stop].ravel()
+            total = int(block_counts.sum())
+            if total:
+                rows = np.repeat(np.repeat(np.arange(start, stop), lo.shape[1]), block_counts)
+                positions = np.repeat(block_lo - np.cumsum(block_counts) + block_counts, block_counts) + np.arange(total)
+                yield rows, positions
+            start = stop
+
+    def query_radius(self, points, radius):
+        # Bulk radius query: (query, index, distance) arrays for every point
+        # within radius of each query point, ordered by query then index.
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        if self._use_kdtree(radius):
+            tree = self.kdtree()
+            found = [tree.search(point, float(radius)) for point in points]
+            queries = np.repeat(np.arange(len(points)), [len(hits) for hits in found])
+            indices = np.array([hit.index for hits in found for hit in hits], dtype=np.int64)
+            distances = np.array([hit.radius for hits in found for hit in hits])
+        else:
+            reach = max(1, math.ceil(radius / self.cell_size))
+            offsets = np.array(list(itertools.product(range(-reach, reach + 1), repeat=3)))
+            lo, hi = self._ranges(self._cell_of(points), offsets)
+            queries, indices, distances = _concatenate(self._within(points, rows, positions, radius) for rows, positions in self._expand(lo, hi))
+        order = np.lexsort((indices, queries))
+        return queries[order], indices[order], distances[order]
+
+    def _within(self, points, rows, positions, radius):
+        delta = self.sorted_coords[positions] - points[rows]
+        squared = np.einsum('ij,ij->i', delta, delta)
+        keep = squared <= radius * radius
+        return rows[keep], self.order[positions[keep]], np.sqrt(squared[keep])
+
+    def radius(self, point, radius, return_distances=False):
+        # Indices (into coords) of the points within radius of point.
+        _, indices, distances = self.query_radius(point, radius)
+        return (indices, distances) if return_distances else indices
+
+    def nearest(self, point, k=1):
+        # (indices, distances) of the k nearest points, closest first.
+        point = np.asarray(point, dtype=np.float64)
+        k = min(k, len(self.coords))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        reach = 1
+        while True:
+            covers = self._covers(point, reach)
+            if reach > MAX_REACH and KDTree is not None and not covers:
+                return self._kdtree_nearest(point, k, reach * self.cell_size)
+            positions = self._block(point, reach)
+            if len(positions) >= k:
+                distances = np.linalg.norm(self.sorted_coords[positions] - point, axis=1)
+                order = np.lexsort((self.order[positions], distances))[:k]
+                # Everything within reach cells of the point's own cell was
+                # scanned, so distances up to reach * cell_size are complete.
+                if covers or distances[order[-1]] <= reach * self.cell_size:
+                    return self.order[positions[order]], distances[order]
+            reach = reach + 1 if reach < MAX_REACH else reach * 2
+
+    def _kdtree_nearest(self, point, k, radius):
+        tree = self.kdtree()
+        # Radius that reaches every point, for queries far outside the grid.
+        limit = np.linalg.norm(np.maximum(np.abs(point - self.coords.min(axis=0)), np.abs(point - self.coords.max(axis=0))))
+        while True:
+            found = tree.search(point, float(min(radius, limit)))
+            if len(found) >= k or radius >= limit:
+                indices = np.array([hit.index for hit in found], dtype=np.int64)
+                distances = np.array([hit.radius for hit in found])
+                order = np.lexsort((indices, distances))[:k]
+                return indices[order], distances[order]
+            radius *= 2
+
+    def pairs(self, radius, return_distances=False):
+        # Every pair (i, j), i < j, of points at most radius apart.
+        if self._use_kdtree(radius):
+            found = self.kdtree().neighbor_search(float(radius))
+            first = np.array([pair.index1 for pair in found], dtype=np.int64)
+            second = np.array([pair.index2 for pair in found], dtype=np.int64)
+            distances = np.array([pair.radius for pair in found])
+        else:
+            first, second, distances = _concatenate(self._grid_pairs(radius))
+        i, j = np.minimum(first, second), np.maximum(first, second)
+        order = np.argsort(i * len(self.coords) + j)
+        i, j, distances = i[order], j[order], distances[order]
+        return (i, j, distances) if return_distances else (i, j)
+
+    def _grid_pairs(self, radius):
+        # Each sorted point is paired with the later points of its own cell
+        # and with every point of the neighbouring cells in the half shell,
+        # so each pair of points is generated once.
+        reach = max(1, math.ceil(radius / self.cell_size))
+        point_cells = np.repeat(np.arange(len(self.cell_keys)), self.cell_counts)
+        lo, hi = self._ranges(self.cell_coords, np.array(_half_shell(reach)).reshape(-1, 3))
+        positions = np.arange(len(self.coords))
+        cell_end = (self.cell_starts + self.cell_counts)[point_cells]
+        lo = np.column_stack([positions + 1, lo[point_cells]])
+        hi = np.column_stack([cell_end, hi[point_cells]])
+        for rows, others in self._expand(lo, hi):
+            delta = self.sorted_coords[others] - self.sorted_coords[rows]
+            squared = np.einsum('ij,ij->i', delta, delta)
+            keep = squared <= radius * radius
+            yield self.order[rows[keep]], self.order[others[keep]], np.sqrt(squared[keep])
+
+
+def _concatenate(chunks):
+    chunks = list(chunks)
+    if not chunks:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    return tuple(np.concatenate(column) for column in zip(*chunks))
+
+
+class StructureIndex:
+    # Atom and residue-centroid indexes for one parsed structure.
+
+    def __init__(self, structure, cell_size=DEFAULT_CELL_SIZE):
+        self.atoms = atom_table(structure)
+        self.residues = self.atoms['residues']
+        self.atom_index = SpatialIndex(self.atoms['coord'], cell_size)
+        self.centroid_index = SpatialIndex(residue_centroids(self.atoms), cell_size)
+
+    def residue_position(self, chain, number, icode=''):
+        for position, residue in enumerate(self.residues):
+            if residue[0] == chain and residue[1] == number and residue[2] == icode:
+                return position
+        raise KeyError((chain, number, icode))
+
+    def residues_near(self, position, radius):
+        # Positions of residues with any atom within radius of any atom of
+        # the residue at position (excluding itself).
+        atoms = np.flatnonzero(self.atoms['residue'] == position)
+        _, indices, _ = self.atom_index.query_radius(self.atoms['coord'][atoms], radius)
+        near = np.unique(self.atoms['residue'][indices])
+        return near[near != position].tolist()
+
+
+def structure_index(structure, cell_size=DEFAULT_CELL_SIZE):
+    # Built once per parsed structure and kept in its xtra dict.
+    key = ('spatial_index', cell_size)
+    index = structure.xtra.get(key)
+    if index is None:
+        index = structure.xtra[key] = StructureIndex(structure, cell_size)
+    return index
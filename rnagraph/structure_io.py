@@ -0,0 +1,380 @@
+import base64
+import binascii
+import os
+import re
+import zlib
+from io import StringIO
+
+import msgpack
+import numpy as np
+
+STRUCTURE_EXTENSIONS = ['pdb', 'cif', 'bcif']
+COMPRESSIONS = ['gz']
+MAX_DECOMPRESSED_SIZE_ENV = 'RNAGRAPH_MAX_DECOMPRESSED_SIZE'
+DEFAULT_MAX_DECOMPRESSED_SIZE = 1024 * 1024 * 1024
+BASE64_CHUNK = 4 * 256 * 1024
+
+
+class StructureTooLarge(ValueError):
+    pass
+
+
+def max_decompressed_size():
+    return int(os.environ.get(MAX_DECOMPRESSED_SIZE_ENV, DEFAULT_MAX_DECOMPRESSED_SIZE))
+
+
+def structure_format(filename):
+    parts = filename.lower().split('.')
+    compression = None
+    if len(parts) > 2 and parts[-1] in COMPRESSIONS:
+        compression = parts.pop()
+    ext = parts[-1] if len(parts) > 1 else ''
+    if ext == 'ent':
+        ext = 'pdb'
+    elif ext == 'mmcif':
+        ext = 'cif'
+    return ext, compression
+
+
+def _base64_chunks(content_string):
+    for start in range(0, len(content_string), BASE64_CHUNK):
+        yield base64.b64decode(content_string[start:start + BASE64_CHUNK])
+
+
+def iter_gunzip(chunks, limit=None):
+    limit = max_decompressed_size() if limit is None else limit
+    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    total = 0
+    for chunk in chunks:
+        while chunk:
+            data = decompressor.decompress(chunk, BASE64_CHUNK)
+            total += len(data)
+            if total > limit:
+                raise StructureTooLarge(f"Decompressed structure is larger than {limit} bytes")
+            yield data
+            chunk = decompressor.unconsumed_tail
+            # Concatenated gzip members (e.g. from pigz) start a new stream.
+            if decompressor.eof and decompressor.unused_data:
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    tail = decompressor.flush()
+    if tail:
+        total += len(tail)
+        if total > limit:
+            raise StructureTooLarge(f"Decompressed structure is larger than {limit} bytes")
+        yield tail
+    if not decompressor.eof:
+        raise zlib.error('Incomplete gzip stream')
+
+
+def gunzip(data, limit=None):
+    return b''.join(iter_gunzip([data], limit))
+
+
+def decode_upload(content_string, filename):
+    # Decodes a dcc.Upload base64 payload into plain PDB or mmCIF text and
+    # returns it with the extension the rest of the pipeline expects.
+    ext, compression = structure_format(filename)
+    if ext not in STRUCTURE_EXTENSIONS:
+        raise ValueError(f"Unsupported structure format: {filename}")
+
+    if compression == 'gz':
+        try:
+            decoded = b''.join(iter_gunzip(_base64_chunks(content_string)))
+        except binascii.Error:
+            raise ValueError('Invalid base64 payload')
+    else:
+        decoded = base64.b64decode(content_string)
+
+    return decode_structure(decoded, ext)
+
+
+def decode_file(data, filename):
+    # The same as decode_upload for the raw bytes of a structure file.
+    ext, compression = structure_format(filename)
+    if ext not in STRUCTURE_EXTENSIONS:
+        raise ValueError(f"Unsupported structure format: {filename}")
+    if compression == 'gz':
+        data = gunzip(data)
+    return decode_structure(data, ext)
+
+
+def decode_structure(data, ext):
+    if ext == 'bcif':
+        return bcif_to_mmcif(data), 'cif'
+    return data, ext
+
+
+# BinaryCIF, see https://github.com/molstar/BinaryCIF
+
+BYTE_ARRAY_TYPES = {
+    1: np.dtype('<i1'),
+    2: np.dtype('<i2'),
+    3: np.dtype('<i4'),
+    4: np.dtype('<u1'),
+    5: np.dtype('<u2'),
+    6: np.dtype('<u4'),
+    32: np.dtype('<f4'),
+    33: np.dtype('<f8'),
+}
+
+
+def _dtype_for(src_type):
+    return BYTE_ARRAY_TYPES.get(src_type, np.dtype('<f8'))
+
+
+def _decode_integer_packing(data, encoding):
+    data = np.asarray(data)
+    if data.size == 0:
+        return np.zeros(encoding['srcSize'], dtype=np.int32)
+    if encoding['isUnsigned']:
+        upper = np.iinfo(data.dtype).max
+        at_limit = data == upper
+    else:
+        info = np.iinfo(data.dtype)
+        at_limit = (data == info.max) | (data == info.min)
+
+    # A value equal to the type limit continues into the next element, so the
+    # output is the sum of every run that ends on a non-limit element.
+    ends = np.flatnonzero(~at_limit)
+    sums = np.cumsum(data.astype(np.int64))[ends]
+    values = np.diff(np.concatenate([[0], sums]))
+    return values.astype(np.int32)
+
+
+def _decode_string_array(data, encoding):
+    offsets = decode_data({'data': encoding['offsets'], 'encoding': encoding['offsetEncoding']})
+    indices = decode_data({'data': data, 'encoding': encoding['dataEncoding']})
+    string_data = encoding['stringData']
+    strings = [string_data[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+    strings.append(None)
+    lookup = np.array(strings, dtype=object)
+    return lookup[np.asarray(indices, dtype=np.int64)]
+
+
+def decode_data(encoded):
+    data = encoded['data']
+    for encoding in reversed(encoded['encoding']):
+        kind = encoding['kind']
+        if kind == 'ByteArray':
+            data = np.frombuffer(data, dtype=BYTE_ARRAY_TYPES[encoding['type']])
+        elif kind == 'FixedPoint':
+            data = (np.asarray(data, dtype=np.float64) / encoding['factor']).astype(_dtype_for(encoding['srcType']))
+        elif kind == 'IntervalQuantization':
+            delta = (encoding['max'] - encoding['min']) / max(encoding['numSteps'] - 1, 1)
+            data = (encoding['min'] + delta * np.asarray(data, dtype=np.float64)).astype(_dtype_for(encoding['srcType']))
+        elif kind == 'RunLength':
+            pairs = np.asarray(data).reshape(-1, 2)
+            data = np.repeat(pairs[:, 0], pairs[:, 1]).astype(_dtype_for(encoding['srcType']))
+        elif kind == 'Delta':
+            data = np.asarray(data, dtype=np.int64)
+            if data.size:
+                data = data.copy()
+                data[0] += encoding['origin']
+            data = np.cumsum(data).astype(_dtype_for(encoding['srcType']))
+        elif kind == 'IntegerPacking':
+            data = _decode_integer_packing(data, encoding)
+        elif kind == 'StringArray':
+            data = _decode_string_array(data, encoding)
+        else:
+            raise ValueError(f"Unsupported BinaryCIF encoding: {kind}")
+    return data
+
+
+def _column_strings(column):
+    values = decode_data(column['data'])
+    if values.dtype == object:
+        text = np.array(['' if value is None else value for value in values], dtype=object)
+    elif values.dtype.kind == 'f':
+        if values.dtype == np.float32:
+            values = values.astype(np.float64).round(6)
+        text = np.array([repr(value) for value in values.tolist()], dtype=object)
+    else:
+        text = np.array([str(value) for value in values.tolist()], dtype=object)
+
+    if column.get('mask'):
+        mask = np.asarray(decode_data(column['mask']))
+        text[mask == 1] = '.'
+        text[mask == 2] = '?'
+    return text
+
+
+def read_bcif(data):
+    file = msgpack.unpackb(data, raw=False)
+    blocks = []
+    for block in file['dataBlocks']:
+        categories = []
+        for category in block['categories']:
+            name = category['name'].lstrip('_')
+            columns = [column['name'] for column in category['columns']]
+            values = [_column_strings(column) for column in category['columns']]
+            rows = [list(row) for row in zip(*values)] if values else []
+            categories.append((name, columns, rows))
+        blocks.append((block['header'], categories))
+    return blocks
+
+
+_PLAIN_VALUE = re.compile(r'^[^\s\'"_#$;\[\]][^\s]*$')
+_RESERVED = re.compile(r'^(data_|save_|loop_|stop_|global_)', re.IGNORECASE)
+
+
+def _quote(value):
+    if value in ('.', '?'):
+        return value
+    if value and _PLAIN_VALUE.match(value) and not _RESERVED.match(value):
+        return value
+    if '\n' in value:
+        return f"\n;{value}\n;"
+    if "' " not in value and not value.endswith("'"):
+        return f"'{value}'"
+    if '" ' not in value and not value.endswith('"'):
+        return f'"{value}"'
+    return f"\n;{value}\n;"
+
+
+def write_mmcif_blocks(blocks):
+    lines = []
+    for header, categories in blocks:
+        lines.append(f"data_{header}")
+        for name, columns, rows in categories:
+            lines.append('#')
+            if len(rows) == 1:
+                width = max(len(column) for column in columns) + len(name) + 3
+                for column, value in zip(columns, rows[0]):
+                    lines.append(f"{f'_{name}.{column}':{width}}{_quote(str(value))}")
+            else:
+                lines.append('loop_')
+                lines.extend(f"_{name}.{column}" for column in columns)
+                lines.extend(' '.join(_quote(str(value)) for value in row) for row in rows)
+        lines.append('#')
+    return '\n'.join(lines) + '\n'
+
+
+def bcif_to_mmcif(data):
+    return write_mmcif_blocks(read_bcif(data)).encode('utf-8')
+
+
+def read_mmcif_blocks(text):
+    from mmcif.io.PdbxReader import PdbxReader
+
+    containers = []
+    PdbxReader(StringIO(text)).read(containers)
+    blocks = []
+    for container in containers:
+        categories = []
+        for name in container.getObjNameList():
+            category = container.getObj(name)
+            categories.append((name, category.getAttributeList(), category.getRowList()))
+        blocks.append((container.getName(), categories))
+    return blocks
+
+
+def _byte_array(values):
+    values = np.asarray(values)
+    for code, dtype in BYTE_ARRAY_TYPES.items():
+        if values.dtype == dtype:
+            return {'kind': 'ByteArray', 'type': code}, values.astype(dtype).tobytes()
+    values = values.astype('<i4')
+    return {'kind': 'ByteArray', 'type': 3}, values.tobytes()
+
+
+def _integer_packing(values):
+    values = np.asarray(values, dtype=np.int64)
+    if values.size and values.min() >= 0:
+        limit, dtype, unsigned = 255, np.uint8, True
+    else:
+        limit, dtype, unsigned = 127, np.int8, False
+    if values.size and np.abs(values).max() > 2 * limit * 64:
+        return None, values.astype(np.int32)
+
+    packed = []
+    for value in values.tolist():
+        if value >= 0:
+            while value >= limit:
+                packed.append(limit)
+                value -= limit
+        else:
+            while value <= -limit - 1:
+                packed.append(-limit - 1)
+                value += limit + 1
+        packed.append(value)
+    encoding = {'kind': 'IntegerPacking', 'byteCount': 1, 'isUnsigned': unsigned, 'srcSize': int(values.size)}
+    return encoding, np.array(packed, dtype=dtype)
+
+
+def _encode_integers(values):
+    values = np.asarray(values, dtype=np.int32)
+    encodings = []
+    if values.size > 1:
+        encodings.append({'kind': 'Delta', 'origin': int(values[0]), 'srcType': 3})
+        values = np.diff(values, prepend=values[0]).astype(np.int32)
+    packing, packed = _integer_packing(values)
+    if packing is not None:
+        encodings.append(packing)
+        values = packed
+    byte_array, data = _byte_array(values)
+    encodings.append(byte_array)
+    return {'encoding': encodings, 'data': data}
+
+
+def _encode_strings(values):
+    unique, indices = np.unique(np.array(values, dtype=object).astype(str), return_inverse=True)
+    offsets = np.concatenate([[0], np.cumsum([len(value) for value in unique])]).astype(np.int32)
+    index_data = _encode_integers(indices.astype(np.int32))
+    offset_data = _encode_integers(offsets)
+    return {
+        'encoding': [{
+            'kind': 'StringArray',
+            'dataEncoding': index_data['encoding'],
+            'stringData': ''.join(unique.tolist()),
+            'offsetEncoding': offset_data['encoding'],
+            'offsets': offset_data['data'],
+        }],
+        'data': index_data['data'],
+    }
+
+
+_INTEGER = re.compile(r'^-?\d+$')
+_DECIMAL = re.compile(r'^-?\d+\.(\d+)$')
+
+
+def _encode_column(name, values):
+    mask = np.array([1 if value == '.' else 2 if value == '?' else 0 for value in values], dtype=np.uint8)
+    present = [value for value, flag in zip(values, mask) if flag == 0]
+    filled = [value if flag == 0 else (present[0] if present else '') for value, flag in zip(values, mask)]
+
+    if present and all(_INTEGER.match(value) for value in present) and all(abs(int(value)) < 2 ** 31 for value in present):
+        data = _encode_integers([int(value) for value in filled])
+    elif present and all(_DECIMAL.match(value) or _INTEGER.match(value) for value in present):
+        digits = max(len(match.group(1)) if match else 0 for match in map(_DECIMAL.match, present))
+        factor = 10 ** min(digits, 6)
+        scaled = np.round(np.array(filled, dtype=np.float64) * factor).astype(np.int64)
+        if np.abs(scaled).max() < 2 ** 31:
+            data = _encode_integers(scaled.astype(np.int32))
+            data['encoding'].insert(0, {'kind': 'FixedPoint', 'factor': factor, 'srcType': 33})
+        else:
+            data = {'encoding': [{'kind': 'ByteArray', 'type': 33}], 'data': np.array(filled, dtype='<f8').tobytes()}
+    else:
+        data = _encode_strings(filled)
+
+    column = {'name': name, 'data': data, 'mask': None}
+    if mask.any():
+        column['mask'] = {'encoding': [{'kind': 'ByteArray', 'type': 4}], 'data': mask.tobytes()}
+    return column
+
+
+def mmcif_to_bcif(text):
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    blocks = []
+    for header, categories in read_mmcif_blocks(text):
+        encoded = []
+        for name, columns, rows in categories:
+            values = list(zip(*rows)) if rows else [[] for _ in columns]
+            encoded.append({
+                'name': f"_{name}",
+                'rowCount': len(rows),
+                'columns': [_encode_column(column, [str(value) for value in column_values]) for column, column_values in zip(columns, values)],
+            })
+        blocks.append({'header': header, 'categories': encoded})
+    return msgpack.packb({'version': '0.3.0', 'encoder': 'rnagraph', 'dataBlocks': blocks}, use_bin_type=True)
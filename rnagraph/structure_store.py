@@ -0,0 +1,170 @@
+import base64
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+
+import flask
+
+from rnagraph.structure_io import mmcif_to_bcif
+
+STORE_DIR_ENV = 'RNAGRAPH_STRUCTURE_DIR'
+STORE_SIZE_ENV = 'RNAGRAPH_STRUCTURE_STORE_SIZE'
+BCIF_ENV = 'RNAGRAPH_SERVE_BCIF'
+DEFAULT_STORE_SIZE = 2 * 1024 * 1024 * 1024
+MAX_AGE = 365 * 24 * 3600
+ROUTE = '/structures/<digest>.<fmt>'
+
+MIMETYPES = {
+    'pdb': 'chemical/x-pdb',
+    'cif': 'chemical/x-mmcif',
+    'bcif': 'application/octet-stream',
+}
+
+_DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+
+def store_dir():
+    directory = os.environ.get(STORE_DIR_ENV) or os.path.join(tempfile.gettempdir(), 'rnagraph-structures')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def serve_bcif():
+    return os.environ.get(BCIF_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def structure_path(digest, fmt):
+    return os.path.join(store_dir(), f"{digest}.{fmt}")
+
+
+def _write_atomic(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def put_structure(data, ext, digest=None):
+    digest = digest or content_hash(data)
+    path = structure_path(digest, ext)
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        _write_atomic(path, data)
+        prune(keep=path)
+    return digest
+
+
+def get_structure(digest, ext):
+    path = structure_path(digest, ext)
+    with open(path, 'rb') as f:
+        data = f.read()
+    # Reads count as use, so prune evicts the least recently used entries.
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return data
+
+
+def structure_bytes(data):
+    # Store data from update_active_link either points at the structure
+    # endpoint or, from older sessions and tests, embeds a data URL.
+    url = data.get('url') or ''
+    if url.startswith('data:'):
+        return base64.b64decode(url.split(',')[1])
+    return get_structure(data['hash'], data['ext'])
+
+
+def prune(max_bytes=None, keep=None):
+    # Removes the least recently used files until the store fits in
+    # max_bytes, leaving keep (the file just written) in place.
+    max_bytes = int(os.environ.get(STORE_SIZE_ENV, DEFAULT_STORE_SIZE)) if max_bytes is None else max_bytes
+    directory = store_dir()
+    entries = []
+    for name in os.listdir(directory):
+        # Temporary files of writes still in progress.
+        if name.endswith('.part'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _variant(digest, fmt):
+    # Returns the cached file for the requested format, transcoding mmCIF to
+    # BinaryCIF on first use.
+    path = structure_path(digest, fmt)
+    if os.path.exists(path):
+        return path
+    if fmt == 'bcif' and os.path.exists(structure_path(digest, 'cif')):
+        _write_atomic(path, mmcif_to_bcif(get_structure(digest, 'cif')))
+        return path
+    return None
+
+
+def _gzip_variant(path):
+    gz_path = f"{path}.gz"
+    if not os.path.exists(gz_path):
+        with open(path, 'rb') as f:
+            _write_atomic(gz_path, gzip.compress(f.read(), compresslevel=6))
+    return gz_path
+
+
+def serve_structure(digest, fmt):
+    if not _DIGEST.match(digest) or fmt not in MIMETYPES:
+        flask.abort(404)
+    path = _variant(digest, fmt)
+    if path is None:
+        flask.abort(404)
+
+    etag = f"{digest}-{fmt}"
+    compressed = flask.request.accept_encodings['gzip'] > 0
+    if compressed:
+        path = _gzip_variant(path)
+        etag = f"{etag}-gz"
+
+    response = flask.send_file(path, mimetype=MIMETYPES[fmt], etag=etag, max_age=MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if compressed:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def install_structure_route(app):
+    app.server.add_url_rule(app.config.routes_pathname_prefix + ROUTE.lstrip('/'), 'rnagraph_structure', serve_structure)
+
+
+def structure_urls(app, digest, ext):
+    urls = {'url': app.get_relative_path(f"/structures/{digest}.{ext}")}
+    if ext == 'cif' and serve_bcif():
+        urls['bcif_url'] = app.get_relative_path(f"/structures/{digest}.bcif")
+    return urls
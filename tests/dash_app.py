@@ -0,0 +1,19 @@
+from dash import Dash, html, Input, Output
+
+# A one-callback Dash app for tests of the request hooks (profiling,
+# recording). The callback keeps the name it is defined with, which the hooks
+# report.
+
+def create_app(callback):
+    app = Dash(__name__)
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='out')])
+    app.callback(Output('out', 'children'), Input('in', 'children'))(callback)
+    return app
+
+def dispatch_body(value=1):
+    return {
+        'output': 'out.children',
+        'outputs': {'id': 'out', 'property': 'children'},
+        'inputs': [{'id': 'in', 'property': 'children', 'value': value}],
+        'changedPropIds': ['in.children'],
+    }
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+import numpy as np
+from Bio.PDB import PDBParser
+from plotly.io.json import to_json_plotly
+from app import calculate_interactions
+from pages.page2 import update_rna_graph
+from rnagraph.figure_cache import figure_cache
+from rnagraph.annotation_archive import archive_path, load_interactions, load_residues, prune, save_interactions, save_residues
+from rnagraph.pipeline import collect_centroids
+from rnagraph.structure_store import put_structure
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class TestAnnotationArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': tempfile.mkdtemp(), 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+
+    def test_interactions_round_trip(self):
+        interactions = calculate_interactions(read('tests/sample.pdb'), 'pdb')
+        self.assertIsNone(load_interactions('abc'))
+        save_interactions('abc', interactions)
+
+        loaded = load_interactions('abc')
+        for name, values in interactions.items():
+            self.assertEqual(loaded[name], json.loads(to_json_plotly(values)))
+        self.assertEqual(loaded['c_base_base'], [])
+
+    def test_residues_round_trip(self):
+        structure = PDBParser(QUIET=True).get_structure('x', StringIO(read('tests/sample.pdb').decode('utf-8')))
+        points, nucleotide_info, heteroatoms, heteroatom_info = collect_centroids(structure)
+        save_residues('abc', nucleotide_info, heteroatom_info)
+
+        loaded = load_residues('abc')
+        np.testing.assert_array_equal(np.array(loaded[0]), np.array(points))
+        np.testing.assert_array_equal(np.array(loaded[2]), np.array(heteroatoms))
+        for original, restored in zip(nucleotide_info + heteroatom_info, list(loaded[1]) + list(loaded[3])):
+            self.assertEqual({key: value for key, value in restored.items() if key != 'Coordinate'},
+                             {key: value for key, value in original.items() if key != 'Coordinate'})
+
+    def test_lazy_columns(self):
+        interactions = calculate_interactions(read('tests/sample.pdb'), 'pdb')
+        save_interactions('abc', interactions)
+        table = load_interactions('abc')['stacking']
+        self.assertEqual(table._columns, {})
+        self.assertEqual(table[0], json.loads(to_json_plotly(interactions['stacking']))[0])
+        self.assertEqual(table[-1], json.loads(to_json_plotly(interactions['stacking']))[-1])
+        self.assertEqual(table.column('nt1.auth.chain'), [pair['nt1']['auth']['chain'] for pair in json.loads(to_json_plotly(interactions['stacking']))])
+        self.assertEqual(json.loads(to_json_plotly(table)), json.loads(to_json_plotly(interactions['stacking'])))
+
+        structure = PDBParser(QUIET=True).get_structure('x', StringIO(read('tests/sample.pdb').decode('utf-8')))
+        _, nucleotide_info, _, heteroatom_info = collect_centroids(structure)
+        save_residues('abc', nucleotide_info, heteroatom_info)
+        points = load_residues('abc')[0]
+        # The mapped column itself, not one array per row.
+        self.assertIsInstance(points, np.memmap)
+
+    def test_prune(self):
+        # Files next to the archives (the batch journal) are left alone.
+        journal = os.path.join(os.environ['RNAGRAPH_ARCHIVE_DIR'], 'journal.jsonl')
+        with open(journal, 'w') as f:
+            f.write('{}')
+        for index, digest in enumerate(['a', 'b', 'c']):
+            save_interactions(digest, {'stacking': [{'nt1': 'x' * 1000}]})
+            os.utime(archive_path(digest, 'interactions'), (index, index))
+        # Reads count as use.
+        load_interactions('a')
+        size = sum(os.path.getsize(os.path.join(archive_path('a', 'interactions'), name)) for name in os.listdir(archive_path('a', 'interactions')))
+
+        prune(2 * size)
+        self.assertIsNotNone(load_interactions('a'))
+        self.assertIsNone(load_interactions('b'))
+        self.assertIsNotNone(load_interactions('c'))
+
+        # The archive just written stays, even on its own over the limit.
+        with patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_SIZE': '1'}):
+            save_interactions('d', {'stacking': [{'nt1': 'x' * 1000}]})
+        self.assertIsNotNone(load_interactions('d'))
+        self.assertIsNone(load_interactions('a'))
+        self.assertTrue(os.path.exists(journal))
+
+    def test_update_rna_graph_skips_parsing(self):
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        store = {'hash': digest, 'ext': 'pdb', 'name': '6JJH', 'url': f"/structures/{digest}.pdb"}
+        first = update_rna_graph(store, 'sample.pdb')
+
+        figure_cache.clear()
+        with patch('rnagraph.pipeline.PDBParser', side_effect=AssertionError('parsed again')):
+            second = update_rna_graph(store, 'sample.pdb')
+        self.assertEqual(to_json_plotly(first[0]), to_json_plotly(second[0]))
+        self.assertEqual(first[1:], second[1:])
+
+    def test_disabled(self):
+        with patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': ''}):
+            self.assertIsNone(save_interactions('abc', {}))
+            self.assertIsNone(load_interactions('abc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from plotly.io.json import to_json_plotly
+from app import calculate_interactions
+from pages.page2 import update_rna_graph, update_interaction_info
+from rnagraph.backbone import BACKBONE_LAYER, backbone_steps, backbone_traces, chain_breaks
+from rnagraph.figure_cache import figure_cache
+from rnagraph.figures import customdata
+from rnagraph.pipeline import Pipeline
+from rnagraph.spatial import structure_index
+from rnagraph.structure_store import put_structure
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class TestBackbone(unittest.TestCase):
+
+    def setUp(self):
+        self.pipeline = Pipeline.from_file('tests/sample.cif')
+        self.index = structure_index(self.pipeline.structure())
+
+    def test_bonds_and_breaks(self):
+        first, second, bonded = backbone_steps(self.index)
+        atoms = self.index.atoms
+        for a, b, bond in zip(first, second, bonded):
+            o3 = atoms['coord'][(atoms['residue'] == a) & (atoms['name'] == "O3'")]
+            p = atoms['coord'][(atoms['residue'] == b) & (atoms['name'] == 'P')]
+            expected = len(o3) > 0 and len(p) > 0 and np.linalg.norm(o3[0] - p[0]) <= 2.0
+            self.assertEqual(bond, expected)
+        # Residue B22 is not modelled.
+        self.assertEqual(chain_breaks(self.index), [(('B', 21, '', 'A', ' '), ('B', 23, '', 'U', ' '))])
+
+    def test_moved_phosphate_breaks_chain(self):
+        atoms = self.index.atoms
+        phosphorus = np.flatnonzero((atoms['name'] == 'P') & (atoms['residue'] == 5))
+        atoms['coord'][phosphorus] += 3.0
+        self.assertIn((4, 5), [(self.index.residues.index(a), self.index.residues.index(b)) for a, b in chain_breaks(self.index)])
+
+    def test_one_trace_per_chain(self):
+        _, nucleotide_info, _, heteroatom_info = self.pipeline.residues()
+        traces = backbone_traces(self.index, customdata(nucleotide_info), customdata(heteroatom_info))
+        self.assertEqual(len(traces), 2)
+        self.assertEqual({trace['name'] for trace in traces}, {BACKBONE_LAYER})
+        self.assertEqual(sorted(trace['x'].count(None) for trace in traces), [0, 1])
+
+class TestBackboneLayer(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': '', 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        figure_cache.clear()
+
+    def test_layer(self):
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        store = {'hash': digest, 'ext': 'pdb', 'name': '6JJH', 'url': f"/structures/{digest}.pdb"}
+        interactions = json.loads(to_json_plotly(calculate_interactions(data, 'pdb')))
+        figure = update_rna_graph(store, 'sample.pdb')[0]
+
+        figure, options = update_interaction_info([BACKBONE_LAYER, 'phosphodiester'], store, figure, interactions, None)
+        self.assertIn({'label': "Backbone (O3'-P bonds)", 'value': BACKBONE_LAYER, 'disabled': False}, options)
+        layers = [trace for trace in figure['data'] if trace['name'] == BACKBONE_LAYER]
+        self.assertEqual(len(layers), 1)
+        # 14 nucleotides joined without a break.
+        self.assertEqual(len(layers[0]['x']), 14)
+        self.assertTrue([trace for trace in figure['data'] if trace['name'] == 'phosphodiester'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import gzip
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+from unittest.mock import patch
+from rnagraph.annotation_archive import load_interactions, load_residues
+from rnagraph.batch import annotate, collect_sources, read_journal, run
+from rnagraph.structure_store import content_hash
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def dying_annotate(filename, path=None, data=None):
+    # A worker killed while it annotates empty.pdb.
+    if filename == 'empty.pdb':
+        os._exit(1)
+    return annotate(filename, path=path, data=data)
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.inputs = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.inputs, 'nested'))
+        shutil.copy('tests/sample.pdb', os.path.join(self.inputs, 'sample.pdb'))
+        with open(os.path.join(self.inputs, 'nested', 'empty.pdb'), 'w') as f:
+            f.write('ATOM      1  P     A A   1\n')
+        with open(os.path.join(self.inputs, 'notes.txt'), 'w') as f:
+            f.write('not a structure')
+        self.bundle = os.path.join(tempfile.mkdtemp(), 'bundle.tar.gz')
+        with tarfile.open(self.bundle, 'w:gz') as archive:
+            archive.add('tests/small_file.cif', arcname='small.cif')
+
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': tempfile.mkdtemp(), 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+
+    def test_sources(self):
+        with open(os.path.join(self.inputs, 'nested', 'copy.cif.gz'), 'wb') as f:
+            f.write(gzip.compress(read('tests/small_file.cif')))
+        sources = collect_sources([self.inputs, os.path.join(self.inputs, '*.pdb'), self.bundle])
+        self.assertEqual(sorted(source.filename for source in sources), ['copy.cif.gz', 'empty.pdb', 'sample.pdb', 'small.cif'])
+
+    def test_annotates_and_resumes(self):
+        summary = run([self.inputs, self.bundle], workers=2, log=lambda line: None)
+        self.assertEqual((summary['files'], summary['ok'], summary['invalid'], summary['failed']), (3, 2, 1, 0))
+        for path in ['tests/sample.pdb', 'tests/small_file.cif']:
+            digest = content_hash(read(path))
+            self.assertIsNotNone(load_interactions(digest))
+            self.assertIsNotNone(load_residues(digest))
+
+        journal = read_journal(os.path.join(os.environ['RNAGRAPH_ARCHIVE_DIR'], 'batch-journal.jsonl'))
+        self.assertEqual(sorted(entry['status'] for entry in journal.values()), ['invalid', 'ok', 'ok'])
+        summary = run([self.inputs, self.bundle], workers=2, log=lambda line: None)
+        self.assertEqual((summary['skipped'], summary['ok']), (3, 0))
+
+    def test_annotation_error(self):
+        with patch('rnagraph.pipeline.annotate', side_effect=RuntimeError('no base pairs')), self.assertLogs('rnagraph.pipeline', 'ERROR'):
+            result = annotate('sample.pdb', path='tests/sample.pdb')
+        self.assertEqual((result['status'], result['error']), ('failed', 'RuntimeError: no base pairs'))
+
+    def test_worker_death(self):
+        with patch('rnagraph.batch.annotate', dying_annotate):
+            summary = run([self.inputs, self.bundle], workers=1, log=lambda line: None)
+        # Files in flight with it fail too; the run goes on in a new pool.
+        self.assertEqual(summary['ok'] + summary['failed'], 3)
+        self.assertGreater(summary['ok'], 0)
+        with open(os.path.join(os.environ['RNAGRAPH_ARCHIVE_DIR'], 'batch-journal.jsonl')) as f:
+            entries = {entry['key']: entry for entry in map(json.loads, f)}
+        self.assertEqual(entries[os.path.join(self.inputs, 'nested', 'empty.pdb')]['error'], 'worker process died')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from benchmarks.bench_pipeline import run, compare, STAGES
+
+def report(median):
+    return {'results': {'tests/sample.pdb': {'stages': {'annotation': {'median': median}}}}}
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_run_sample_pdb(self):
+        result = run(['tests/sample.pdb'], repeat=1, warmup=0, log=lambda line: None)
+        stages = result['results']['tests/sample.pdb']['stages']
+        self.assertEqual(list(stages), STAGES)
+        for stage in stages.values():
+            self.assertGreater(stage['median'], 0)
+            self.assertGreaterEqual(stage['peak_memory'], 0)
+        self.assertIn('python', result['environment'])
+
+    def test_compare_flags_regression(self):
+        rows, regressions = compare(report(0.010), report(0.020), threshold=0.2)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(len(regressions), 1)
+        self.assertAlmostEqual(regressions[0]['ratio'], 2.0)
+
+    def test_compare_ignores_noise(self):
+        _, regressions = compare(report(0.010), report(0.0115), threshold=0.2)
+        self.assertEqual(regressions, [])
+        _, regressions = compare(report(0.0001), report(0.0005), threshold=0.2)
+        self.assertEqual(regressions, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
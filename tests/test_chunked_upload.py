@@ -0,0 +1,160 @@
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from app import app, update_active_link
+from rnagraph import chunked_upload
+from rnagraph.chunked_upload import CHUNKED_PREFIX, READ_SIZE, UploadError, append_chunk, create_upload, load_upload, remove_stale
+from rnagraph.structure_store import structure_bytes
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class TestChunkedUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {
+            'RNAGRAPH_SPOOL_DIR': tempfile.mkdtemp(),
+            'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp(),
+            'RNAGRAPH_MAX_UPLOAD_SIZE': str(1024 * 1024),
+        })
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        self.client = app.server.test_client()
+
+    def upload(self, data, filename, chunk=20000):
+        response = self.client.post('/uploads', json={'filename': filename, 'size': len(data)})
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.get_json()['upload_id']
+        offset = 0
+        while offset < len(data):
+            response = self.client.patch(f"/uploads/{upload_id}", data=data[offset:offset + chunk], headers={'Upload-Offset': str(offset)})
+            self.assertEqual(response.status_code, 200)
+            offset = response.get_json()['offset']
+        return upload_id, response.get_json()
+
+    def test_upload_and_hash(self):
+        data = read('tests/sample.pdb')
+        upload_id, result = self.upload(data, 'sample.pdb')
+        self.assertTrue(result['complete'])
+        self.assertEqual(result['sha256'], hashlib.sha256(data).hexdigest())
+
+        decoded, ext, digest = load_upload(upload_id)
+        self.assertEqual((decoded, ext, digest), (data, 'pdb', result['sha256']))
+        self.assertEqual(load_upload(upload_id), (decoded, ext, digest))
+
+    def test_upload_over_store_limit(self):
+        data = read('tests/sample.pdb')
+        upload_id, _ = self.upload(data, 'sample.pdb')
+        with patch.dict(os.environ, {'RNAGRAPH_STRUCTURE_STORE_SIZE': '1'}):
+            _, ext, digest = load_upload(upload_id)
+        self.assertEqual(structure_bytes({'hash': digest, 'ext': ext}), data)
+
+    def test_resume(self):
+        data = read('tests/sample.pdb')
+        upload_id = self.client.post('/uploads', json={'filename': 'sample.pdb', 'size': len(data)}).get_json()['upload_id']
+        self.client.patch(f"/uploads/{upload_id}", data=data[:1000], headers={'Upload-Offset': '0'})
+
+        response = self.client.patch(f"/uploads/{upload_id}", data=data[:1000], headers={'Upload-Offset': '0'})
+        self.assertEqual(response.status_code, 409)
+        status = self.client.get(f"/uploads/{upload_id}").get_json()
+        self.assertEqual(status['offset'], 1000)
+
+        response = self.client.patch(f"/uploads/{upload_id}", data=data[1000:], headers={'Upload-Offset': '1000'})
+        self.assertEqual(response.get_json()['sha256'], hashlib.sha256(data).hexdigest())
+
+    def test_concurrent_load(self):
+        # The upload callback and a navigation right after it.
+        data = read('tests/sample.pdb')
+        upload_id, result = self.upload(data, 'sample.pdb')
+        with ThreadPoolExecutor(4) as threads:
+            results = list(threads.map(lambda _: load_upload(upload_id), range(4)))
+        self.assertEqual(results, [(data, 'pdb', result['sha256'])] * 4)
+
+    def test_concurrent_compressed_load(self):
+        data = read('tests/small_file.cif')
+        upload_id, _ = self.upload(gzip.compress(data), 'small_file.cif.gz')
+        with ThreadPoolExecutor(4) as threads:
+            results = list(threads.map(lambda _: load_upload(upload_id), range(4)))
+        self.assertEqual({result[2] for result in results}, {hashlib.sha256(data).hexdigest()})
+
+    def test_slow_client(self):
+        # A chunk still arriving does not hold up another upload.
+        data = read('tests/sample.pdb')
+        slow = create_upload('slow.pdb', len(data))['upload_id']
+        fast = create_upload('fast.pdb', len(data))['upload_id']
+        arrived = threading.Event()
+
+        class SlowStream:
+            def __init__(self):
+                self.sent = False
+
+            def read(self, size):
+                if self.sent:
+                    arrived.wait(10)
+                    return b''
+                self.sent = True
+                return data[:1000]
+
+        thread = threading.Thread(target=append_chunk, args=(slow, 0, SlowStream()))
+        thread.start()
+        try:
+            with ThreadPoolExecutor(1) as threads:
+                result = threads.submit(append_chunk, fast, 0, io.BytesIO(data)).result(timeout=5)
+            self.assertTrue(result['complete'])
+        finally:
+            arrived.set()
+            thread.join()
+        self.assertEqual(self.client.get(f"/uploads/{slow}").get_json()['offset'], 1000)
+
+    def test_stale_hashes(self):
+        data = read('tests/sample.pdb')
+        upload_id = self.client.post('/uploads', json={'filename': 'sample.pdb', 'size': len(data)}).get_json()['upload_id']
+        self.client.patch(f"/uploads/{upload_id}", data=data[:1000], headers={'Upload-Offset': '0'})
+        self.assertIn(upload_id, chunked_upload._hashes)
+        remove_stale(max_age=-1)
+        self.assertNotIn(upload_id, chunked_upload._hashes)
+
+    def test_rejected_chunk_keeps_hash(self):
+        data = os.urandom(3 * READ_SIZE)
+        upload_id = create_upload('big.pdb', len(data))['upload_id']
+        append_chunk(upload_id, 0, io.BytesIO(data[:READ_SIZE]))
+        # Too long, and without a length to refuse it up front.
+        with self.assertRaises(UploadError):
+            append_chunk(upload_id, READ_SIZE, io.BytesIO(os.urandom(3 * READ_SIZE)))
+        result = append_chunk(upload_id, READ_SIZE, io.BytesIO(data[READ_SIZE:]))
+        self.assertEqual(result['sha256'], hashlib.sha256(data).hexdigest())
+
+    def test_size_cap(self):
+        response = self.client.post('/uploads', json={'filename': 'big.cif', 'size': 2 * 1024 * 1024})
+        self.assertEqual(response.status_code, 413)
+
+        upload_id = self.client.post('/uploads', json={'filename': 'small.pdb', 'size': 10}).get_json()['upload_id']
+        response = self.client.patch(f"/uploads/{upload_id}", data=b'x' * 11, headers={'Upload-Offset': '0'})
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.client.get(f"/uploads/{upload_id}").get_json()['offset'], 0)
+
+    def test_invalid(self):
+        self.assertEqual(self.client.post('/uploads', json={'filename': 'notes.txt', 'size': 10}).status_code, 400)
+        self.assertEqual(self.client.get('/uploads/unknown').status_code, 404)
+
+    def test_update_active_link(self):
+        data = gzip.compress(read('tests/small_file.cif'))
+        upload_id, _ = self.upload(data, 'small_file.cif.gz')
+
+        for pathname in ['/', '/page-2']:
+            output = update_active_link(f"{CHUNKED_PREFIX}{upload_id}", pathname, 'small_file.cif.gz')
+            self.assertIsNone(output[0])
+            self.assertEqual(output[1]['ext'], 'cif')
+            self.assertEqual(structure_bytes(output[1]), read('tests/small_file.cif'))
+        self.assertEqual(output[1]['name'], '1MY9')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from plotly.io.json import to_json_plotly
+from app import calculate_interactions
+from pages.page2 import highlight_contact, update_contact_map
+from rnagraph.contact_map import distance_tile, snap_range, tile_cache, visible_range
+from rnagraph.figure_cache import figure_cache
+from rnagraph.structure_store import put_structure
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class TestDistanceTile(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        points = (np.random.default_rng(1).random((600, 3)) * 100).astype(np.float32)
+        full = np.linalg.norm(points[:, None].astype(np.float64) - points[None], axis=2)
+
+        row_edges, col_edges, tile = distance_tile(points, (100, 500), (0, 600), size=64, block=50)
+        self.assertEqual(tile.dtype, np.float32)
+        self.assertEqual(tile.shape, (64, 64))
+        expected = np.minimum.reduceat(np.minimum.reduceat(full[100:500], col_edges[:-1], axis=1), row_edges[:-1] - 100, axis=0)
+        np.testing.assert_allclose(tile, expected, atol=0.05)
+
+        _, _, tile = distance_tile(points, (10, 20), (30, 45))
+        np.testing.assert_allclose(tile, full[10:20, 30:45], atol=0.05)
+
+    def test_ranges(self):
+        self.assertEqual(visible_range(None, 'xaxis', 100), (0, 100))
+        self.assertEqual(visible_range({'xaxis.range[0]': 40.5, 'xaxis.range[1]': 20.2}, 'xaxis', 100), (20.2, 41.5))
+        self.assertEqual(snap_range(123.4, 377.9, 1000), (112, 384))
+        self.assertEqual(snap_range(-3, 2000, 1000), (0, 1000))
+
+class TestContactMapView(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': '', 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        figure_cache.clear()
+        tile_cache.clear()
+        data = read('tests/sample.cif')
+        digest = put_structure(data, 'cif')
+        self.store = {'hash': digest, 'ext': 'cif', 'name': None, 'url': f"/structures/{digest}.cif"}
+        self.interactions = json.loads(to_json_plotly(calculate_interactions(data, 'cif')))
+
+    def test_tiles(self):
+        self.assertIs(update_contact_map('3d', [], None, self.store, self.interactions).__class__.__name__, 'NoUpdate')
+        full = update_contact_map('map', ['c_base_base'], None, self.store, self.interactions)
+        heatmap, overlay = full['data']
+        count = len(heatmap['x'])
+        self.assertEqual(heatmap['z'].shape, (count, count))
+        standard = [pair for pair in self.interactions['c_base_base'] if pair['nt1']['auth']['name'] in 'ACGU' and pair['nt2']['auth']['name'] in 'ACGU']
+        self.assertEqual(len(overlay['x']), 2 * len(standard))
+
+        zoom = {'xaxis.range[0]': 10.2, 'xaxis.range[1]': 30.7, 'yaxis.range[0]': 40, 'yaxis.range[1]': 20}
+        zoomed = update_contact_map('map', [], zoom, self.store, self.interactions)['data'][0]
+        self.assertLessEqual(zoomed['x'][0], 10)
+        self.assertGreaterEqual(zoomed['x'][-1], 31)
+        self.assertLess(len(zoomed['x']), count)
+        with patch('rnagraph.pipeline.distance_tile', side_effect=AssertionError('computed again')):
+            again = update_contact_map('map', [], zoom, self.store, self.interactions)['data'][0]
+        np.testing.assert_array_equal(again['z'], zoomed['z'])
+
+    def test_highlight(self):
+        figure = {'data': [{'name': 'nucleotides', 'customdata': [[]] * 5}]}
+        operations = highlight_contact({'points': [{'x': 1.0, 'y': 3.0}]}, figure).to_plotly_json()['operations']
+        self.assertEqual(operations[0]['params']['value'], [8, 16, 8, 16, 8])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+import numpy as np
+from Bio.PDB import PDBParser
+from plotly.io.json import to_json_plotly
+from app import calculate_interactions
+from pages.page2 import update_rna_graph, update_interaction_info
+from rnagraph.contacts import ligand_contacts
+from rnagraph.figure_cache import figure_cache
+from rnagraph.spatial import structure_index
+from rnagraph.structure_store import put_structure
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class TestLigandContacts(unittest.TestCase):
+
+    def setUp(self):
+        structure = PDBParser(QUIET=True).get_structure('x', StringIO(read('tests/sample.pdb').decode('utf-8')))
+        self.index = structure_index(structure)
+
+    def test_matches_brute_force(self):
+        atoms = self.index.atoms
+        hetero = np.array([residue[4].startswith('H_') for residue in self.index.residues])[atoms['residue']]
+        nucleotide = np.array([residue[3] in ('A', 'C', 'G', 'U') for residue in self.index.residues])[atoms['residue']]
+        distances = np.linalg.norm(atoms['coord'][hetero][:, None] - atoms['coord'][nucleotide][None], axis=2)
+        first, second = np.nonzero(distances <= 4.0)
+        expected = set(zip(atoms['residue'][hetero][first].tolist(), atoms['residue'][nucleotide][second].tolist()))
+
+        contacts = ligand_contacts(self.index)
+        self.assertEqual(len(contacts), len(expected))
+        for contact in contacts:
+            self.assertLessEqual(contact['distance'], 4.0)
+
+    def test_element_filters(self):
+        contacts = ligand_contacts(self.index, cutoff=3.0, ligand_elements=['K'], nucleotide_elements=['O'])
+        self.assertTrue(contacts)
+        self.assertEqual({contact['nt1']['auth']['name'] for contact in contacts}, {'K'})
+        self.assertEqual({contact['atom2'] for contact in contacts}, {'O6'})
+
+class TestContactLayer(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': '', 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        figure_cache.clear()
+
+    def test_single_trace(self):
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        store = {'hash': digest, 'ext': 'pdb', 'name': '6JJH', 'url': f"/structures/{digest}.pdb"}
+        interactions = json.loads(to_json_plotly(calculate_interactions(data, 'pdb')))
+        figure = update_rna_graph(store, 'sample.pdb')[0]
+
+        figure, options = update_interaction_info(['ligand_contacts'], store, figure, interactions, None)
+        self.assertIn({'label': 'Ligand and ion contacts', 'value': 'ligand_contacts', 'disabled': False}, options)
+        layers = [trace for trace in figure['data'] if trace['name'] == 'ligand_contacts']
+        self.assertEqual(len(layers), 1)
+        self.assertEqual(len(layers[0]['x']), 3 * len(ligand_contacts(structure_index(PDBParser(QUIET=True).get_structure('x', StringIO(data.decode('utf-8')))))))
+
+
+if __name__ == '__main__':
+    unittest.main()
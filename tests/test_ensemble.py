@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+from contextvars import copy_context
+from unittest.mock import patch
+import numpy as np
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from pages.page2 import color_by_metric
+from rnagraph.ensemble import Ensemble, kabsch, rmsd_matrix, rmsf, superpose
+from rnagraph.figure_cache import figure_cache
+from rnagraph.pipeline import Pipeline
+from rnagraph.structure_store import put_structure
+
+def rotation(angle):
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+
+def two_models(path, moved_residue):
+    # sample.pdb as model 1 and, as model 2, rotated and shifted with one
+    # residue moved 2 Å further along x.
+    with open(path) as f:
+        atoms = [line for line in f if line.startswith(('ATOM', 'HETATM'))]
+    lines = ['MODEL        1\n'] + atoms + ['ENDMDL\n', 'MODEL        2\n']
+    for line in atoms:
+        xyz = np.array([float(line[30:38]), float(line[38:46]), float(line[46:54])]) @ rotation(0.7) + [5, -3, 2]
+        if int(line[22:26]) == moved_residue and line[17:20].strip() in 'ACGU':
+            xyz[0] += 2
+        lines.append(f"{line[:30]}{xyz[0]:8.3f}{xyz[1]:8.3f}{xyz[2]:8.3f}{line[54:]}")
+    lines += ['ENDMDL\n', 'END\n']
+    return ''.join(lines).encode()
+
+class TestSuperposition(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.base = rng.normal(size=(40, 3)) * 10
+        self.models = np.stack([self.base @ rotation(angle) + shift for angle, shift in [(0, 0), (1.0, 3), (2.5, -7)]])
+
+    def test_rigid_models(self):
+        aligned = superpose(self.models)
+        np.testing.assert_allclose(rmsf(aligned), 0, atol=1e-9)
+        np.testing.assert_allclose(rmsd_matrix(self.models), 0, atol=1e-6)
+
+    def test_rmsd_matches_pairwise_fits(self):
+        noisy = self.models + np.random.default_rng(1).normal(scale=0.5, size=self.models.shape)
+        matrix = rmsd_matrix(noisy)
+        centered = noisy - noisy.mean(axis=1)[:, None]
+        for a in range(3):
+            for b in range(3):
+                fitted = centered[a] @ kabsch(centered[a][None], centered[b])[0]
+                self.assertAlmostEqual(matrix[a, b], np.sqrt(((fitted - centered[b]) ** 2).sum(axis=1).mean()), places=6)
+        np.testing.assert_allclose(matrix, matrix.T)
+
+    def test_reflection_is_not_a_fit(self):
+        mirrored = np.stack([self.base, self.base * [1, 1, -1]])
+        self.assertGreater(rmsd_matrix(mirrored)[0, 1], 1)
+
+class TestEnsemble(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': '', 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        figure_cache.clear()
+        self.data = two_models('tests/sample.pdb', 5)
+
+    def test_moved_residue_is_most_flexible(self):
+        pipeline = Pipeline(self.data, 'pdb')
+        ensemble = pipeline.ensemble()
+        self.assertEqual(len(ensemble), 2)
+        self.assertEqual(len(ensemble.rmsf), len(pipeline.residues()[1]))
+        self.assertEqual(ensemble.keys[int(np.argmax(ensemble.rmsf))][1][1], 5)
+        self.assertGreater(ensemble.rmsd[0, 1], 0)
+        self.assertLess(ensemble.rmsd[0, 1], 1)
+
+    def test_single_model(self):
+        ensemble = Ensemble(list(Pipeline.from_file('tests/sample.cif').structure()))
+        self.assertEqual(ensemble.rmsd.shape, (1, 1))
+        np.testing.assert_allclose(ensemble.rmsf, 0, atol=1e-6)
+
+    def test_color_patch(self):
+        digest = put_structure(self.data, 'pdb')
+        store = {'hash': digest, 'ext': 'pdb', 'name': 'ensemble', 'url': f"/structures/{digest}.pdb"}
+
+        def run():
+            context_value.set(AttributeDict(triggered_inputs=[{'prop_id': 'color-rmsf.n_clicks', 'value': 1}]))
+            return color_by_metric(None, None, None, 1, store, None, None)
+
+        operations = copy_context().run(run).to_plotly_json()['operations']
+        values = {tuple(operation['location']): operation['params']['value'] for operation in operations}
+        colors = values[('data', 0, 'marker', 'color')]
+        self.assertEqual(values[('data', 0, 'marker', 'colorscale')], 'YlOrRd')
+        self.assertEqual(int(np.argmax(colors)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from plotly.io.json import to_json_plotly
+from app import app, calculate_interactions
+from pages.page2 import update_rna_graph, update_interaction_info
+from rnagraph.figure_cache import FigureCache, figure_cache
+from rnagraph.structure_store import put_structure
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class TestFigureCache(unittest.TestCase):
+
+    def test_lru(self):
+        cache = FigureCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['entries']), (2, 1, 1, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_disabled(self):
+        cache = FigureCache(max_entries=0)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+class TestFigureCaching(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': '', 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        figure_cache.clear()
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        self.store = {'hash': digest, 'ext': 'pdb', 'name': '6JJH', 'url': f"/structures/{digest}.pdb"}
+        self.interactions = json.loads(to_json_plotly(calculate_interactions(data, 'pdb')))
+
+    def test_base_figure(self):
+        first = update_rna_graph(self.store, 'sample.pdb')
+        with patch('rnagraph.pipeline.PDBParser', side_effect=AssertionError('rebuilt')):
+            second = update_rna_graph(self.store, 'sample.pdb')
+        self.assertEqual(json.loads(to_json_plotly(second[0])), json.loads(to_json_plotly(first[0])))
+        self.assertEqual(second[1:], first[1:])
+        # The figure and the heteroatom classes present.
+        self.assertEqual(figure_cache.stats()['hits'], 2)
+
+    def test_interaction_layers(self):
+        figure = update_rna_graph(self.store, 'sample.pdb')[0]
+        first = update_interaction_info(['stacking'], self.store, figure, self.interactions, None)
+        with patch('pages.page2.create_interaction_lines', side_effect=AssertionError('rebuilt')):
+            second = update_interaction_info(['stacking'], self.store, figure, self.interactions, None)
+        self.assertEqual(json.loads(to_json_plotly(second[0])), json.loads(to_json_plotly(first[0])))
+        self.assertEqual(len([trace for trace in second[0]['data'] if trace['name'] == 'stacking']), 4)
+
+    def test_stats_route(self):
+        figure_cache.get(('missing', 'base'))
+        response = app.server.test_client().get('/_rnagraph/figure-cache')
+        self.assertEqual(response.get_json()['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import unittest
+import numpy as np
+from plotly.io.json import to_json_plotly
+from benchmarks.bench_figures import figure_inputs, go_base_figure, go_interaction_lines
+from rnagraph.figures import base_figure, interaction_traces
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def browser_json(value):
+    return json.loads(to_json_plotly(value))
+
+def float32(value):
+    # Centroids stay float32 arrays in the dict figure, so they serialize at
+    # float32 precision where graph_objects wrote Python floats.
+    if isinstance(value, float):
+        return float(np.float32(value))
+    if isinstance(value, dict):
+        return {key: float32(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [float32(item) for item in value]
+    return value
+
+class TestFigures(unittest.TestCase):
+
+    def check(self, path, ext):
+        points_array, nucleotide_info, heteroatoms_array, heteroatom_info, colors, interactions = figure_inputs(read(path), ext)
+        expected = go_base_figure(points_array, nucleotide_info, heteroatoms_array, heteroatom_info, colors)
+        figure = base_figure(points_array, nucleotide_info, heteroatoms_array, heteroatom_info, colors)
+        self.assertEqual(float32(browser_json(figure)), float32(json.loads(expected.to_json())))
+
+        nucleotide_data = browser_json(figure)['data'][0]['customdata']
+        heteroatom_data = browser_json(figure)['data'][1]['customdata'] if heteroatoms_array is not None else None
+        for interaction_type, interaction_list in interactions.items():
+            expected_lines = go_interaction_lines(interaction_list, nucleotide_data, heteroatom_data, interaction_type)
+            lines = interaction_traces(interaction_list, nucleotide_data, heteroatom_data, interaction_type)
+            if expected_lines is None:
+                self.assertIsNone(lines)
+            else:
+                self.assertEqual(float32(browser_json(lines)), float32([json.loads(line.to_json()) for line in expected_lines]))
+
+    def test_pdb(self):
+        self.check('tests/sample.pdb', 'pdb')
+
+    def test_cif(self):
+        self.check('tests/sample.cif', 'cif')
+
+
+if __name__ == '__main__':
+    unittest.main()
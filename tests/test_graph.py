@@ -0,0 +1,75 @@
+import json
+import os
+import tempfile
+import unittest
+from contextvars import copy_context
+from unittest.mock import patch
+import numpy as np
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from plotly.io.json import to_json_plotly
+from app import calculate_interactions
+from pages.page2 import color_by_metric
+from rnagraph.figure_cache import figure_cache
+from rnagraph.graph import InteractionGraph
+from rnagraph.structure_store import put_structure
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def row(number, chain='A', name='G'):
+    return [name, chain, [0.0, 0.0, 0.0], 'red', number]
+
+def pair(a, b, chain_a='A', chain_b='A'):
+    return {'nt1': {'auth': {'number': a, 'chain': chain_a, 'name': 'G'}}, 'nt2': {'auth': {'number': b, 'chain': chain_b, 'name': 'G'}}}
+
+class TestInteractionGraph(unittest.TestCase):
+
+    def setUp(self):
+        # Chain A 1-4, chain B 1-3, one inter-chain pair; B3 is not annotated.
+        residues = [row(1), row(2), row(3), row(4), row(1, 'B'), row(2, 'B'), row(3, 'B')]
+        interactions = {'c_base_base': [pair(1, 4), pair(2, 2, 'A', 'B')], 'stacking': [pair(1, 2), pair(1, 4)]}
+        self.graph = InteractionGraph(residues, interactions)
+
+    def test_counts_and_degree(self):
+        np.testing.assert_array_equal(self.graph.interaction_counts(), [3, 2, 0, 2, 0, 1, 0])
+        np.testing.assert_array_equal(self.graph.interaction_counts('stacking'), [2, 1, 0, 1, 0, 0, 0])
+        np.testing.assert_array_equal(self.graph.degree(), [2, 2, 0, 1, 0, 1, 0])
+
+    def test_components_and_paths(self):
+        np.testing.assert_array_equal(self.graph.components(), [0] * 7)
+        self.assertEqual(self.graph.shortest_path(0, 6), [0, 1, 5, 6])
+        self.assertEqual(self.graph.distances(3)[6], 4)
+
+        split = InteractionGraph([row(1), row(2), row(1, 'B')], {}, backbone=True)
+        np.testing.assert_array_equal(split.components(), [0, 0, 1])
+        self.assertEqual(split.shortest_path(0, 2), [])
+
+class TestColorByMetric(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': '', 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        figure_cache.clear()
+
+    def test_patch(self):
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        store = {'hash': digest, 'ext': 'pdb', 'name': '6JJH', 'url': f"/structures/{digest}.pdb"}
+        interactions = json.loads(to_json_plotly(calculate_interactions(data, 'pdb')))
+
+        def run():
+            context_value.set(AttributeDict(triggered_inputs=[{'prop_id': 'color-degree.n_clicks', 'value': 1}]))
+            return color_by_metric(None, 1, None, None, store, interactions, None)
+
+        operations = copy_context().run(run).to_plotly_json()['operations']
+        values = {tuple(operation['location']): operation['params']['value'] for operation in operations}
+        degree = values[('data', 0, 'marker', 'color')]
+        self.assertEqual(values[('data', 0, 'marker', 'colorscale')], 'Viridis')
+        self.assertGreater(max(degree), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
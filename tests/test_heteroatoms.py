@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from pages.page2 import show_heteroatoms, update_interaction_info, update_rna_graph
+from rnagraph.figure_cache import figure_cache
+from rnagraph.heteroatoms import classify_heteroatoms, heteroatom_class_trace
+from rnagraph.pipeline import Pipeline
+from rnagraph.spatial import structure_index
+from rnagraph.structure_store import put_structure
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def class_names(index, classes, name):
+    return {index.residues[i][3] for i in np.flatnonzero(classes == name)}
+
+class TestHeteroatoms(unittest.TestCase):
+
+    def test_classes(self):
+        index = structure_index(Pipeline.from_file('tests/sample.cif').structure())
+        classes = classify_heteroatoms(index)
+        self.assertEqual(class_names(index, classes, 'waters'), {'HOH'})
+        self.assertEqual(class_names(index, classes, 'ions'), {'MG'})
+        self.assertEqual(class_names(index, classes, 'modified'), {'CCC', 'GDP'})
+        self.assertEqual(class_names(index, classes, ''), {'A', 'C', 'G', 'U'})
+
+        index = structure_index(Pipeline.from_file('tests/sample.pdb').structure())
+        classes = classify_heteroatoms(index)
+        self.assertEqual(class_names(index, classes, 'ions'), {'K'})
+        self.assertEqual(class_names(index, classes, 'ligands'), {'POH'})
+
+    def test_traces(self):
+        index = structure_index(Pipeline.from_file('tests/sample.cif').structure())
+        classes = classify_heteroatoms(index)
+        ions = heteroatom_class_trace(index, classes, 'ions')
+        self.assertEqual(len(ions['x']), 34)
+        self.assertEqual(ions['customdata'][0][0], 'MG')
+        waters = heteroatom_class_trace(index, classes, 'waters')
+        self.assertEqual(len(waters['x']), 70)
+        self.assertNotIn('customdata', waters)
+        self.assertIsNone(heteroatom_class_trace(index, classes, 'ligands'))
+
+class TestHeteroatomToggles(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': '', 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        figure_cache.clear()
+
+    def test_options(self):
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        store = {'hash': digest, 'ext': 'pdb', 'name': '6JJH', 'url': f"/structures/{digest}.pdb"}
+        options = update_rna_graph(store, 'sample.pdb')[-1]
+        # Ions, ligands and waters, but no modified nucleotides.
+        self.assertEqual({option['value']: option['disabled'] for option in options}, {'heteroatoms': False, 'ions': False, 'modified': True, 'ligands': False, 'waters': False})
+
+    def test_lazy_traces(self):
+        data = read('tests/sample.cif')
+        digest = put_structure(data, 'cif')
+        store = {'hash': digest, 'ext': 'cif', 'name': 'sample', 'url': f"/structures/{digest}.cif"}
+        figure = Pipeline.from_store(store, cache=figure_cache).figure()
+        self.assertEqual(len(figure['data']), 2)
+
+        figure, values = show_heteroatoms(['waters', 'ligands'], figure, None, store)
+        self.assertEqual(values, ['waters'])
+        self.assertEqual([trace['name'] for trace in figure['data']], ['nucleotides', 'heteroatoms', 'waters'])
+        self.assertFalse(figure['data'][1]['visible'])
+
+        # Interaction toggles leave the class traces alone.
+        figure, _ = update_interaction_info([], store, figure, None, None)
+        self.assertNotEqual(figure['data'][2].get('visible'), False)
+
+        figure, values = show_heteroatoms(['ions'], figure, None, store)
+        self.assertEqual(values, ['ions'])
+        traces = {trace['name']: trace for trace in figure['data']}
+        self.assertFalse(traces['waters']['visible'])
+        self.assertEqual(len(traces['ions']['x']), 34)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from contextvars import copy_context
+from unittest.mock import patch
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from pages.page2 import update_interaction_diff
+from rnagraph.figure_cache import figure_cache
+from rnagraph.interaction_diff import DIFF_COLORS, diff_traces, interaction_diff, is_diff_trace
+from rnagraph.pipeline import Pipeline
+from rnagraph.structure_store import put_structure
+
+def nt(number, chain='A', name='G', icode=None):
+    return {'auth': {'chain': chain, 'number': number, 'icode': icode, 'name': name}}
+
+def pair(a, b, lw='cWW', **kwargs):
+    return {'nt1': nt(a, **kwargs), 'nt2': nt(b), 'lw': lw}
+
+def without_residue(path, removed):
+    # The structure as model 1 and, as model 2, without one residue.
+    with open(path) as f:
+        atoms = [line for line in f if line.startswith(('ATOM', 'HETATM'))]
+    kept = [line for line in atoms if int(line[22:26]) != removed]
+    return ''.join(['MODEL        1\n'] + atoms + ['ENDMDL\n', 'MODEL        2\n'] + kept + ['ENDMDL\n', 'END\n']).encode()
+
+class TestInteractionDiff(unittest.TestCase):
+
+    def test_gained_and_lost(self):
+        before = {'c_base_base': [pair(1, 10), pair(2, 9)], 'stacking': [pair(1, 2)]}
+        after = {'c_base_base': [pair(1, 10), pair(3, 8)], 'stacking': [pair(1, 2), pair(2, 3)]}
+        diff = interaction_diff(before, after)
+        self.assertEqual(diff['c_base_base']['gained'], [pair(3, 8)])
+        self.assertEqual(diff['c_base_base']['lost'], [pair(2, 9)])
+        self.assertEqual(diff['c_base_base']['kept'], 1)
+        self.assertEqual(diff['stacking']['gained'], [pair(2, 3)])
+        self.assertEqual(diff['stacking']['lost'], [])
+
+    def test_orientation_and_class(self):
+        # The same base pair seen from the other residue is unchanged; a new
+        # Leontis-Westhof class or another insertion code is not.
+        before = {'nc_base_base': [pair(1, 2, 'cWH'), pair(3, 4, 'tSS'), pair(5, 6, 'cWS')], 'stacking': [pair(1, 2)]}
+        after = {'nc_base_base': [pair(2, 1, 'cHW'), pair(3, 4, 'cSS'), pair(5, 6, 'cWS', icode='A')], 'stacking': [pair(2, 1)]}
+        diff = interaction_diff(before, after)
+        self.assertEqual(diff['nc_base_base']['kept'], 1)
+        self.assertEqual(len(diff['nc_base_base']['gained']), 2)
+        self.assertEqual(diff['stacking']['kept'], 1)
+
+    def test_traces(self):
+        rows = [['G', 'A', [float(i), 0.0, 0.0], 'red', i] for i in range(1, 5)]
+        diff = interaction_diff({'stacking': [pair(1, 2), pair(3, 4)]}, {'stacking': [pair(2, 3), pair(9, 4)]})
+        traces = {trace['name']: trace for trace in diff_traces(diff, rows)}
+        self.assertEqual(sorted(traces), ['stacking gained', 'stacking lost'])
+        self.assertEqual(traces['stacking gained']['x'], [2.0, 3.0, None])
+        self.assertEqual(traces['stacking lost']['line']['color'], DIFF_COLORS['lost'])
+        self.assertEqual(len(traces['stacking lost']['x']), 6)
+        self.assertTrue(is_diff_trace(traces['stacking lost']))
+
+class TestModelDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': tempfile.mkdtemp(), 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        figure_cache.clear()
+        self.data = without_residue('tests/sample.pdb', 7)
+
+    def test_models_are_annotated_apart(self):
+        digest = put_structure(self.data, 'pdb')
+        first = Pipeline(self.data, 'pdb', digest)
+        second = Pipeline(self.data, 'pdb', digest, model=2)
+        self.assertNotEqual(first.key(), second.key())
+        self.assertEqual(len(second.residues()[1]), len(first.residues()[1]) - 1)
+
+        diff = first.interaction_diff(second)
+        lost = [record for changes in diff.values() for record in changes['lost']]
+        self.assertTrue(lost)
+        self.assertTrue(all(7 in (record['nt1']['auth']['number'], record['nt2']['auth']['number']) for record in lost))
+        self.assertFalse(any(changes['gained'] for changes in diff.values()))
+        # rnapolis is given each model alone, so base interactions change
+        # too, not only the contacts.
+        self.assertTrue(diff['stacking']['lost'] or diff['nc_base_base']['lost'] or diff['c_base_base']['lost'])
+
+    def test_callback(self):
+        digest = put_structure(self.data, 'pdb')
+        store = {'hash': digest, 'ext': 'pdb', 'name': 'models', 'url': f"/structures/{digest}.pdb"}
+        figure = Pipeline.from_store(store, cache=figure_cache).figure()
+
+        def run(model):
+            context_value.set(AttributeDict(triggered_inputs=[{'prop_id': 'compare-model.value', 'value': model}]))
+            return update_interaction_diff(None, model, None, store, None, figure, None)
+
+        diff_figure, summary = copy_context().run(run, 2)
+        names = [trace['name'] for trace in diff_figure['data'] if is_diff_trace(trace)]
+        self.assertTrue(names)
+        self.assertTrue(all(name.endswith(' lost') for name in names))
+        self.assertEqual(len(summary), 6)
+
+        cleared, summary = copy_context().run(run, None)
+        self.assertFalse(any(is_diff_trace(trace) for trace in cleared['data']))
+        self.assertIsNone(summary)
+
+
+if __name__ == '__main__':
+    unittest.main()
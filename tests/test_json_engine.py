@@ -0,0 +1,53 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+from app import app, calculate_interactions
+from benchmarks.bench_figures import builders, figure_inputs
+from rnagraph import json_engine
+from rnagraph.json_engine import configure_json_engine, jsonable, resolve_engine
+from tests.test_figures import float32
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class TestJsonEngine(unittest.TestCase):
+
+    def setUp(self):
+        previous = pio.json.config.default_engine
+        self.addCleanup(setattr, pio.json.config, 'default_engine', previous)
+
+    def test_resolve(self):
+        self.assertEqual(resolve_engine('json'), 'json')
+        self.assertEqual(resolve_engine('auto'), 'orjson')
+        with patch.dict(os.environ, {'RNAGRAPH_JSON_ENGINE': 'json'}):
+            self.assertEqual(resolve_engine(), 'json')
+        with patch.object(json_engine, 'orjson', None):
+            self.assertEqual(resolve_engine('orjson'), 'json')
+        with self.assertRaises(ValueError):
+            resolve_engine('ujson')
+
+    def test_app_config(self):
+        self.assertEqual(app.server.config['RNAGRAPH_JSON_ENGINE'], pio.json.config.default_engine)
+
+    def test_figure_is_native(self):
+        figure = builders(figure_inputs(read('tests/sample.cif'), 'cif'))['dict']()
+        option = json_engine.orjson.OPT_SERIALIZE_NUMPY | json_engine.orjson.OPT_NON_STR_KEYS
+        # Raises TypeError if plotly would need its slow cleaning pass.
+        json_engine.orjson.dumps(figure, option=option)
+        self.assertEqual(float32(json.loads(to_json_plotly(figure, engine='orjson'))), float32(json.loads(to_json_plotly(figure, engine='json'))))
+
+    def test_json_fallback(self):
+        interactions = calculate_interactions(read('tests/sample.pdb'), 'pdb')
+        expected = json.loads(to_json_plotly(interactions, engine='orjson'))
+        self.assertIs(jsonable(interactions), interactions)
+
+        configure_json_engine(engine='json')
+        self.assertEqual(json.loads(to_json_plotly(jsonable(interactions))), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from benchmarks.dash_client import parse_output, walk_layout
+from benchmarks.load import default_scenario, run, serve_in_thread
+
+class TestDashClient(unittest.TestCase):
+
+    def test_parse_output(self):
+        specs, multi = parse_output('..rna-graph.figure@abc...mol* viewer-link.className..')
+        self.assertTrue(multi)
+        self.assertEqual(specs, [{'id': 'rna-graph', 'property': 'figure@abc'}, {'id': 'mol* viewer-link', 'property': 'className'}])
+
+        specs, multi = parse_output('molstar-viewer-container.children')
+        self.assertFalse(multi)
+        self.assertEqual(specs, [{'id': 'molstar-viewer-container', 'property': 'children'}])
+
+    def test_walk_layout(self):
+        props = {}
+        walk_layout({'props': {'id': 'outer', 'children': [{'props': {'id': 'interaction-type', 'value': []}}]}}, props)
+        self.assertEqual(props['interaction-type.value'], [])
+        self.assertIn('outer.children', props)
+
+class TestLoad(unittest.TestCase):
+
+    def test_sessions_against_local_server(self):
+        server, base_url = serve_in_thread()
+        try:
+            report = run(base_url, sessions=2, concurrency=2, scenario=default_scenario('tests/sample.pdb'))
+        finally:
+            server.shutdown()
+
+        self.assertEqual(report['failed_sessions'], [])
+        self.assertEqual(report['errors'], 0)
+        for name in ['update_active_link', 'update_rna_graph', 'update_interaction_info', 'display_selected_info']:
+            self.assertIn(name, report['callbacks'])
+            self.assertIsNotNone(report['callbacks'][name]['p95'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from plotly.io.json import to_json_plotly
+from app import calculate_interactions
+from pages.page2 import update_network_graph
+from rnagraph.figure_cache import figure_cache
+from rnagraph.network import layout_coordinates, nested_pairs
+from rnagraph.structure_store import put_structure
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def distances(coords):
+    return np.linalg.norm(coords[:, None] - coords[None], axis=2)
+
+class TestLayout(unittest.TestCase):
+
+    def test_nested_pairs(self):
+        pairs = nested_pairs(np.array([0, 1, 5, 3, 2]), np.array([10, 9, 12, 8, 9]))
+        self.assertEqual(pairs, [(0, 10), (1, 9), (3, 8)])
+
+    def test_multiloop(self):
+        pairs = [(0, 29), (1, 28), (2, 12), (3, 11), (4, 10), (14, 26), (15, 25), (16, 24)]
+        d = distances(layout_coordinates(30, pairs))
+        np.testing.assert_allclose(np.diag(d, 1), 1.0)
+        np.testing.assert_allclose([d[i, j] for i, j in pairs], 1.0)
+        self.assertGreater(d[np.triu_indices(30, 2)].min(), 0.9)
+
+class TestNetworkView(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': '', 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        figure_cache.clear()
+
+    def test_view(self):
+        data = read('tests/sample.cif')
+        digest = put_structure(data, 'cif')
+        store = {'hash': digest, 'ext': 'cif', 'name': None, 'url': f"/structures/{digest}.cif"}
+        interactions = json.loads(to_json_plotly(calculate_interactions(data, 'cif')))
+
+        self.assertEqual(update_network_graph('3d', [], store, interactions)[:3], ({'display': 'block'}, {'display': 'none'}, {'display': 'none'}))
+        first = update_network_graph('2d', ['c_base_base'], store, interactions)
+        self.assertEqual(first[:3], ({'display': 'none'}, {'display': 'block'}, {'display': 'none'}))
+        traces = first[3]['data']
+        self.assertEqual([trace['name'] for trace in traces], ['backbone', 'c_base_base', 'nucleotides'])
+        self.assertEqual({trace['type'] for trace in traces}, {'scattergl'})
+        standard = [pair for pair in interactions['c_base_base'] if pair['nt1']['auth']['name'] in 'ACGU' and pair['nt2']['auth']['name'] in 'ACGU']
+        self.assertEqual(len(traces[1]['x']), 3 * len(standard))
+
+        with patch('rnagraph.pipeline.network_layout', side_effect=AssertionError('laid out again')):
+            second = update_network_graph('2d', ['c_base_base', 'stacking'], store, interactions)
+        np.testing.assert_array_equal(second[3]['data'][-1]['x'], traces[-1]['x'])
+        self.assertIn('stacking', [trace['name'] for trace in second[3]['data']])
+
+
+if __name__ == '__main__':
+    unittest.main()
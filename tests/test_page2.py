@@ -9,12 +9,14 @@ from Bio.PDB import PDBParser
 from io import StringIO
 import os
 import tracemalloc
-from pages.page2 import update_rna_graph, display_selected_info, clear_selection, show_heteroatoms, update_interaction_info, layout, rna_nucleotides, dna_nucleotides, color_map
+from pages.page2 import update_rna_graph, display_selected_info, clear_selection, show_heteroatoms, update_interaction_info, layout
+from rnagraph.figures import rna_nucleotides, dna_nucleotides
+from rnagraph.pipeline import color_map
 
 class TestPage(unittest.TestCase):
 
-    @patch('pages.page2.PDBParser')
-    @patch('pages.page2.MMCIFParser')
+    @patch('rnagraph.pipeline.PDBParser')
+    @patch('rnagraph.pipeline.MMCIFParser')
     @patch('pages.page2.colors', new=['red'])  # Mock the colors list to avoid dependency issues
     def test_update_rna_graph(self, mock_mmcif_parser, mock_pdb_parser):
         # Simulated PDB content (minimal valid structure)
@@ -69,7 +71,13 @@ class TestPage(unittest.TestCase):
         self.assertEqual(nucleotide_trace.mode, 'markers')
 
         # Validate heteroatom options
-        self.assertEqual(options, [{'label': 'Show heteroatoms', 'value': 'heteroatoms', 'disabled': True}])
+        self.assertEqual(options, [
+            {'label': 'Show heteroatoms', 'value': 'heteroatoms', 'disabled': True},
+            {'label': 'Ions', 'value': 'ions', 'disabled': True},
+            {'label': 'Modified nucleotides', 'value': 'modified', 'disabled': True},
+            {'label': 'Ligands', 'value': 'ligands', 'disabled': True},
+            {'label': 'Waters', 'value': 'waters', 'disabled': True},
+        ])
 
 
     def test_display_selected_info(self):
@@ -175,7 +183,7 @@ class TestIntegration(unittest.TestCase):
         self.assertIsInstance(interaction_options, list)  # Check that interaction_options is a list
 
         # Check that the interaction options are generated correctly
-        self.assertIn({'label': 'Phosphodiester interactions', 'value': 'phosphodiester', 'disabled': False}, interaction_options)
+        self.assertIn({'label': 'Base–phosphate interactions', 'value': 'phosphodiester', 'disabled': False}, interaction_options)
         self.assertIn({'label': 'Canonical interactions', 'value': 'c_base_base', 'disabled': True}, interaction_options)
         self.assertIn({'label': 'Non-canonical interactions', 'value': 'nc_base_base', 'disabled': True}, interaction_options)
         self.assertIn({'label': 'Stacking interactions', 'value': 'stacking', 'disabled': True}, interaction_options)
@@ -247,7 +255,7 @@ class TestPerformance(unittest.TestCase):
 
         self.assertLess(peak, 10 * 1024 * 1024)  # Assert peak memory < 10MB
 
-    @patch('pages.page2.PDBParser')
+    @patch('rnagraph.pipeline.PDBParser')
     def test_large_pdb_file(self, mock_pdb_parser):
         large_pdb_content = "\n".join([
             f"ATOM  {i:5d}  P     G A   {i}      {i*1.5:.3f}  {i*2.0:.3f}  {i*2.5:.3f}  1.00 20.00           P"
@@ -0,0 +1,45 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest.mock import patch
+from rnapolis import annotator, parser
+from benchmarks.scaling import synthetic_bytes
+from rnagraph import parallel_annotation
+from rnagraph.parallel_annotation import ANNOTATION_WORKERS_ENV, annotation_workers, extract_base_interactions
+
+def read_structure(path):
+    with open(path) as f:
+        return parser.read_3d_structure(f)
+
+class TestParallelAnnotation(unittest.TestCase):
+
+    def test_matches_single_pass(self):
+        structures = [read_structure('tests/sample.pdb'), read_structure('tests/sample.cif')]
+        structures.append(parser.read_3d_structure(StringIO(synthetic_bytes(600, 'pdb').decode('utf-8'))))
+        for structure in structures:
+            expected = annotator.extract_base_interactions(structure)
+            for workers in [2, 3]:
+                self.assertEqual(extract_base_interactions(structure, workers=workers, min_residues=0), expected)
+
+    def test_single_pass_fallbacks(self):
+        # Under a threaded server, or with an rnapolis the replay was not
+        # checked against, no pool is forked.
+        structures = [read_structure('tests/sample.cif'), read_structure('tests/sample.pdb')] * 2
+        expected = [annotator.extract_base_interactions(structure) for structure in structures]
+        with patch('rnagraph.parallel_annotation.ProcessPoolExecutor', side_effect=AssertionError('forked')):
+            with ThreadPoolExecutor(len(structures)) as threads:
+                results = list(threads.map(lambda structure: extract_base_interactions(structure, workers=2, min_residues=0), structures))
+            self.assertEqual(results, expected)
+            with patch.object(parallel_annotation, 'REPLAY_SUPPORTED', False):
+                self.assertEqual(extract_base_interactions(structures[0], workers=2, min_residues=0), expected[0])
+
+    def test_workers(self):
+        self.assertEqual(annotation_workers(), 1)
+        with patch.dict(os.environ, {ANNOTATION_WORKERS_ENV: 'auto'}):
+            self.assertEqual(annotation_workers(), os.cpu_count())
+        self.assertEqual(annotation_workers(4), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from app import load_pdb_id, update_active_link
+from rnagraph.pdb_mirror import build_index, load_entry, lookup, normalize_id
+from rnagraph.structure_store import structure_bytes
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class TestPdbMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.mirror = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.mirror, 'mmCIF', 'my'))
+        os.makedirs(os.path.join(self.mirror, 'pdb', 'my'))
+        os.makedirs(os.path.join(self.mirror, 'pdb', 'jj'))
+        with open(os.path.join(self.mirror, 'mmCIF', 'my', '1my9.cif.gz'), 'wb') as f:
+            f.write(gzip.compress(read('tests/small_file.cif')))
+        with open(os.path.join(self.mirror, 'pdb', 'my', 'pdb1my9.ent.gz'), 'wb') as f:
+            f.write(b'')
+        shutil.copy('tests/sample.pdb', os.path.join(self.mirror, 'pdb', 'jj', 'pdb6jjh.ent'))
+        with open(os.path.join(self.mirror, 'README'), 'w') as f:
+            f.write('not an entry')
+
+        self.env = patch.dict(os.environ, {'RNAGRAPH_PDB_MIRROR': self.mirror, 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        self.entries = build_index(self.mirror)
+
+    def test_index(self):
+        self.assertEqual(self.entries, {
+            '1my9': os.path.join('mmCIF', 'my', '1my9.cif.gz'),
+            '6jjh': os.path.join('pdb', 'jj', 'pdb6jjh.ent'),
+        })
+        self.assertEqual(lookup('1MY9'), os.path.join(self.mirror, 'mmCIF', 'my', '1my9.cif.gz'))
+        self.assertEqual(lookup('pdb_00006jjh'), os.path.join(self.mirror, 'pdb', 'jj', 'pdb6jjh.ent'))
+        self.assertIsNone(lookup('9xyz'))
+        self.assertIsNone(lookup('../etc'))
+        self.assertIsNone(normalize_id('hello'))
+
+    def test_load_entry(self):
+        decoded, ext, filename = load_entry('1my9')
+        self.assertEqual((decoded, ext, filename), (read('tests/small_file.cif'), 'cif', '1my9.cif.gz'))
+        decoded, ext, filename = load_entry('6JJH')
+        self.assertEqual((decoded, ext, filename), (read('tests/sample.pdb'), 'pdb', 'pdb6jjh.ent'))
+        with self.assertRaises(KeyError):
+            load_entry('9xyz')
+
+    def test_load_pdb_id(self):
+        contents, filename, message = load_pdb_id(1, None, ' 1MY9 ')
+        self.assertEqual((contents, filename, message), ('mirror:1my9', '1my9.cif.gz', None))
+
+        output = update_active_link(contents, '/page-2', filename)
+        self.assertIsNone(output[0])
+        self.assertEqual(output[1]['name'], '1MY9')
+        self.assertEqual(structure_bytes(output[1]), read('tests/small_file.cif'))
+        self.assertIsNotNone(output[2])
+
+        message = load_pdb_id(1, None, '9xyz')[2]
+        self.assertIn('9xyz', message.children)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from plotly.io.json import to_json_plotly
+from app import calculate_interactions
+from pages.page2 import update_interaction_info, update_rna_graph
+from rnagraph.figure_cache import FigureCache
+from rnagraph.pipeline import Pipeline, classify_residues, read_structure
+from rnagraph.structure_store import put_structure
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def browser(value):
+    return json.loads(to_json_plotly(value))
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_ARCHIVE_DIR': '', 'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp()})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+
+    def test_classify_residues(self):
+        nucleotides, heteroatoms = classify_residues(read_structure(read('tests/sample.pdb'), 'pdb'))
+        self.assertTrue(nucleotides)
+        self.assertTrue(heteroatoms)
+        self.assertTrue(all(residue.id[0].startswith('H_') for _, residue in heteroatoms))
+
+    def test_matches_callbacks(self):
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        store = {'hash': digest, 'ext': 'pdb', 'name': '6JJH', 'url': f"/structures/{digest}.pdb"}
+        interactions = browser(calculate_interactions(data, 'pdb'))
+        figure = update_rna_graph(store, 'sample.pdb')[0]
+        figure = update_interaction_info(['stacking'], store, browser(figure), interactions, None)[0]
+
+        pipeline = Pipeline.from_file('tests/sample.pdb')
+        self.assertEqual(pipeline.digest, digest)
+        self.assertEqual(browser(pipeline.interactions()), interactions)
+        self.assertEqual(browser(pipeline.figure()['data']), browser(figure['data'][:2]))
+        self.assertEqual(browser(pipeline.layer('stacking')), browser([trace for trace in figure['data'] if trace['name'] == 'stacking']))
+        self.assertIn('parse', pipeline.timings)
+
+    def test_stages_run_once(self):
+        cache = FigureCache()
+        pipeline = Pipeline.from_file('tests/sample.pdb', cache=cache)
+        pipeline.layer('ligand_contacts')
+        with patch('rnagraph.pipeline.read_structure', side_effect=AssertionError('parsed again')):
+            pipeline.layer('ligand_contacts')
+            pipeline.figure()
+            Pipeline.from_file('tests/sample.pdb', cache=cache).layer('ligand_contacts')
+        self.assertEqual(cache.stats()['entries'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from rnagraph.profiling import install_profiler, requested_mode, SamplingProfiler
+from tests.dash_app import create_app as create_dash_app, dispatch_body
+
+def update_rna_graph(value):
+    return sum(i * i for i in range(20000))
+
+def create_app():
+    return create_dash_app(update_rna_graph)
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+
+    def test_disabled_leaves_dispatch_untouched(self):
+        app = create_app()
+        view = app.server.view_functions['/_dash-update-component']
+        with patch.dict(os.environ, {'RNAGRAPH_PROFILE': ''}):
+            self.assertFalse(install_profiler(app))
+        self.assertIs(app.server.view_functions['/_dash-update-component'], view)
+
+    def test_cprofile_request(self):
+        with patch.dict(os.environ, {'RNAGRAPH_PROFILE': '1', 'RNAGRAPH_PROFILE_DIR': self.profile_dir}):
+            app = create_app()
+            self.assertTrue(install_profiler(app))
+            client = app.server.test_client()
+
+            response = client.post('/_dash-update-component', json=dispatch_body())
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-RNAgraph-Profile-Path', response.headers)
+            self.assertEqual(os.listdir(self.profile_dir), [])
+
+            response = client.post('/_dash-update-component', json=dispatch_body(), headers={'X-RNAgraph-Profile': 'cprofile'})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.headers['X-RNAgraph-Profile-Path'].endswith('update_rna_graph.prof'))
+
+        files = sorted(os.listdir(self.profile_dir))
+        self.assertEqual(len(files), 2)
+        with open(os.path.join(self.profile_dir, files[0])) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any('update_rna_graph' in line for line in lines))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+
+    def test_sample_request_from_referrer_and_filter(self):
+        env = {
+            'RNAGRAPH_PROFILE': '1',
+            'RNAGRAPH_PROFILE_DIR': self.profile_dir,
+            'RNAGRAPH_PROFILE_CALLBACKS': 'update_interaction_info',
+        }
+        with patch.dict(os.environ, env):
+            app = create_app()
+            install_profiler(app)
+            client = app.server.test_client()
+            response = client.post('/_dash-update-component', json=dispatch_body(), headers={'Referer': 'http://localhost/page-2?profile=sample'})
+            self.assertNotIn('X-RNAgraph-Profile-Path', response.headers)
+            self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_requested_mode(self):
+        app = create_app()
+        with app.server.test_request_context('/_dash-update-component?profile=sample'):
+            from flask import request
+            self.assertEqual(requested_mode(request), 'sample')
+        with app.server.test_request_context('/_dash-update-component', headers={'X-RNAgraph-Profile': '1'}):
+            from flask import request
+            self.assertEqual(requested_mode(request), 'cprofile')
+        with app.server.test_request_context('/_dash-update-component', headers={'X-RNAgraph-Profile': 'off'}):
+            from flask import request
+            self.assertIsNone(requested_mode(request))
+
+    def test_sampling_profiler(self):
+        profiler = SamplingProfiler(interval=0.0005)
+        profiler.start()
+        sum(i * i for i in range(300000))
+        profiler.stop()
+        self.assertTrue(profiler.collapsed())
+        self.assertIn('samples', profiler.summary()[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from dash.exceptions import PreventUpdate
+from rnagraph.recording import SESSION_HEADER, install_recorder, load_session
+from benchmarks.replay import replay, summarize, compare
+from tests.dash_app import create_app as create_dash_app, dispatch_body
+
+def update_interaction_info(value):
+    if value is None:
+        raise PreventUpdate
+    return f"value {value}"
+
+def create_app():
+    return create_dash_app(update_interaction_info)
+
+class TestRecording(unittest.TestCase):
+
+    def test_disabled(self):
+        app = create_app()
+        with patch.dict(os.environ, {'RNAGRAPH_RECORD_DIR': ''}):
+            self.assertFalse(install_recorder(app))
+
+    def test_record_and_replay(self):
+        record_dir = tempfile.mkdtemp()
+        with patch.dict(os.environ, {'RNAGRAPH_RECORD_DIR': record_dir}):
+            app = create_app()
+            self.assertTrue(install_recorder(app))
+
+        client = app.server.test_client()
+        self.assertEqual(client.post('/_dash-update-component', json=dispatch_body(1)).status_code, 200)
+        self.assertEqual(client.post('/_dash-update-component', json=dispatch_body(None)).status_code, 204)
+        self.assertEqual(client.post('/_dash-update-component', json=dispatch_body(2)).status_code, 200)
+
+        files = os.listdir(record_dir)
+        self.assertEqual(len(files), 1)
+        steps = load_session(os.path.join(record_dir, files[0]))
+        self.assertEqual([step['status'] for step in steps], [200, 204, 200])
+        self.assertEqual(steps[0]['callback'], 'update_interaction_info')
+        self.assertEqual(steps[2]['body']['inputs'][0]['value'], 2)
+
+        results = replay(steps, create_app().server.test_client())
+        self.assertEqual([result['status'] for result in results], [200, 204, 200])
+        self.assertFalse(any(result['mismatch'] for result in results))
+        self.assertTrue(all(result['peak_memory'] > 0 for result in results))
+
+        summary = summarize(results)
+        self.assertEqual(summary['callbacks']['update_interaction_info']['calls'], 3)
+        self.assertEqual(compare(summary, summary), [])
+
+    def test_invalid_session(self):
+        record_dir = tempfile.mkdtemp()
+        with patch.dict(os.environ, {'RNAGRAPH_RECORD_DIR': record_dir}):
+            app = create_app()
+            install_recorder(app)
+
+        client = app.server.test_client()
+        outside = os.path.join(os.path.dirname(record_dir), 'outside')
+        for session in ['../outside', outside, 'ABC']:
+            response = client.post('/_dash-update-component', json=dispatch_body(1), headers={SESSION_HEADER: session})
+            self.assertEqual(response.status_code, 200)
+        self.assertFalse(os.path.exists(outside + '.jsonl'))
+        self.assertEqual(len(os.listdir(record_dir)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
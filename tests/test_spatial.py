@@ -0,0 +1,73 @@
+import unittest
+from io import StringIO
+from unittest.mock import patch
+import numpy as np
+from Bio.PDB import PDBParser
+from rnagraph import spatial
+from rnagraph.spatial import SpatialIndex, structure_index
+
+def brute_pairs(coords, radius):
+    distances = np.linalg.norm(coords[:, None] - coords[None], axis=2)
+    return np.nonzero(np.triu(distances <= radius, 1))
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.coords = np.random.default_rng(0).random((800, 3)) * 40
+        self.index = SpatialIndex(self.coords, 4.0)
+
+    def test_radius(self):
+        for radius in [3.0, 20.0]:
+            expected = np.flatnonzero(np.linalg.norm(self.coords - self.coords[7], axis=1) <= radius)
+            np.testing.assert_array_equal(self.index.radius(self.coords[7], radius), expected)
+
+        queries, indices, distances = self.index.query_radius(self.coords[:10], 5.0)
+        self.assertEqual(len(queries), sum(int((np.linalg.norm(self.coords - point, axis=1) <= 5.0).sum()) for point in self.coords[:10]))
+        np.testing.assert_allclose(distances, np.linalg.norm(self.coords[indices] - self.coords[queries], axis=1))
+
+    def test_nearest(self):
+        for point in [self.coords[3], np.array([200.0, -50.0, 10.0])]:
+            indices, distances = self.index.nearest(point, 12)
+            expected = np.sort(np.linalg.norm(self.coords - point, axis=1))[:12]
+            np.testing.assert_allclose(distances, expected)
+            np.testing.assert_allclose(np.linalg.norm(self.coords[indices] - point, axis=1), distances)
+
+    def test_pairs(self):
+        for radius in [2.5, 6.0, 15.0]:
+            first, second = self.index.pairs(radius)
+            expected = brute_pairs(self.coords, radius)
+            np.testing.assert_array_equal(first, expected[0])
+            np.testing.assert_array_equal(second, expected[1])
+
+    def test_without_kdtree(self):
+        with patch.object(spatial, 'KDTree', None):
+            index = SpatialIndex(self.coords, 4.0)
+            first, _ = index.pairs(15.0)
+            self.assertEqual(len(first), len(brute_pairs(self.coords, 15.0)[0]))
+            self.assertEqual(len(index.nearest(np.array([200.0, -50.0, 10.0]), 3)[0]), 3)
+
+    def test_empty(self):
+        index = SpatialIndex(np.zeros((0, 3)))
+        self.assertEqual(len(index.pairs(3.0)[0]), 0)
+        self.assertEqual(len(index.radius([0, 0, 0], 3.0)), 0)
+        self.assertEqual(len(index.nearest([0, 0, 0], 3)[0]), 0)
+
+class TestStructureIndex(unittest.TestCase):
+
+    def test_residues_near(self):
+        with open('tests/sample.pdb') as f:
+            structure = PDBParser(QUIET=True).get_structure('x', StringIO(f.read()))
+        index = structure_index(structure)
+        self.assertIs(structure_index(structure), index)
+
+        position = index.residue_position('B', 5)
+        atoms = index.atoms
+        own = atoms['coord'][atoms['residue'] == position]
+        close = np.linalg.norm(atoms['coord'][:, None] - own[None], axis=2).min(axis=1) <= 4.0
+        expected = sorted(set(atoms['residue'][close].tolist()) - {position})
+        self.assertEqual(index.residues_near(position, 4.0), expected)
+        self.assertIn(index.residue_position('B', 4), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import base64
+import gzip
+import unittest
+from io import StringIO
+from Bio.PDB import PDBParser, MMCIFParser
+from app import update_active_link
+from rnagraph.structure_store import structure_bytes
+from rnagraph.structure_io import (
+    StructureTooLarge, structure_format, decode_upload, gunzip, mmcif_to_bcif, bcif_to_mmcif, read_mmcif_blocks
+)
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def upload(data):
+    return base64.b64encode(data).decode()
+
+def normalize(rows):
+    # BinaryCIF stores fixed-point numbers, so '1.00' comes back as '1.0'
+    normalized = []
+    for row in rows:
+        values = []
+        for value in row:
+            try:
+                values.append(float(value))
+            except ValueError:
+                values.append(value)
+        normalized.append(values)
+    return normalized
+
+class TestStructureFormat(unittest.TestCase):
+
+    def test_structure_format(self):
+        self.assertEqual(structure_format('1ehz.pdb'), ('pdb', None))
+        self.assertEqual(structure_format('1EHZ.CIF.GZ'), ('cif', 'gz'))
+        self.assertEqual(structure_format('1ehz.bcif'), ('bcif', None))
+        self.assertEqual(structure_format('pdb1ehz.ent.gz'), ('pdb', 'gz'))
+        self.assertEqual(structure_format('archive.gz'), ('gz', None))
+
+class TestDecodeUpload(unittest.TestCase):
+
+    def test_plain(self):
+        raw = read('tests/sample.pdb')
+        self.assertEqual(decode_upload(upload(raw), 'sample.pdb'), (raw, 'pdb'))
+
+    def test_gzip(self):
+        raw = read('tests/sample.pdb')
+        self.assertEqual(decode_upload(upload(gzip.compress(raw)), 'sample.pdb.gz'), (raw, 'pdb'))
+
+    def test_concatenated_gzip_members(self):
+        raw = read('tests/sample.pdb')
+        half = len(raw) // 2
+        data = gzip.compress(raw[:half]) + gzip.compress(raw[half:])
+        self.assertEqual(gunzip(data), raw)
+
+    def test_decompression_limit(self):
+        data = gzip.compress(b'A' * 100000)
+        with self.assertRaises(StructureTooLarge):
+            gunzip(data, limit=1000)
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            decode_upload(upload(b'text'), 'notes.txt')
+
+class TestBinaryCif(unittest.TestCase):
+
+    def test_round_trip(self):
+        text = read('tests/small_file.cif').decode('utf-8')
+        decoded, ext = decode_upload(upload(mmcif_to_bcif(text)), 'small_file.bcif')
+        self.assertEqual(ext, 'cif')
+
+        original = {name: rows for name, columns, rows in read_mmcif_blocks(text)[0][1]}
+        restored = {name: rows for name, columns, rows in read_mmcif_blocks(decoded.decode('utf-8'))[0][1]}
+        self.assertEqual(restored.keys(), original.keys())
+        self.assertEqual(normalize(restored['atom_site']), normalize(original['atom_site']))
+        self.assertEqual(normalize(restored['citation']), normalize(original['citation']))
+
+    def test_parsed_structure_matches(self):
+        text = read('tests/sample.cif').decode('utf-8')
+        decoded = bcif_to_mmcif(mmcif_to_bcif(text)).decode('utf-8')
+        original = MMCIFParser(QUIET=True).get_structure('a', StringIO(text))
+        restored = MMCIFParser(QUIET=True).get_structure('b', StringIO(decoded))
+        self.assertEqual(
+            [atom.coord.tolist() for atom in original.get_atoms()],
+            [atom.coord.tolist() for atom in restored.get_atoms()],
+        )
+
+class TestCompressedUploads(unittest.TestCase):
+
+    def test_update_active_link_gzip_pdb(self):
+        contents = f"data:application/gzip;base64,{upload(gzip.compress(read('tests/sample.pdb')))}"
+        output = update_active_link(contents, '/', 'sample.pdb.gz')
+        self.assertIsNone(output[0])
+        self.assertEqual(output[1]['ext'], 'pdb')
+        decoded = structure_bytes(output[1])
+        structure = PDBParser(QUIET=True).get_structure('x', StringIO(decoded.decode('utf-8')))
+        self.assertGreater(len(list(structure.get_residues())), 0)
+
+    def test_update_active_link_bcif(self):
+        bcif = mmcif_to_bcif(read('tests/small_file.cif'))
+        output = update_active_link(f"data:application/octet-stream;base64,{upload(bcif)}", '/page-2', 'small_file.bcif')
+        self.assertIsNone(output[0])
+        self.assertEqual(output[1]['ext'], 'cif')
+        self.assertEqual(output[1]['name'], '1MY9')
+        self.assertIsNotNone(output[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import base64
+import gzip
+import os
+import tempfile
+import unittest
+from contextvars import copy_context
+from unittest.mock import patch
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from dash.exceptions import PreventUpdate
+from pages.page2 import STRUCTURE_MISSING, update_rna_graph
+from rnagraph.structure_io import bcif_to_mmcif
+from rnagraph.figure_cache import figure_cache
+from rnagraph.structure_store import get_structure, put_structure, structure_bytes, structure_urls, prune, content_hash
+from app import app
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class TestStructureStore(unittest.TestCase):
+
+    def setUp(self):
+        self.env = patch.dict(os.environ, {'RNAGRAPH_STRUCTURE_DIR': tempfile.mkdtemp(), 'RNAGRAPH_SERVE_BCIF': '1'})
+        self.env.start()
+        self.addCleanup(self.env.stop)
+        self.client = app.server.test_client()
+
+    def test_serve_with_etag(self):
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        self.assertEqual(digest, content_hash(data))
+        urls = structure_urls(app, digest, 'pdb')
+        self.assertNotIn('bcif_url', urls)
+
+        response = self.client.get(urls['url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, data)
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+        response = self.client.get(urls['url'], headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_gzip(self):
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        response = self.client.get(f"/structures/{digest}.pdb", headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data), data)
+
+        for header in ['gzip;q=0, deflate', 'x-gzip-lite', 'identity']:
+            response = self.client.get(f"/structures/{digest}.pdb", headers={'Accept-Encoding': header})
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertIn('Accept-Encoding', response.headers['Vary'])
+            self.assertEqual(response.data, data)
+
+    def test_bcif_transcoding(self):
+        data = read('tests/small_file.cif')
+        digest = put_structure(data, 'cif')
+        urls = structure_urls(app, digest, 'cif')
+        response = self.client.get(urls['bcif_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'1MY9', bcif_to_mmcif(response.data))
+
+    def test_missing(self):
+        self.assertEqual(self.client.get(f"/structures/{'0' * 64}.pdb").status_code, 404)
+        self.assertEqual(self.client.get('/structures/abc.pdb').status_code, 404)
+        digest = put_structure(read('tests/sample.pdb'), 'pdb')
+        self.assertEqual(self.client.get(f"/structures/{digest}.cif").status_code, 404)
+
+    def test_structure_bytes(self):
+        data = read('tests/sample.pdb')
+        digest = put_structure(data, 'pdb')
+        self.assertEqual(structure_bytes({'hash': digest, 'ext': 'pdb', 'url': f"/structures/{digest}.pdb"}), data)
+        data_url = f"data:application/octet-stream;base64,{base64.b64encode(data).decode()}"
+        self.assertEqual(structure_bytes({'url': data_url, 'ext': 'pdb'}), data)
+
+    def test_prune(self):
+        first = put_structure(b'first', 'pdb')
+        os.utime(os.path.join(os.environ['RNAGRAPH_STRUCTURE_DIR'], f"{first}.pdb"), (0, 0))
+        second = put_structure(b'second', 'pdb')
+        prune(max_bytes=6)
+        files = os.listdir(os.environ['RNAGRAPH_STRUCTURE_DIR'])
+        self.assertEqual(files, [f"{second}.pdb"])
+
+    def test_put_over_limit(self):
+        # A structure larger than the whole store is kept until the next write.
+        with patch.dict(os.environ, {'RNAGRAPH_STRUCTURE_STORE_SIZE': '4'}):
+            first = put_structure(b'first', 'pdb')
+            self.assertEqual(get_structure(first, 'pdb'), b'first')
+            second = put_structure(b'second', 'pdb')
+        self.assertEqual(os.listdir(os.environ['RNAGRAPH_STRUCTURE_DIR']), [f"{second}.pdb"])
+
+    def test_prune_keeps_recently_read(self):
+        directory = os.environ['RNAGRAPH_STRUCTURE_DIR']
+        first = put_structure(b'first', 'pdb')
+        second = put_structure(b'second', 'pdb')
+        os.utime(os.path.join(directory, f"{first}.pdb"), (0, 0))
+        os.utime(os.path.join(directory, f"{second}.pdb"), (1, 1))
+        get_structure(first, 'pdb')
+        # A write in progress elsewhere.
+        with open(os.path.join(directory, 'upload.part'), 'wb') as f:
+            f.write(b'partial')
+        prune(max_bytes=6)
+        self.assertEqual(sorted(os.listdir(directory)), sorted([f"{first}.pdb", 'upload.part']))
+
+    def test_pruned_structure_callback(self):
+        figure_cache.clear()
+        store = {'hash': '0' * 64, 'ext': 'pdb', 'name': None, 'url': f"/structures/{'0' * 64}.pdb"}
+        updated_props = {}
+
+        def run():
+            context_value.set(AttributeDict(updated_props=updated_props))
+            return update_rna_graph(store, 'sample.pdb')
+
+        with self.assertRaises(PreventUpdate):
+            copy_context().run(run)
+        self.assertEqual(updated_props['upload-message']['children'].children, STRUCTURE_MISSING)
+
+
+if __name__ == '__main__':
+    unittest.main()
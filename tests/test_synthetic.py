@@ -0,0 +1,55 @@
+import unittest
+from io import StringIO
+from Bio.PDB import PDBParser, MMCIFParser
+from app import check_nucleotide_type_and_completeness, extract_structure_name
+from benchmarks.synthetic import generate, write_pdb, write_mmcif
+from benchmarks.scaling import exponents, superlinear_onset
+
+class TestSynthetic(unittest.TestCase):
+
+    def setUp(self):
+        self.structure = generate(60, chains=2, models=3, ions=4, waters=6, ligands=1, seed=1)
+
+    def check_structure(self, text, parser):
+        structure = parser(QUIET=True).get_structure('synthetic', StringIO(text))
+        models = list(structure)
+        self.assertEqual(len(models), 3)
+
+        nucleotides = [residue for chain in models[0] for residue in chain if residue.id[0] == ' ']
+        hetero = [residue for chain in models[0] for residue in chain if residue.id[0] != ' ']
+        self.assertEqual(len(nucleotides), 60)
+        self.assertEqual(len(hetero), 11)
+        self.assertEqual(sorted(chain.id for chain in models[0]), ['A', 'B'])
+        self.assertEqual(sum(1 for residue in hetero if residue.resname == 'HOH'), 6)
+
+    def test_pdb(self):
+        out = StringIO()
+        write_pdb(self.structure, out)
+        self.check_structure(out.getvalue(), PDBParser)
+        decoded = out.getvalue().encode('utf-8')
+        self.assertEqual(check_nucleotide_type_and_completeness(decoded, 'pdb')[0], 'RNA')
+        self.assertEqual(extract_structure_name(decoded, 'pdb'), 'SYNT')
+
+    def test_mmcif(self):
+        out = StringIO()
+        write_mmcif(self.structure, out)
+        self.check_structure(out.getvalue(), MMCIFParser)
+        decoded = out.getvalue().encode('utf-8')
+        self.assertEqual(check_nucleotide_type_and_completeness(decoded, 'cif')[0], 'RNA')
+        self.assertEqual(extract_structure_name(decoded, 'cif'), 'SYNT')
+
+    def test_reproducible(self):
+        first, second = StringIO(), StringIO()
+        write_pdb(generate(30, ions=2, seed=5), first)
+        write_pdb(generate(30, ions=2, seed=5), second)
+        self.assertEqual(first.getvalue(), second.getvalue())
+
+    def test_superlinear_onset(self):
+        sizes = [100, 200, 400, 800]
+        self.assertIsNone(superlinear_onset(sizes, [0.01, 0.02, 0.04, 0.08]))
+        self.assertEqual(superlinear_onset(sizes, [0.01, 0.02, 0.08, 0.32]), 200)
+        self.assertEqual(exponents(sizes, [0.0001, 0.01, 0.02, 0.04], 0.001)[0], None)
+
+
+if __name__ == '__main__':
+    unittest.main()